@@ -0,0 +1,214 @@
+import argparse
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+from services.wav_io import open_wav, to_float
+
+# Loudness target for posts (streaming/social platforms normalize around -14 LUFS)
+TARGET_LUFS = -14.0
+# Maximum true peak after gain, in dBTP
+TRUE_PEAK_LIMIT = -1.0
+
+# Level below which leading/trailing audio counts as silence, in dBFS
+SILENCE_THRESHOLD_DB = -50.0
+SILENCE_WINDOW = 0.01
+
+DEFAULT_FADE_IN = 0.05
+DEFAULT_FADE_OUT = 0.5
+
+# ITU-R BS.1770 gating: 400 ms blocks with 75% overlap
+BLOCK_SECONDS = 0.4
+BLOCK_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+TRUE_PEAK_OVERSAMPLING = 4
+
+def _k_weighting_coefficients(sample_rate: int) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+    """Biquad coefficients of the BS.1770 pre-filter (high shelf) and RLB high-pass for any sample rate"""
+    # High shelf
+    gain_db, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = np.tan(np.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = np.array([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0])
+    shelf_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    # High-pass
+    q, fc = 0.5003270373238773, 38.13547087602444
+    k = np.tan(np.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass_b = np.array([1.0, -2.0, 1.0])
+    highpass_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    return (shelf_b, shelf_a), (highpass_b, highpass_a)
+
+def _biquad_response(b: np.ndarray, a: np.ndarray, n: int) -> np.ndarray:
+    """Complex frequency response of a biquad at the rfft bins of an n-point FFT"""
+    z = np.exp(-1j * np.pi * np.arange(n // 2 + 1) / (n // 2))
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+def k_weight(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Apply the K-weighting filter to all channels at once in the frequency domain.
+
+    The recursive filters are applied as one spectral multiplication instead of
+    a per-sample loop; with a zero-padded FFT the result matches time-domain
+    filtering to well within loudness measurement precision.
+    """
+    frames = len(samples)
+    n = 1 << int(np.ceil(np.log2(frames + sample_rate)))  # pad a second to absorb the filter tail
+    (shelf_b, shelf_a), (highpass_b, highpass_a) = _k_weighting_coefficients(sample_rate)
+    response = _biquad_response(shelf_b, shelf_a, n) * _biquad_response(highpass_b, highpass_a, n)
+    spectrum = np.fft.rfft(samples, n=n, axis=0)
+    return np.fft.irfft(spectrum * response[:, None], n=n, axis=0)[:frames]
+
+def integrated_loudness(samples: np.ndarray, sample_rate: int) -> float:
+    """
+    Gated integrated loudness (ITU-R BS.1770-4) in LUFS.
+
+    Args:
+        samples: float (frames, channels) array in [-1, 1]
+        sample_rate: Samples per second
+
+    Returns:
+        float: Integrated loudness, or -inf for silence or clips shorter than one block
+    """
+    weighted = k_weight(samples, sample_rate)
+    block = int(BLOCK_SECONDS * sample_rate)
+    step = int(BLOCK_STEP_SECONDS * sample_rate)
+    if len(weighted) < block:
+        return float("-inf")
+
+    # Mean square per block and channel from a cumulative sum (no per-block loop)
+    energy = np.concatenate((np.zeros((1, weighted.shape[1])), np.cumsum(weighted ** 2, axis=0)))
+    starts = np.arange(0, len(weighted) - block + 1, step)
+    block_power = (energy[starts + block] - energy[starts]) / block
+    # Channel weights are 1.0 for mono/stereo (surround channels are not used here)
+    block_sum = block_power.sum(axis=1)
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(block_sum)
+
+    gated = block_loudness > ABSOLUTE_GATE_LUFS
+    if not gated.any():
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(block_sum[gated].mean()) + RELATIVE_GATE_LU
+    gated &= block_loudness > relative_gate
+    return float(-0.691 + 10 * np.log10(block_sum[gated].mean()))
+
+def true_peak(samples: np.ndarray, chunk_frames: int = 1 << 16, overlap: int = 256) -> float:
+    """
+    Estimate the true peak in dBTP by 4x FFT oversampling.
+
+    Processed in overlapping chunks so long tracks do not need a 4x copy in
+    memory; the ringing at each chunk's (circular) edges falls in the overlap
+    and is ignored.
+    """
+    peak = float(np.abs(samples).max()) if len(samples) else 0.0
+    for start in range(0, len(samples), chunk_frames):
+        lo = max(0, start - overlap)
+        chunk = samples[lo:start + chunk_frames + overlap]
+        n = len(chunk)
+        if n < 2:
+            continue
+        upsampled = np.fft.irfft(np.fft.rfft(chunk, axis=0), n=n * TRUE_PEAK_OVERSAMPLING, axis=0)
+        inner_start = (start - lo) * TRUE_PEAK_OVERSAMPLING
+        inner_end = min(n, start - lo + chunk_frames) * TRUE_PEAK_OVERSAMPLING
+        peak = max(peak, float(np.abs(upsampled[inner_start:inner_end]).max()) * TRUE_PEAK_OVERSAMPLING)
+    return float(20 * np.log10(peak)) if peak > 0 else float("-inf")
+
+def silence_bounds(samples: np.ndarray, sample_rate: int, threshold_db: float = SILENCE_THRESHOLD_DB) -> Tuple[float, float]:
+    """Start and end time (seconds) of the non-silent part of the audio"""
+    window = max(1, int(SILENCE_WINDOW * sample_rate))
+    usable = len(samples) - len(samples) % window
+    if usable == 0:
+        return 0.0, len(samples) / sample_rate
+    power = (samples[:usable] ** 2).reshape(-1, window * samples.shape[1]).mean(axis=1)
+    loud = np.flatnonzero(power > 10 ** (threshold_db / 10))
+    if len(loud) == 0:
+        return 0.0, len(samples) / sample_rate
+    return float(loud[0] * window / sample_rate), float(min(len(samples), (loud[-1] + 1) * window) / sample_rate)
+
+def analyze_audio(
+    audio_path: str,
+    target_lufs: float = TARGET_LUFS,
+    true_peak_limit: float = TRUE_PEAK_LIMIT
+) -> Optional[Dict[str, Any]]:
+    """
+    Measure a WAV file and work out the gain needed to reach the loudness target.
+
+    Args:
+        audio_path: Path of the WAV file (memory-mapped, not loaded)
+        target_lufs: Integrated loudness target
+        true_peak_limit: Maximum true peak after gain
+
+    Returns:
+        Optional[Dict[str, Any]]: loudness, true_peak, gain_db, trim_start and trim_end,
+        or None if the file could not be read
+    """
+    try:
+        raw, info = open_wav(audio_path)
+    except (OSError, ValueError) as e:
+        print(f"Error reading audio {audio_path}: {e}")
+        return None
+    samples = to_float(raw)
+
+    loudness = integrated_loudness(samples, info.sample_rate)
+    peak = true_peak(samples)
+    trim_start, trim_end = silence_bounds(samples, info.sample_rate)
+
+    if np.isfinite(loudness):
+        gain_db = target_lufs - loudness
+        if np.isfinite(peak):
+            # Never push the true peak over the limit
+            gain_db = min(gain_db, true_peak_limit - peak)
+    else:
+        gain_db = 0.0
+
+    return {
+        "loudness": loudness,
+        "true_peak": peak,
+        "gain_db": float(gain_db),
+        "trim_start": trim_start,
+        "trim_end": trim_end,
+        "duration": info.duration,
+    }
+
+def build_audio_filter(
+    analysis: Dict[str, Any],
+    output_duration: float,
+    fade_in: float = DEFAULT_FADE_IN,
+    fade_out: float = DEFAULT_FADE_OUT
+) -> str:
+    """
+    Build the ffmpeg audio filter that applies the measured gain, silence trim
+    and fades in the same encode as the merge.
+
+    Args:
+        analysis: Result of analyze_audio()
+        output_duration: Length of the merged output in seconds (for the fade-out)
+        fade_in: Fade-in length in seconds
+        fade_out: Fade-out length in seconds
+
+    Returns:
+        str: Filter string for -af
+    """
+    filters = [
+        f"atrim=start={analysis['trim_start']:.3f}:end={analysis['trim_end']:.3f}",
+        "asetpts=PTS-STARTPTS",
+        f"volume={analysis['gain_db']:.2f}dB",
+    ]
+    if fade_in > 0:
+        filters.append(f"afade=t=in:st=0:d={fade_in:.3f}")
+    if fade_out > 0 and output_duration > fade_out:
+        filters.append(f"afade=t=out:st={output_duration - fade_out:.3f}:d={fade_out:.3f}")
+    return ",".join(filters)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure loudness, true peak and silence of WAV files")
+    parser.add_argument("files", nargs="+", help="WAV files to analyse")
+    parser.add_argument("--target-lufs", type=float, default=TARGET_LUFS, help=f"Loudness target (default: {TARGET_LUFS})")
+    args = parser.parse_args()
+    for path in args.files:
+        result = analyze_audio(path, args.target_lufs)
+        if result:
+            print(f"{path}: {result['loudness']:.1f} LUFS, true peak {result['true_peak']:.1f} dBTP, "
+                  f"gain {result['gain_db']:+.1f} dB, audio {result['trim_start']:.2f}s-{result['trim_end']:.2f}s")
@@ -1,12 +1,21 @@
 import os
+import time
 import asyncio
 import json
-from openai import OpenAI
-from services.utils import load_env_vars
+from typing import Optional
+from services.utils import load_env_vars, get_openai_client
 from music_generation import generate_music_async
+from music_pool import get_pooled_music_async
 from video_generation import generate_game_video_async
-from merge_audio_video import merge_audio_video
-from services.tweet import tweet
+from image_index import ImageIndex
+from prompt_index import PromptIndex
+from merge_audio_video import merge_audio_video_async, get_media_duration_async
+from run_catalog import RunCatalog, new_run_id
+from video_qa import check_video_async
+from services.tweet import tweet_async
+from posting_queue import PostingQueue
+from model_registry import run_text_model, expected_latency
+from services.task_group import gather_or_cancel
 
 # Load environment variables
 load_env_vars()
@@ -17,11 +26,21 @@ IMAGE_FILENAME = "game_image.jpg"
 VIDEO_FILENAME = "game_video.mp4"
 FINAL_FILENAME = "final_game_content.mp4"
 
+# How the ~5 s clip is extended to the length of the music (see merge_audio_video.FIT_MODES)
+VIDEO_FIT_MODE = "crossfade"
+
+# Take the soundtrack from the pool of pre-sliced segments (see music_pool.py)
+# instead of generating a new track for every run
+USE_MUSIC_POOL = False
+
+# Bring every post to the same loudness and trim silence during the merge (see audio_analysis.py)
+NORMALIZE_AUDIO = True
+
 async def generate_twitter_content(video_prompt: str, music_prompt: str) -> str:
     """
     Generate engaging Twitter content using GPT-4.
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_openai_client()
     
     prompt = f"""
     Create a viral-worthy, slightly controversial tweet about this game concept:
@@ -69,93 +88,246 @@ async def generate_twitter_content(video_prompt: str, music_prompt: str) -> str:
     - Address current gaming controversies
     """
     
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
+    # The OpenAI client is synchronous; run it in a thread so other runs keep going
+    response = await asyncio.to_thread(
+        run_text_model,
+        client,
         messages=[
             {"role": "system", "content": "You are a viral game content strategist and copywriter for an AI-driven game studio. Your tweets are known for their high engagement rates and ability to go viral through slightly controversial but thought-provoking content. You excel at creating emotionally resonant content that makes viewers stop scrolling and engage in discussion. You're not afraid to challenge industry norms while maintaining professionalism. You're an expert at hashtag strategy and know exactly which gaming hashtags are trending and will maximize engagement."},
             {"role": "user", "content": prompt}
         ],
         temperature=0.9,  # Increased temperature for more creative variations
     )
+    if not response:
+        raise RuntimeError("No text model could generate the tweet")
     
-    return response.choices[0].message.content.strip()
+    return response[0].strip()
 
-async def create_game_content():
-    """
-    Main function to orchestrate the entire content creation workflow.
-    """
-    print("\n=== Starting Game Content Creation ===")
-    
-    # Create necessary directories
-    input_dir = "input"
-    output_dir = "output"
-    prompts_dir = "prompts"
+def _run_dirs(run_id: str):
+    """input/<run_id>/ and output/<run_id>/ of a run (created if missing)"""
+    input_dir = os.path.join("input", run_id)
+    output_dir = os.path.join("output", run_id)
     os.makedirs(input_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(prompts_dir, exist_ok=True)  # Create prompts directory
-    
-    # Define file paths
-    music_path = os.path.join(input_dir, MUSIC_FILENAME)
-    image_path = os.path.join(input_dir, IMAGE_FILENAME)
-    video_path = os.path.join(input_dir, VIDEO_FILENAME)
-    final_path = os.path.join(output_dir, FINAL_FILENAME)
+    return input_dir, output_dir
+
+async def _existing_artifact(catalog: RunCatalog, run_id: str, kind: str):
+    """Path of an artifact a previous attempt of this run already produced, if the file is still there"""
+    for artifact in reversed(await asyncio.to_thread(catalog.get_artifacts, run_id, kind)):
+        if artifact["path"] and os.path.exists(artifact["path"]):
+            return artifact["path"]
+    return None
+
+async def run_prompt_stage(catalog: RunCatalog, run_id: str, prompt_index: Optional[PromptIndex] = None) -> bool:
+    """
+    Stage 1: generate the prompts and create the run in the catalog (skipped if the run exists)
     
-    # Step 1: Generate prompts
+    A long-running process passes its prompt_index so it is not reloaded for every run.
+    """
+    if await asyncio.to_thread(catalog.get_run, run_id):
+        return True
     print("\n1. Generating prompts...")
-    from prompt_generate import generate_prompts, save_prompts_to_files
+    from prompt_generate import generate_unique_prompts, save_prompts_to_files
     
-    video_prompt, music_prompt = generate_prompts()
+    prompts_dir = "prompts"
+    os.makedirs(prompts_dir, exist_ok=True)  # Create prompts directory
+    stage_start = time.monotonic()
+    video_prompt, music_prompt, visual_style = await asyncio.to_thread(generate_unique_prompts, index=prompt_index)
     if not video_prompt or not music_prompt:
         print("Failed to generate prompts. Exiting.")
-        return
+        return False
+    style_category, style = visual_style
+    await asyncio.to_thread(catalog.start_run, video_prompt, music_prompt, style_category, style, run_id=run_id)
+    await asyncio.to_thread(catalog.record_timing, run_id, "prompts", time.monotonic() - stage_start)
     
-    # Save prompts to files
+    # Save the latest prompts to files (the full history is in the run catalog)
     save_prompts_to_files(
         video_prompt,
         music_prompt,
         os.path.join(prompts_dir, "video_prompt.txt"),  # Use os.path.join for proper path handling
         os.path.join(prompts_dir, "music_prompt.txt")   # Use os.path.join for proper path handling
     )
+    return True
+
+async def run_media_stage(catalog: RunCatalog, run_id: str, deadline: Optional[float] = None,
+                          image_index: Optional[ImageIndex] = None) -> bool:
+    """
+    Stage 2: generate the music and the video and check the video.
+    
+    Media that an earlier attempt of the run already produced is reused, so a
+    retried stage only redoes what is missing. Catalog calls run in threads,
+    like the job queue's: another host may hold the shared database's lock.
+    
+    deadline is a Unix time by which the video should be ready; the image model
+    gets whatever time the video model is not expected to need, so a run that
+    is behind schedule falls back to a faster image model.
     
-    # Step 2: Generate media content
+    image_index is the duplicate image index to use (loaded from disk if not given).
+    """
+    run = await asyncio.to_thread(catalog.get_run, run_id)
+    if not run:
+        print(f"Run not found: {run_id}")
+        return False
+    input_dir, _ = _run_dirs(run_id)
     print("\n2. Generating media content...")
     
-    # Generate music
-    print("\nGenerating music...")
-    music_file = await generate_music_async(
-        prompt=music_prompt,
-        duration=10,  # Minimum duration for music
-        output_folder=input_dir,
-        output_filename=MUSIC_FILENAME  # Use consistent filename
-    )
+    async def produce_music() -> Optional[str]:
+        music_file = await _existing_artifact(catalog, run_id, "music")
+        if music_file:
+            print(f"Reusing music: {music_file}")
+            return music_file
+        print("\nGenerating music...")
+        stage_start = time.monotonic()
+        music_info = {}
+        if USE_MUSIC_POOL:
+            music_file = await get_pooled_music_async(
+                run["music_prompt"],
+                duration=10,
+                output_folder=input_dir,
+                output_filename=MUSIC_FILENAME,
+                run_info=music_info
+            )
+        else:
+            music_file = await generate_music_async(
+                prompt=run["music_prompt"],
+                duration=10,  # Minimum duration for music
+                output_folder=input_dir,
+                output_filename=MUSIC_FILENAME,  # Use consistent filename
+                run_info=music_info
+            )
+        await asyncio.to_thread(catalog.record_timing, run_id, "music", time.monotonic() - stage_start)
+        
+        if not music_file:
+            print("Music generation failed.")
+            return None
+        duration = await get_media_duration_async(music_file)
+        await asyncio.to_thread(catalog.add_artifact, run_id, "music", music_file, music_info.get("url"),
+                                music_info.get("model"), music_info.get("arguments"), duration)
+        return music_file
     
-    if not music_file:
-        print("Music generation failed. Exiting.")
-        return
+    async def produce_video() -> Optional[str]:
+        # Generate video using two-stage process (image -> video)
+        video_file = await _existing_artifact(catalog, run_id, "video")
+        if video_file:
+            print(f"Reusing video: {video_file}")
+            return video_file
+        print("\nGenerating video (two-stage process)...")
+        stage_start = time.monotonic()
+        video_info = {}
+        image_deadline = None
+        if deadline is not None:
+            image_deadline = deadline - time.time() - expected_latency("video")
+        video_file = await generate_game_video_async(
+            prompt=run["video_prompt"],
+            output_folder=input_dir,
+            image_filename=IMAGE_FILENAME,
+            video_filename=VIDEO_FILENAME,
+            run_info=video_info,
+            image_deadline=image_deadline,
+            image_index=image_index
+        )
+        await asyncio.to_thread(catalog.record_timing, run_id, "video", time.monotonic() - stage_start)
+        
+        image = video_info.get("image")
+        if image:
+            await asyncio.to_thread(catalog.add_artifact, run_id, "image", image["file_path"], image["url"],
+                                    image["model"], image["arguments"])
+        if not video_file:
+            print("Video generation failed.")
+            return None
+        video = video_info.get("video", {})
+        duration = await get_media_duration_async(video_file)
+        await asyncio.to_thread(catalog.add_artifact, run_id, "video", video_file, video.get("url"),
+                                video.get("model"), video.get("arguments"), duration)
+        return video_file
     
-    # Generate video using two-stage process (image -> video)
-    print("\nGenerating video (two-stage process)...")
-    video_file = await generate_game_video_async(
-        prompt=video_prompt,
-        output_folder=input_dir,
-        image_filename=IMAGE_FILENAME,
-        video_filename=VIDEO_FILENAME
-    )
+    # Music and video are generated at the same time; if one of them fails the
+    # other is cancelled, including its fal job, instead of finishing for nothing
+    music_file, video_file = await gather_or_cancel(produce_music(), produce_video())
+    if not music_file or not video_file:
+        print("Media generation failed. Exiting.")
+        await asyncio.to_thread(catalog.finish_run, run_id, "failed")
+        return False
     
-    if not video_file:
-        print("Video generation failed. Exiting.")
-        return
+    # Check the clip for black frames, frozen motion and flicker before merging and posting
+    qa_report = await check_video_async(video_file)
+    if qa_report is None:
+        print("Video QA could not decode the clip. Exiting.")
+        await asyncio.to_thread(catalog.finish_run, run_id, "failed")
+        return False
+    if qa_report["verdict"] == "reject":
+        print("Video failed QA. Exiting.")
+        await asyncio.to_thread(catalog.finish_run, run_id, "rejected")
+        return False
+    if qa_report["verdict"] == "flag":
+        # Merged as usual, but kept out of automatic posting until someone reviews it
+        print("Warning: Video was flagged by QA. Review it before posting.")
+        await asyncio.to_thread(catalog.update_run, run_id, status="flagged")
+    return True
+
+async def run_merge_stage(catalog: RunCatalog, run_id: str) -> Optional[str]:
+    """
+    Stage 3: merge music and video and write the tweet text; returns the final video path
     
-    # Step 3: Merge audio and video
-    print("\n3. Merging audio and video...")
-    success = merge_audio_video(video_file, music_file, final_path)
-    if not success:
-        print("Failed to merge audio and video. Exiting.")
-        return
+    A run flagged by QA keeps the "flagged" status, so it is not posted automatically.
+    """
+    run = await asyncio.to_thread(catalog.get_run, run_id)
+    music_file = await _existing_artifact(catalog, run_id, "music")
+    video_file = await _existing_artifact(catalog, run_id, "video")
+    if not run or not music_file or not video_file:
+        print(f"Run {run_id} has no music or video to merge")
+        return None
+    _, output_dir = _run_dirs(run_id)
     
-    # Step 4: Generate Twitter content
-    print("\n4. Generating Twitter content...")
-    twitter_content = await generate_twitter_content(video_prompt, music_prompt)
+    final_path = await _existing_artifact(catalog, run_id, "final")
+    if not final_path:
+        # Step 3: Merge audio and video
+        print("\n3. Merging audio and video...")
+        final_path = os.path.join(output_dir, FINAL_FILENAME)
+        stage_start = time.monotonic()
+        success = await merge_audio_video_async(video_file, music_file, final_path, fit_mode=VIDEO_FIT_MODE, normalize_audio=NORMALIZE_AUDIO)
+        await asyncio.to_thread(catalog.record_timing, run_id, "merge", time.monotonic() - stage_start)
+        if not success:
+            print("Failed to merge audio and video. Exiting.")
+            await asyncio.to_thread(catalog.finish_run, run_id, "failed")
+            return None
+        duration = await get_media_duration_async(final_path)
+        await asyncio.to_thread(catalog.add_artifact, run_id, "final", final_path, duration=duration)
+    
+    if not run["tweet_text"]:
+        # Step 4: Generate Twitter content
+        print("\n4. Generating Twitter content...")
+        tweet_text = await generate_twitter_content(run["video_prompt"], run["music_prompt"])
+        await asyncio.to_thread(catalog.record_tweet, run_id, None, tweet_text)
+    await asyncio.to_thread(catalog.finish_run, run_id, "flagged" if run["status"] == "flagged" else "completed")
+    return final_path
+
+async def create_game_content():
+    """
+    Main function to orchestrate the entire content creation workflow.
+    
+    Each run writes its media into its own input/<run_id>/ and output/<run_id>/
+    folders and is recorded in the run catalog (see run_catalog.py), so earlier
+    runs are never overwritten. The stages can also run as separate jobs on
+    several machines (see job_worker.py).
+    """
+    print("\n=== Starting Game Content Creation ===")
+    
+    catalog = RunCatalog()
+    run_id = new_run_id()
+    print(f"Run ID: {run_id}")
+    
+    if not await run_prompt_stage(catalog, run_id):
+        return
+    if not await run_media_stage(catalog, run_id):
+        return
+    final_path = await run_merge_stage(catalog, run_id)
+    if not final_path:
+        return
+    run = await asyncio.to_thread(catalog.get_run, run_id)
+    twitter_content = run["tweet_text"]
+    if run["status"] == "flagged":
+        print("\nNote: QA flagged this video; watch it before posting.")
     
     # Step 5: Print results
     print("\n=== Content Creation Complete ===")
@@ -163,17 +335,26 @@ async def create_game_content():
     print(twitter_content)
     print(f"\nFinal Video: {final_path}")
     
-    # Optional: Post to Twitter
-    post_to_twitter = input("\nWould you like to post this to Twitter? (y/n): ").lower()
+    # Optional: Post to Twitter now, or queue it for every account (see posting_queue.py)
+    post_to_twitter = (await asyncio.to_thread(
+        input, "\nWould you like to post this to Twitter? (y = post now / q = queue for all accounts / n): ")).lower()
     if post_to_twitter == 'y':
         try:
-            tweet_id = tweet(twitter_content, final_path)
+            tweet_id = await tweet_async(twitter_content, final_path)
             if tweet_id:
                 print(f"Successfully posted to Twitter! Tweet ID: {tweet_id}")
+                await asyncio.to_thread(catalog.record_tweet, run_id, str(tweet_id), twitter_content)
             else:
                 print("Failed to post to Twitter.")
         except Exception as e:
             print(f"Error posting to Twitter: {e}")
+    elif post_to_twitter == 'q':
+        queue = PostingQueue()
+        try:
+            post_ids = queue.enqueue(twitter_content, final_path, run_id=run_id)
+        finally:
+            queue.close()
+        print(f"Queued {len(post_ids)} post(s). Run 'python posting_queue.py work' to send them.")
 
 if __name__ == "__main__":
     asyncio.run(create_game_content()) 
\ No newline at end of file
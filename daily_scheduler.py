@@ -16,7 +16,11 @@ logging.basicConfig(
 )
 
 def run_game_content():
-    """Run the create_game_content.py script"""
+    """Run the create_game_content.py script, or submit a run to the shared job queue if JOB_QUEUE_URL is set"""
+    queue_url = os.getenv('JOB_QUEUE_URL')
+    if queue_url:
+        submit_game_content(queue_url)
+        return
     try:
         logging.info("Starting game content generation...")
         
@@ -41,10 +45,42 @@ def run_game_content():
     except Exception as e:
         logging.error(f"Error running game content generation: {e}")
 
+def submit_game_content(queue_url):
+    """Submit a run for the worker hosts (see job_worker.py) instead of generating it here"""
+    from services.job_queue import open_job_queue
+    from job_worker import submit_runs
+    try:
+        queue = open_job_queue(queue_url)
+        try:
+            run_ids = submit_runs(queue, 1, post=True)
+        finally:
+            queue.close()
+        logging.info(f"Submitted run {run_ids[0]} to {queue_url}")
+    except Exception as e:
+        logging.error(f"Error submitting game content run: {e}")
+
+def run_retention(policy):
+    """Evict old media past the RETENTION_* limits, a bounded number of files per call (see retention.py)"""
+    from retention import RetentionManager
+    try:
+        summary = RetentionManager(policy, archive_dir=os.getenv('RETENTION_ARCHIVE_DIR')).run_pass()
+        if summary["evicted"]:
+            logging.info(f"Retention freed {summary['freed_bytes'] / 1024 ** 2:.1f} MB "
+                         f"({summary['evicted']} files, {summary['pending']} pending)")
+    except Exception as e:
+        logging.error(f"Error running retention pass: {e}")
+
 def main():
     # Schedule the job to run daily at 9:00 AM
     schedule.every().day.at("09:00").do(run_game_content)
     
+    # Keep the media folders within RETENTION_MAX_GB / RETENTION_MAX_AGE_DAYS if set
+    from retention import RetentionPolicy
+    policy = RetentionPolicy.from_env()
+    if policy:
+        schedule.every(10).minutes.do(run_retention, policy)
+        logging.info("Retention passes enabled every 10 minutes")
+    
     logging.info("Scheduler started. Will run daily at 9:00 AM")
     logging.info("Press Ctrl+C to exit")
     
@@ -1,10 +1,14 @@
 import os
 import argparse
-import subprocess
 import time
 import asyncio
-from prompt_generate import generate_prompts, save_prompts_to_files
+from typing import Dict, List, Tuple
+from prompt_generate import generate_unique_prompts, save_prompts_to_files
 from services.utils import load_env_vars
+from services.folder_watch import StableFileWatcher, DEFAULT_STABLE_SECONDS
+from visual_styles import get_categories
+from merge_audio_video import (merge_audio_video, merge_audio_video_async, find_first_video_file,
+                               find_first_audio_file, add_ffmpeg_to_path, FIT_MODES)
 
 # Load environment variables
 load_env_vars()
@@ -39,21 +43,7 @@ async def async_generate_music(music_prompt_file, duration, input_dir):
 
 def get_visual_style_categories():
     """Return the list of visual style categories"""
-    return [
-        "Traditional Art Styles",
-        "Modern Art Movements",
-        "Digital & Contemporary",
-        "Pixel Art Styles",
-        "Film & Photography",
-        "Animation Styles",
-        "Video Game Aesthetics",
-        "Experimental/Abstract", 
-        "International Styles",
-        "Historical Periods", 
-        "Mixed Media",
-        "Textures & Materials",
-        "Lighting Techniques"
-    ]
+    return get_categories()
 
 def prompt_for_visual_style():
     """Prompt the user to select a visual style category and return it"""
@@ -64,23 +54,125 @@ def prompt_for_visual_style():
     for idx, category in enumerate(categories, 1):
         print(f"{idx}. {category}")
     
-    print("13. Random (let the system choose)")
+    random_choice = len(categories) + 1
+    print(f"{random_choice}. Random (let the system choose)")
     
     # Get user selection
     while True:
         try:
-            selection = input("\nEnter the number of your choice (1-13): ")
+            selection = input(f"\nEnter the number of your choice (1-{random_choice}): ")
             selection_num = int(selection)
-            if 1 <= selection_num <= 13:
-                if selection_num == 13:
+            if 1 <= selection_num <= random_choice:
+                if selection_num == random_choice:
                     return None  # Random selection
                 else:
                     return categories[selection_num - 1]
             else:
-                print("Please enter a number between 1 and 13.")
+                print(f"Please enter a number between 1 and {random_choice}.")
         except ValueError:
             print("Please enter a valid number.")
 
+# With --pair-by-arrival, a file whose namesake has not shown up after this many
+# seconds is paired with another waiting file in arrival order
+ARRIVAL_PAIRING_GRACE = 30.0
+
+def pair_media(videos: List[str], audios: List[str], by_arrival: bool = False) -> List[Tuple[str, str]]:
+    """
+    Pair waiting videos with waiting audio files and remove the pairs from both lists.
+
+    Files with the same name (clip.mp4 + clip.wav) are paired. With
+    by_arrival, the remaining files are then paired in the order they arrived.
+    """
+    pairs = []
+    audio_by_stem = {os.path.splitext(os.path.basename(audio))[0]: audio for audio in audios}
+    for video in list(videos):
+        audio = audio_by_stem.get(os.path.splitext(os.path.basename(video))[0])
+        if audio in audios:
+            pairs.append((video, audio))
+            videos.remove(video)
+            audios.remove(audio)
+    while by_arrival and videos and audios:
+        pairs.append((videos.pop(0), audios.pop(0)))
+    return pairs
+
+def _is_up_to_date(output_path: str, *input_paths: str) -> bool:
+    """True if output_path exists and is newer than all inputs (merged by an earlier watch)"""
+    if not os.path.exists(output_path):
+        return False
+    return all(os.path.getmtime(output_path) >= os.path.getmtime(path) for path in input_paths)
+
+async def watch_and_merge(input_dir: str, output_dir: str, fit_mode: str = "none", normalize_audio: bool = False,
+                          stable_seconds: float = DEFAULT_STABLE_SECONDS, once: bool = False,
+                          by_arrival: bool = False) -> None:
+    """
+    Merge every MP4/WAV pair that appears in input_dir, without any prompts.
+
+    Files are picked up as soon as they are completely written (see
+    services.folder_watch), paired by name (see pair_media()) and merged
+    in-process into output_dir/<video name>_merged.mp4. With by_arrival, files
+    whose namesake has not appeared within ARRIVAL_PAIRING_GRACE seconds (or
+    by the end of a once run) are paired in arrival order instead. Pairs that
+    were merged by an earlier watch are skipped. With once, the files already
+    in the folder are merged and the function returns.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    watcher = StableFileWatcher(input_dir, (".mp4", ".wav"), stable_seconds)
+    videos: List[str] = []
+    audios: List[str] = []
+    arrived: Dict[str, float] = {}
+    merges = set()
+    
+    async def merge(video: str, audio: str, output_path: str) -> None:
+        print(f"Merging {os.path.basename(video)} + {os.path.basename(audio)} -> {output_path}")
+        if await merge_audio_video_async(video, audio, output_path, fit_mode=fit_mode, normalize_audio=normalize_audio):
+            print(f"Merged: {output_path}")
+        else:
+            print(f"Failed to merge {video} and {audio}")
+    
+    def start_merges(pairs: List[Tuple[str, str]]) -> None:
+        for video, audio in pairs:
+            output_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(video))[0]}_merged.mp4")
+            if _is_up_to_date(output_path, video, audio):
+                print(f"Already merged: {output_path}")
+                continue
+            task = asyncio.create_task(merge(video, audio, output_path))
+            merges.add(task)
+            task.add_done_callback(merges.discard)
+    
+    def pair_overdue(grace: float) -> None:
+        # Only files that waited long enough for their namesake are paired by arrival
+        now = time.monotonic()
+        overdue_videos = [video for video in videos if now - arrived[video] >= grace]
+        overdue_audios = [audio for audio in audios if now - arrived[audio] >= grace]
+        pairs = pair_media(overdue_videos, overdue_audios, by_arrival=True)
+        for video, audio in pairs:
+            videos.remove(video)
+            audios.remove(audio)
+        start_merges(pairs)
+    
+    print(f"Watching '{input_dir}' for MP4/WAV pairs (Ctrl+C to stop)...")
+    try:
+        heartbeat = ARRIVAL_PAIRING_GRACE / 2 if by_arrival else None
+        async for files in watcher.watch(until_idle=once, heartbeat=heartbeat):
+            for path in files:
+                waiting = videos if path.lower().endswith(".mp4") else audios
+                if path in waiting:
+                    waiting.remove(path)
+                waiting.append(path)
+                arrived[path] = time.monotonic()
+            start_merges(pair_media(videos, audios))
+            if by_arrival:
+                pair_overdue(ARRIVAL_PAIRING_GRACE)
+        if by_arrival:
+            # Nothing else is coming in a once run
+            pair_overdue(0)
+        await asyncio.gather(*merges)
+    finally:
+        for task in merges:
+            task.cancel()
+    for path in videos + audios:
+        print(f"No partner found for: {path}")
+
 def main():
     parser = argparse.ArgumentParser(description="Generate prompts, create media, and merge them")
     parser.add_argument("--ffmpeg-path", help="Path to FFmpeg executable if not in PATH")
@@ -89,8 +181,22 @@ def main():
     parser.add_argument("--music-duration", type=int, default=6, help="Duration of music in seconds (default: 6)")
     parser.add_argument("--async", dest="use_async", action="store_true", help="Use async API for music generation")
     parser.add_argument("--random-style", action="store_true", help="Skip visual style selection and use random style")
+    parser.add_argument("--watch", action="store_true",
+                        help="Unattended: merge every MP4/WAV pair placed in the input directory as soon as it is written")
+    parser.add_argument("--once", action="store_true", help="With --watch, merge the files already there and exit")
+    parser.add_argument("--stable-seconds", type=float, default=DEFAULT_STABLE_SECONDS,
+                        help=f"With --watch, seconds a file must stay unchanged before it is merged (default: {DEFAULT_STABLE_SECONDS})")
+    parser.add_argument("--fit-mode", choices=FIT_MODES, default="none",
+                        help="How to extend a video shorter than the audio (default: none)")
+    parser.add_argument("--normalize", action="store_true", help="Normalize the audio loudness when merging")
+    parser.add_argument("--pair-by-arrival", action="store_true",
+                        help=f"With --watch, pair files without a same-named partner in arrival order "
+                             f"after {ARRIVAL_PAIRING_GRACE:.0f}s")
     args = parser.parse_args()
     
+    if args.ffmpeg_path:
+        add_ffmpeg_to_path(args.ffmpeg_path)
+    
     # Create necessary directories
     input_dir = "input"
     output_dir = "output"
@@ -100,6 +206,14 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     os.makedirs(prompts_dir, exist_ok=True)
     
+    if args.watch:
+        try:
+            asyncio.run(watch_and_merge(input_dir, output_dir, args.fit_mode, args.normalize,
+                                        args.stable_seconds, args.once, args.pair_by_arrival))
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+        return
+    
     video_prompt_file = os.path.join(prompts_dir, "video_prompt.txt")
     music_prompt_file = os.path.join(prompts_dir, "music_prompt.txt")
     
@@ -119,7 +233,7 @@ def main():
     # Step 1: Generate prompts
     if not args.skip_prompt_generation:
         print("Generating prompts...")
-        video_prompt, music_prompt = generate_prompts(visual_style_category=visual_style)
+        video_prompt, music_prompt, _ = generate_unique_prompts(visual_style_category=visual_style)
         
         if video_prompt and music_prompt:
             save_prompts_to_files(
@@ -207,13 +321,16 @@ def main():
     if user_input.lower() == 'q':
         return
     
-    # Step 3: Run the merge_audio_video.py script
-    merge_cmd = ["python", "merge_audio_video.py"]
-    if args.ffmpeg_path:
-        merge_cmd.extend(["--ffmpeg-path", args.ffmpeg_path])
+    # Step 3: Merge the first video and audio file in the input directory
+    video_path = find_first_video_file(input_dir)
+    audio_path = find_first_audio_file(input_dir)
+    if not video_path or not audio_path:
+        print(f"No {'MP4 video' if not video_path else 'WAV audio'} file found in {input_dir}")
+        return
     
-    print("\nRunning merge_audio_video.py...")
-    subprocess.run(merge_cmd)
+    print(f"\nMerging {video_path} and {audio_path}...")
+    merge_audio_video(video_path, audio_path, os.path.join(output_dir, "merged_media.mp4"),
+                      fit_mode=args.fit_mode, normalize_audio=args.normalize)
     
     print("\nProcess complete!")
     print("Check the 'output' directory for your merged video.")
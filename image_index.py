@@ -0,0 +1,95 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+import numpy as np
+from services.hash_index import HammingIndex
+from services.file_lock import FileLock
+from services.media_io import decode_image, decode_image_async
+from prompt_index import PREVIEW_CHARS
+
+IMAGE_INDEX_FILE = os.path.join("prompts", "index", "image_hashes.jsonl")
+
+# pHash distance (out of 64 bits) at or below which two images count as visual duplicates
+DEFAULT_MAX_DISTANCE = 8
+
+# Images are reduced to HASH_SIZE x HASH_SIZE before the DCT; the top-left
+# LOW_FREQ x LOW_FREQ coefficients form the 64-bit hash
+HASH_SIZE = 32
+LOW_FREQ = 8
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct(x) == D @ x"""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+_DCT = _dct_matrix(HASH_SIZE)[:LOW_FREQ]
+
+def phash_arrays(images: np.ndarray) -> np.ndarray:
+    """
+    Perceptual hash of a batch of grayscale images in one vectorized pass.
+
+    Args:
+        images: Array of shape (N, HASH_SIZE, HASH_SIZE) or a single (HASH_SIZE, HASH_SIZE) image
+
+    Returns:
+        np.ndarray: uint64 array of shape (N,) with one hash per image
+    """
+    images = np.asarray(images, dtype=np.float64)
+    if images.ndim == 2:
+        images = images[None]
+    # Only the low-frequency block is needed: D[:8] @ X @ D[:8].T
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, images, _DCT).reshape(len(images), -1)
+    # Median without the DC term, which only tracks overall brightness
+    medians = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(coeffs > medians, axis=1)
+    return bits.view(">u8").ravel().astype(np.uint64)
+
+def phash_file(path: str) -> Optional[int]:
+    """Perceptual hash of an image file, or None if it could not be decoded"""
+    pixels = decode_image(path, HASH_SIZE, HASH_SIZE, "gray")
+    if pixels is None:
+        return None
+    return int(phash_arrays(pixels)[0])
+
+async def phash_file_async(path: str) -> Optional[int]:
+    """Async version of phash_file() that decodes without blocking the event loop"""
+    pixels = await decode_image_async(path, HASH_SIZE, HASH_SIZE, "gray")
+    if pixels is None:
+        return None
+    return int(phash_arrays(pixels)[0])
+
+class ImageIndex:
+    """Persistent index of perceptual hashes of generated images.
+
+    Attributes:
+        max_distance: pHash distance at or below which images are duplicates
+    """
+
+    def __init__(self, path: str = IMAGE_INDEX_FILE, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.path = path
+        self.index = HammingIndex(max_distance, path)
+
+    @contextmanager
+    def locked(self) -> Iterator["ImageIndex"]:
+        """Hold the index lock and catch up with other processes; see PromptIndex.locked()"""
+        with FileLock(f"{self.path}.lock"):
+            self.index.refresh()
+            yield self
+
+    def find_duplicate(self, image_hash: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Return (distance, entry) of the closest earlier image within max_distance, or None"""
+        return self.index.nearest(image_hash)
+
+    def add(self, image_hash: int, image_path: str, image_url: str = "", prompt: str = "") -> None:
+        """Record an accepted image so later runs are compared against it"""
+        self.index.add(image_hash, {
+            "file_path": image_path,
+            "url": image_url,
+            "prompt": prompt[:PREVIEW_CHARS],
+            "added_at": time.time()
+        })
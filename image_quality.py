@@ -0,0 +1,102 @@
+import asyncio
+from typing import Dict, List, Optional
+import numpy as np
+from services.media_io import decode_image, decode_image_async
+
+# Images are scored on a small RGB thumbnail; the metrics are relative, so full
+# resolution adds decode time without changing which candidate wins
+SCORE_WIDTH = 320
+SCORE_HEIGHT = 180
+
+# Grayscale standard deviation below which an image is considered blank
+BLANK_STD_THRESHOLD = 6.0
+
+# Pixels at or beyond these levels count as clipped shadows/highlights
+CLIP_LOW = 3
+CLIP_HIGH = 252
+
+def image_metrics(images: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute quality metrics for a batch of RGB images in one vectorized pass.
+
+    Args:
+        images: uint8 array of shape (N, H, W, 3)
+
+    Returns:
+        Dict[str, np.ndarray]: One value per image for each metric:
+            sharpness - variance of the Laplacian of the grayscale image
+            colorfulness - Hasler-Suesstrunk colorfulness
+            clipping - fraction of pixels with clipped shadows or highlights
+            contrast - standard deviation of the grayscale image
+            blank - True for near-uniform images
+    """
+    rgb = images.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+
+    laplacian = (gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+                 - 4.0 * gray[:, 1:-1, 1:-1])
+    sharpness = laplacian.reshape(len(images), -1).var(axis=1)
+
+    rg = (r - g).reshape(len(images), -1)
+    yb = (0.5 * (r + g) - b).reshape(len(images), -1)
+    colorfulness = (np.sqrt(rg.std(axis=1) ** 2 + yb.std(axis=1) ** 2)
+                    + 0.3 * np.sqrt(rg.mean(axis=1) ** 2 + yb.mean(axis=1) ** 2))
+
+    flat_gray = gray.reshape(len(images), -1)
+    clipping = ((flat_gray <= CLIP_LOW) | (flat_gray >= CLIP_HIGH)).mean(axis=1)
+    contrast = flat_gray.std(axis=1)
+
+    return {
+        "sharpness": sharpness,
+        "colorfulness": colorfulness,
+        "clipping": clipping,
+        "contrast": contrast,
+        "blank": contrast < BLANK_STD_THRESHOLD,
+    }
+
+def score_images(images: np.ndarray) -> np.ndarray:
+    """
+    Combine the metrics into one score per image (higher is better).
+
+    Sharpness and colorfulness are log-scaled so one extreme value cannot
+    dominate; clipped exposure is penalized and blank images score -inf.
+
+    Args:
+        images: uint8 array of shape (N, H, W, 3)
+
+    Returns:
+        np.ndarray: float array of shape (N,)
+    """
+    metrics = image_metrics(images)
+    scores = (np.log1p(metrics["sharpness"])
+              + 0.5 * np.log1p(metrics["colorfulness"])
+              - 4.0 * metrics["clipping"])
+    return np.where(metrics["blank"], -np.inf, scores)
+
+def rank_image_files(paths: List[str]) -> List[Optional[float]]:
+    """
+    Score image files, returning None for files that could not be decoded.
+
+    Args:
+        paths: Image file paths
+
+    Returns:
+        List[Optional[float]]: Score per path, in the same order
+    """
+    decoded = [decode_image(path, SCORE_WIDTH, SCORE_HEIGHT, "rgb24") for path in paths]
+    return _score_decoded(decoded)
+
+async def rank_image_files_async(paths: List[str]) -> List[Optional[float]]:
+    """Async version of rank_image_files() that decodes the candidates concurrently"""
+    decoded = await asyncio.gather(*(decode_image_async(path, SCORE_WIDTH, SCORE_HEIGHT, "rgb24") for path in paths))
+    return _score_decoded(list(decoded))
+
+def _score_decoded(decoded: List[Optional[np.ndarray]]) -> List[Optional[float]]:
+    valid = [i for i, pixels in enumerate(decoded) if pixels is not None]
+    scores: List[Optional[float]] = [None] * len(decoded)
+    if valid:
+        batch_scores = score_images(np.stack([decoded[i] for i in valid]))
+        for i, score in zip(valid, batch_scores):
+            scores[i] = float(score)
+    return scores
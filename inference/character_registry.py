@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+
+import fal_client
+
+from services.downloader import download_file_async
+from inference.image_generateion import (FalResponse, generate_character, generate_character_use_ref,
+                                         generate_character_use_lora)
+
+logger = logging.getLogger(__name__)
+
+CHARACTERS_DIR = "characters"
+REGISTRY_FILE = os.path.join(CHARACTERS_DIR, "registry.json")
+
+# fal media URLs are not kept forever; re-upload the local reference image
+# when its URL is older than this
+REFERENCE_URL_TTL = 24 * 3600
+# Scenes of one character rendered at the same time
+DEFAULT_MAX_CONCURRENCY = 4
+# Scene prompts remembered per character
+MAX_PROMPT_HISTORY = 50
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+class CharacterRegistry:
+    """Persistent store of recurring characters.
+
+    Each character keeps a local reference image (the source of truth), the
+    fal URL of that image with its expiry time, the prompt it was created from,
+    the scene prompts rendered with it and an optional LoRA handle. Renders use
+    the LoRA when one is set and the reference image (PuLID) otherwise.
+    """
+
+    def __init__(self, path: str = REGISTRY_FILE):
+        self.path = path
+        self.folder = os.path.dirname(path) or "."
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            with open(path) as f:
+                self.characters: Dict[str, Dict[str, Any]] = json.load(f)
+        except (OSError, ValueError):
+            self.characters = {}
+        self._url_lock = asyncio.Lock()
+
+    def _save(self) -> None:
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.characters, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.characters.get(_slug(name))
+
+    def list_characters(self) -> List[Dict[str, Any]]:
+        return sorted(self.characters.values(), key=lambda character: character["created_at"])
+
+    def add_character(self, name: str, reference_path: str, prompt: str = "",
+                      reference_url: Optional[str] = None) -> Dict[str, Any]:
+        """Register a character from an existing reference image (replaces a character of the same name)"""
+        character = {
+            "name": _slug(name),
+            "prompt": prompt,
+            "reference_path": reference_path,
+            "reference_url": reference_url,
+            "reference_url_expires_at": time.time() + REFERENCE_URL_TTL if reference_url else 0,
+            "lora_url": None,
+            "lora_scale": 1.0,
+            "scene_prompts": [],
+            "created_at": time.time(),
+        }
+        self.characters[character["name"]] = character
+        self._save()
+        return character
+
+    def set_lora(self, name: str, lora_url: Optional[str], lora_scale: float = 1.0) -> None:
+        """Attach (or with None, detach) a character LoRA"""
+        character = self.characters[_slug(name)]
+        character["lora_url"] = lora_url
+        character["lora_scale"] = lora_scale
+        self._save()
+
+    def remove(self, name: str) -> bool:
+        if self.characters.pop(_slug(name), None) is None:
+            return False
+        self._save()
+        return True
+
+    async def create_character_async(self, name: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """Generate a new character from a prompt and register it; returns None on failure"""
+        try:
+            result = await generate_character(prompt)
+            image_url = result["images"][0]["url"]
+        except Exception as e:
+            print(f"Error generating character '{name}': {e}")
+            return None
+        reference_path = os.path.join(self.folder, f"{_slug(name)}.jpg")
+        if not await download_file_async(image_url, reference_path):
+            return None
+        print(f"Character '{name}' saved to: {reference_path}")
+        return self.add_character(name, reference_path, prompt, image_url)
+
+    async def reference_url_async(self, name: str) -> Optional[str]:
+        """
+        fal URL of a character's reference image, re-uploaded from the local
+        file when the stored URL is missing or about to expire.
+        """
+        character = self.get(name)
+        if character is None:
+            print(f"Unknown character: {name}")
+            return None
+        async with self._url_lock:
+            if character["reference_url"] and character["reference_url_expires_at"] > time.time():
+                return character["reference_url"]
+            if not os.path.exists(character["reference_path"]):
+                print(f"Reference image of '{name}' is missing: {character['reference_path']}")
+                return None
+            character["reference_url"] = await fal_client.upload_file_async(character["reference_path"])
+            character["reference_url_expires_at"] = time.time() + REFERENCE_URL_TTL
+            self._save()
+            logger.info(f"Uploaded reference image of '{name}': {character['reference_url']}")
+            return character["reference_url"]
+
+    async def render_scenes_async(
+        self,
+        name: str,
+        scene_prompts: List[str],
+        image_size: str = "landscape_16_9",
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> List[Optional[FalResponse]]:
+        """
+        Render many scenes of one character concurrently.
+
+        The reference URL is looked up (or refreshed) once for the whole batch
+        and at most max_concurrency renders run at the same time.
+
+        Returns:
+            List[Optional[FalResponse]]: One result per prompt, in order; None for scenes that failed
+        """
+        character = self.get(name)
+        if character is None:
+            print(f"Unknown character: {name}")
+            return [None] * len(scene_prompts)
+        reference_url = None
+        if not character["lora_url"]:
+            reference_url = await self.reference_url_async(name)
+            if reference_url is None:
+                return [None] * len(scene_prompts)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def render(scene_prompt: str) -> Optional[FalResponse]:
+            async with semaphore:
+                try:
+                    if character["lora_url"]:
+                        return await generate_character_use_lora(scene_prompt, character["lora_url"],
+                                                                 character["lora_scale"], image_size)
+                    return await generate_character_use_ref(scene_prompt, reference_url, image_size)
+                except Exception as e:
+                    print(f"Error rendering scene of '{name}': {e}")
+                    return None
+
+        results = await asyncio.gather(*(render(scene_prompt) for scene_prompt in scene_prompts))
+        character["scene_prompts"] = (character["scene_prompts"] + list(scene_prompts))[-MAX_PROMPT_HISTORY:]
+        self._save()
+        return list(results)
+
+async def async_main(args: argparse.Namespace) -> None:
+    registry = CharacterRegistry()
+    if args.command == "create":
+        await registry.create_character_async(args.name, args.prompt)
+    elif args.command == "add":
+        registry.add_character(args.name, args.reference, args.prompt)
+    elif args.command == "lora":
+        registry.set_lora(args.name, args.url, args.scale)
+    elif args.command == "render":
+        results = await registry.render_scenes_async(args.name, args.scenes, max_concurrency=args.concurrency)
+        for scene_prompt, result in zip(args.scenes, results):
+            print(f"{result['images'][0]['url'] if result else 'FAILED'}  {scene_prompt}")
+    else:
+        for character in registry.list_characters():
+            print(f"{character['name']:<20} {character['reference_path']}  "
+                  f"{len(character['scene_prompts'])} scenes  {'LoRA' if character['lora_url'] else ''}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage recurring characters and render scenes with them")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="Generate a new character from a prompt")
+    create_parser.add_argument("name")
+    create_parser.add_argument("prompt")
+
+    add_parser = subparsers.add_parser("add", help="Register a character from an existing image")
+    add_parser.add_argument("name")
+    add_parser.add_argument("reference", help="Path of the reference image")
+    add_parser.add_argument("--prompt", default="", help="Description of the character")
+
+    lora_parser = subparsers.add_parser("lora", help="Attach a character LoRA")
+    lora_parser.add_argument("name")
+    lora_parser.add_argument("url", help="URL of the LoRA weights")
+    lora_parser.add_argument("--scale", type=float, default=1.0, help="LoRA strength (default: 1.0)")
+
+    render_parser = subparsers.add_parser("render", help="Render scenes of a character")
+    render_parser.add_argument("name")
+    render_parser.add_argument("scenes", nargs="+", help="Scene prompts")
+    render_parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                               help=f"Scenes rendered at once (default: {DEFAULT_MAX_CONCURRENCY})")
+
+    subparsers.add_parser("list", help="List characters")
+
+    asyncio.run(async_main(parser.parse_args()))
@@ -1,7 +1,8 @@
 import logging
 
-import fal_client
 from typing import Any, TypedDict, cast
+from model_registry import model_id
+from services.fal_progress import run_with_progress_async, log_progress, ProgressCallback
 
 logger = logging.getLogger(__name__)
 
@@ -27,22 +28,22 @@ class FalResponse(TypedDict):
     """
     images: list[FalImage]
 
-async def fal_image_api_call(model_id: str, arguments: dict[str, Any]) -> FalResponse:
+async def fal_image_api_call(model_id: str, arguments: dict[str, Any],
+                             on_progress: ProgressCallback | None = None) -> FalResponse:
     """Makes an asynchronous API call to FAL's image generation service
     
     Args:
         model_id: ID of the FAL model to use
         arguments: Dictionary of arguments to pass to the model
+        on_progress: Called with each progress event (see services.fal_progress)
         
     Returns:
         FalResponse containing the generated images
         
-    Logs all generation events for monitoring
+    By default progress is logged, throttled so that concurrent generations
+    do not flood the log
     """
-    handler = await fal_client.submit_async(model_id, arguments=arguments)
-    async for event in handler.iter_events(with_logs=True):
-        logger.info(f"Generation event: {event}")
-    result = await handler.get()
+    result = await run_with_progress_async(model_id, arguments, on_progress or log_progress(model_id))
     return cast(FalResponse, result)
 
 async def generate_character(prompt: str):
@@ -57,7 +58,7 @@ async def generate_character(prompt: str):
         FalResponse containing the generated character image
     """
     return await fal_image_api_call(
-        "fal-ai/flux/schnell",
+        model_id("flux-schnell"),
         arguments={
             "prompt": prompt,
             "image_size": "square_hd",
@@ -70,7 +71,7 @@ async def generate_character(prompt: str):
 # To keep the characater looking consisitent
 # here we use pulid model to fast generate a character from a reference image 
 # we will use character LORA to generate the characters with future generations.
-async def generate_character_use_ref(prompt: str, reference_image: str):
+async def generate_character_use_ref(prompt: str, reference_image: str, image_size: str = "square_hd"):
     """Generate a character based on text prompt and reference image
     
     Uses the pulid model which can maintain consistency with a reference image.
@@ -79,17 +80,42 @@ async def generate_character_use_ref(prompt: str, reference_image: str):
     Args:
         prompt: Text description of the character to generate
         reference_image: URL of the reference image to base generation on
+        image_size: FAL image size preset
         
     Returns:
         FalResponse containing the generated character image that maintains
         consistency with the reference
     """
     return await fal_image_api_call(
-        "fal-ai/flux-pulid",
+        model_id("flux-pulid"),
         arguments={
             "prompt": prompt,
             "reference_image_url": reference_image,
-            "image_size": "square_hd",
+            "image_size": image_size,
+            "num_images": 1,
+            "format": "jpeg"
+        }
+    )
+
+async def generate_character_use_lora(prompt: str, lora_url: str, lora_scale: float = 1.0,
+                                      image_size: str = "square_hd"):
+    """Generate a character with a character LoRA trained on its images
+    
+    Args:
+        prompt: Text description of the scene, including the LoRA trigger word
+        lora_url: URL of the LoRA weights
+        lora_scale: Strength of the LoRA
+        image_size: FAL image size preset
+        
+    Returns:
+        FalResponse containing the generated character image
+    """
+    return await fal_image_api_call(
+        model_id("flux-lora"),
+        arguments={
+            "prompt": prompt,
+            "loras": [{"path": lora_url, "scale": lora_scale}],
+            "image_size": image_size,
             "num_images": 1,
             "format": "jpeg"
         }
@@ -107,7 +133,7 @@ async def generate_planet(prompt: str):
         FalResponse containing the generated planet image
     """
     return await fal_image_api_call(
-        "fal-ai/flux",
+        model_id("flux-dev"),
         arguments={
             "prompt": f"a detailed view of a planet from space, {prompt}, cinematic lighting, highly detailed, 8k",
             "image_size": "landscape_16_9",
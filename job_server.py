@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import mimetypes
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from run_catalog import RunCatalog, new_run_id
+from create_game_content import run_prompt_stage, run_media_stage, run_merge_stage
+from video_generation import generate_game_video_async, generate_image_async, VIDEO_TIERS
+from music_generation import generate_music_async
+from prompt_index import PromptIndex
+from image_index import ImageIndex
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Jobs running at the same time; further jobs wait in "queued"
+MAX_CONCURRENT_JOBS = 4
+# Finished jobs kept in memory for status and artifact requests
+FINISHED_JOBS_KEPT = 500
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 30
+FILE_CHUNK_SIZE = 1024 * 1024
+
+API_OUTPUT_FOLDER = os.path.join("input", "api")
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class PipelineJob:
+    """One request to the job API and the task that runs it."""
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "artifacts": sorted((self.result or {}).get("artifacts", {})),
+        }
+
+def _require_prompt(params: Dict[str, Any]) -> str:
+    prompt = params.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise HTTPError(400, "'prompt' is required")
+    return prompt
+
+async def _run_pipeline(server: "JobServer", job: PipelineJob) -> Optional[Dict[str, Any]]:
+    """Full run: prompts, media, merge (the same stages as create_game_content.py)"""
+    run_id = job.params.get("run_id") or new_run_id()
+    deadline = job.params.get("deadline_minutes")
+    deadline = time.time() + deadline * 60 if deadline else None
+    job.result = {"run_id": run_id, "artifacts": {}}
+    if not (await run_prompt_stage(server.catalog, run_id, server.prompt_index)
+            and await run_media_stage(server.catalog, run_id, deadline, server.image_index)
+            and await run_merge_stage(server.catalog, run_id)):
+        return None
+    run = await asyncio.to_thread(server.catalog.get_run, run_id)
+    artifacts = {artifact["kind"]: artifact["path"] for artifact in run["artifacts"] if artifact["path"]}
+    return {"run_id": run_id, "tweet_text": run["tweet_text"], "artifacts": artifacts}
+
+async def _run_video(server: "JobServer", job: PipelineJob) -> Optional[Dict[str, Any]]:
+    video_path = await generate_game_video_async(
+        prompt=job.params["prompt"],
+        output_folder=os.path.join(API_OUTPUT_FOLDER, job.id),
+        num_image_candidates=job.params.get("image_candidates", 1),
+        tier=job.params.get("tier", "final"),
+        num_segments=job.params.get("segments", 1),
+        image_model_tier=job.params.get("image_model_tier"),
+        image_deadline=job.params.get("image_deadline"),
+        image_index=server.image_index
+    )
+    return {"artifacts": {"video": video_path}} if video_path else None
+
+async def _run_image(server: "JobServer", job: PipelineJob) -> Optional[Dict[str, Any]]:
+    image = await generate_image_async(
+        prompt=job.params["prompt"],
+        output_folder=os.path.join(API_OUTPUT_FOLDER, job.id),
+        num_images=job.params.get("num_images", 1),
+        aspect_ratio=job.params.get("aspect_ratio", "16:9"),
+        model_tier=job.params.get("model_tier"),
+        deadline=job.params.get("deadline")
+    )
+    if not image:
+        return None
+    return {"url": image["url"], "model": image["model"], "artifacts": {"image": image["file_path"]}}
+
+async def _run_music(server: "JobServer", job: PipelineJob) -> Optional[Dict[str, Any]]:
+    music_path = await generate_music_async(
+        prompt=job.params["prompt"],
+        duration=job.params.get("duration", 10),
+        output_folder=os.path.join(API_OUTPUT_FOLDER, job.id)
+    )
+    return {"artifacts": {"music": music_path}} if music_path else None
+
+def _validate_media(params: Dict[str, Any]) -> None:
+    _require_prompt(params)
+    if params.get("tier", "final") not in VIDEO_TIERS:
+        raise HTTPError(400, f"'tier' must be one of: {', '.join(VIDEO_TIERS)}")
+
+# Job kinds: (runner, parameter check); the runner returns None on failure
+JOB_KINDS: Dict[str, Tuple[Callable[["JobServer", PipelineJob], Awaitable[Optional[Dict[str, Any]]]],
+                           Callable[[Dict[str, Any]], None]]] = {
+    "run": (_run_pipeline, lambda params: None),
+    "video": (_run_video, _validate_media),
+    "image": (_run_image, _require_prompt),
+    "music": (_run_music, _require_prompt),
+}
+
+class JobServer:
+    """Long-lived local HTTP API over the pipeline functions.
+
+    The process keeps the run catalog, the fal and OpenAI HTTP clients and the
+    prompt/image indexes warm between requests, so a request costs no
+    interpreter or client startup. Jobs run as tasks on one event loop, at
+    most max_concurrent_jobs at a time. Concurrent jobs share the indexes;
+    their duplicate checks take the index lock (PromptIndex.locked()), so
+    two jobs cannot accept the same concept.
+
+    Endpoints (JSON unless noted):
+        GET  /health
+        POST /jobs                          {"kind": "run" | "video" | "image" | "music", ...parameters}
+        GET  /jobs                          recent jobs
+        GET  /jobs/<id>                     status, result and artifact names
+        POST /jobs/<id>/cancel              cancels the job and its fal jobs
+        GET  /jobs/<id>/artifacts/<name>    the artifact file (binary)
+    """
+
+    def __init__(self, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS):
+        self.jobs: "OrderedDict[str, PipelineJob]" = OrderedDict()
+        self.catalog = RunCatalog()
+        self.prompt_index = PromptIndex()
+        self.image_index = ImageIndex()
+        self.semaphore = asyncio.Semaphore(max_concurrent_jobs)
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> PipelineJob:
+        if kind not in JOB_KINDS:
+            raise HTTPError(400, f"'kind' must be one of: {', '.join(JOB_KINDS)}")
+        JOB_KINDS[kind][1](params)
+        job = PipelineJob(kind, params)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        self._forget_old_jobs()
+        return job
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self.jobs[job_id]
+
+    async def _run(self, job: PipelineJob) -> None:
+        try:
+            async with self.semaphore:
+                job.status = "running"
+                job.started_at = time.time()
+                result = await JOB_KINDS[job.kind][0](self, job)
+            job.result = result or job.result
+            job.status = "done" if result else "failed"
+            if not result:
+                job.error = f"{job.kind} job failed; see the server log"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def get_job(self, job_id: str) -> PipelineJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"No job {job_id}")
+        return job
+
+    async def cancel(self, job_id: str) -> PipelineJob:
+        job = self.get_job(job_id)
+        if job.finished_at is not None:
+            raise HTTPError(409, f"Job {job_id} already {job.status}")
+        job.task.cancel()
+        # Wait until the job's fal jobs have been cancelled too
+        await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    def artifact_path(self, job_id: str, name: str) -> str:
+        job = self.get_job(job_id)
+        path = (job.result or {}).get("artifacts", {}).get(name)
+        if not path or not os.path.isfile(path):
+            raise HTTPError(404, f"Job {job_id} has no artifact '{name}'")
+        return path
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        """Dispatch a request; returns (status, JSON body) or (200, file path) for artifacts"""
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok", "jobs": len(self.jobs)}
+        if parts == ["jobs"]:
+            if method == "GET":
+                return 200, [job.to_dict() for job in reversed(self.jobs.values())]
+            if method == "POST":
+                try:
+                    params = json.loads(body or b"{}")
+                except ValueError:
+                    raise HTTPError(400, "Body must be JSON")
+                if not isinstance(params, dict):
+                    raise HTTPError(400, "Body must be a JSON object")
+                return 202, self.submit(params.pop("kind", "run"), params).to_dict()
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            return 200, self.get_job(parts[1]).to_dict()
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel" and method == "POST":
+            return 200, (await self.cancel(parts[1])).to_dict()
+        elif len(parts) == 4 and parts[0] == "jobs" and parts[2] == "artifacts" and method == "GET":
+            return 200, self.artifact_path(parts[1], parts[3])
+        else:
+            raise HTTPError(404, f"Not found: {path}")
+        raise HTTPError(405, f"{method} not allowed on {path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests"""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self._handle_request(request_line, reader, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request_line: bytes, reader: asyncio.StreamReader,
+                              writer: asyncio.StreamWriter) -> bool:
+        headers: Dict[str, str] = {}
+        version = "HTTP/1.1"
+        # Until the whole request is consumed, what is left on the connection is
+        # not the start of the next request, so it must be closed after replying
+        request_read = False
+        try:
+            method, path, version = request_line.decode("latin-1").split()
+            for _ in range(MAX_HEADER_LINES):
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            else:
+                raise HTTPError(400, "Too many header lines")
+            length = int(headers.get("content-length", 0))
+            if length < 0:
+                raise ValueError(f"Negative Content-Length: {length}")
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large")
+            body = await reader.readexactly(length) if length else b""
+            request_read = True
+            status, payload = await self.route(method.upper(), path, body)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except ValueError:
+            status, payload = 400, {"error": "Malformed request"}
+        except Exception as e:
+            print(f"Error handling {request_line!r}: {e}")
+            status, payload = 500, {"error": str(e)}
+
+        keep_alive = request_read and version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        connection = "keep-alive" if keep_alive else "close"
+        if isinstance(payload, str):
+            await self._send_file(writer, payload, connection)
+        else:
+            data = json.dumps(payload).encode()
+            writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: {connection}\r\n\r\n".encode() + data)
+            await writer.drain()
+        return keep_alive
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str, connection: str) -> None:
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nContent-Length: {os.path.getsize(path)}\r\n"
+                     f"Content-Disposition: attachment; filename=\"{os.path.basename(path)}\"\r\n"
+                     f"Connection: {connection}\r\n\r\n".encode())
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Job API listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # Ctrl+C: stop every job, which also cancels their fal jobs
+            running = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            self.catalog.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP API for submitting and tracking content generation jobs")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_JOBS,
+                        help=f"Jobs run at the same time (default: {MAX_CONCURRENT_JOBS})")
+    args = parser.parse_args()
+
+    async def main():
+        await JobServer(args.concurrency).serve(args.host, args.port)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Job API stopped")
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Optional
+from run_catalog import RunCatalog, new_run_id
+from create_game_content import run_prompt_stage, run_media_stage, run_merge_stage
+from posting_queue import PostingQueue
+from services.job_queue import (open_job_queue, new_worker_id, JobQueue, DEFAULT_QUEUE_URL,
+                                DEFAULT_LEASE_SECONDS)
+
+# Pipeline stages in order; each finished stage submits the next one for the same run
+STAGES = ("prompt", "media", "merge", "post")
+
+IDLE_POLL_INTERVAL = 10
+
+def submit_runs(queue: JobQueue, count: int, post: bool = False, deadline: Optional[float] = None) -> list:
+    """Submit `count` new runs; returns their run ids
+
+    deadline is a Unix time by which the videos should be ready (see run_media_stage)
+    """
+    run_ids = []
+    for _ in range(count):
+        run_id = new_run_id()
+        queue.submit("prompt", {"run_id": run_id, "post": post, "deadline": deadline}, key=f"{run_id}:prompt")
+        run_ids.append(run_id)
+    return run_ids
+
+def _enqueue_post(text: str, media_path: str, run_id: str) -> list:
+    # Opened, used and closed in one worker thread (the queue is shared like the catalog)
+    posting_queue = PostingQueue()
+    try:
+        return posting_queue.enqueue(text, media_path, run_id=run_id)
+    finally:
+        posting_queue.close()
+
+async def run_stage(kind: str, payload: Dict[str, Any], catalog: RunCatalog) -> Optional[Dict[str, Any]]:
+    """
+    Run one pipeline stage for a run.
+
+    Every stage can be repeated safely: it skips work the run already has
+    (see the stage functions in create_game_content).
+
+    Returns:
+        Optional[Dict[str, Any]]: Job result, or None if the stage failed and
+        should be retried. A clip rejected by QA completes the media job with
+        {"rejected": True} and ends the run.
+    """
+    run_id = payload["run_id"]
+    if kind == "prompt":
+        return {} if await run_prompt_stage(catalog, run_id) else None
+    if kind == "media":
+        if await run_media_stage(catalog, run_id, payload.get("deadline")):
+            return {}
+        run = await asyncio.to_thread(catalog.get_run, run_id)
+        if run and run["status"] == "rejected":
+            # A retry would check the same clip again; the run ends here
+            return {"rejected": True}
+        return None
+    if kind == "merge":
+        final_path = await run_merge_stage(catalog, run_id)
+        return {"final_path": final_path} if final_path else None
+    if kind == "post":
+        run = await asyncio.to_thread(catalog.get_run, run_id)
+        finals = await asyncio.to_thread(catalog.get_artifacts, run_id, "final")
+        if not run or not finals:
+            return None
+        if run["status"] == "flagged":
+            # Queued by hand after review (python posting_queue.py add-run <run id>)
+            print(f"Run {run_id} was flagged by QA; not posting it before it is reviewed")
+            return {"post_ids": [], "skipped": "flagged"}
+        post_ids = await asyncio.to_thread(_enqueue_post, run["tweet_text"], finals[-1]["path"], run_id)
+        return {"post_ids": post_ids}
+    raise ValueError(f"Unknown job kind: {kind}")
+
+async def _heartbeat(queue: JobQueue, job_id: int, worker_id: str, stage: asyncio.Task) -> bool:
+    """Keep the lease alive; cancel the stage (and return True) if another worker has taken the job over"""
+    while True:
+        await asyncio.sleep(DEFAULT_LEASE_SECONDS / 3)
+        if not await asyncio.to_thread(queue.heartbeat, job_id, worker_id):
+            print(f"Lost the lease on job {job_id}; stopping it")
+            stage.cancel()
+            return True
+
+async def process_job(queue: JobQueue, job: Dict[str, Any], worker_id: str, catalog: RunCatalog) -> None:
+    payload = job["payload"]
+    print(f"[{datetime.now():%H:%M:%S}] Job {job['id']}: {job['kind']} for run {payload['run_id']} "
+          f"(attempt {job['attempts']}/{job['max_attempts']})")
+    stage = asyncio.create_task(run_stage(job["kind"], payload, catalog))
+    heartbeat = asyncio.create_task(_heartbeat(queue, job["id"], worker_id, stage))
+    try:
+        result = await stage
+    except asyncio.CancelledError:
+        if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+            return
+        raise
+    except Exception as e:
+        print(f"Job {job['id']} failed: {e}")
+        await asyncio.to_thread(queue.fail, job["id"], worker_id, str(e))
+        return
+    finally:
+        heartbeat.cancel()
+
+    if result is None:
+        await asyncio.to_thread(queue.fail, job["id"], worker_id, f"{job['kind']} stage failed")
+        return
+    next_index = STAGES.index(job["kind"]) + 1
+    if result.get("rejected"):
+        print(f"Run {payload['run_id']} was rejected by QA; not continuing it")
+    elif next_index < len(STAGES) and (STAGES[next_index] != "post" or payload.get("post")):
+        next_kind = STAGES[next_index]
+        # The key makes this a no-op if a previous attempt already submitted the next stage
+        await asyncio.to_thread(queue.submit, next_kind, payload, key=f"{payload['run_id']}:{next_kind}")
+    await asyncio.to_thread(queue.complete, job["id"], worker_id, result)
+
+async def run_worker_async(queue_url: str = DEFAULT_QUEUE_URL, kinds=STAGES, concurrency: int = 1,
+                           once: bool = False) -> None:
+    """
+    Lease and run jobs of the given kinds until interrupted.
+
+    Args:
+        queue_url: Job queue URL (see services.job_queue.open_job_queue)
+        kinds: Stages this worker takes (e.g. only "merge" on a CPU box)
+        concurrency: Jobs run at the same time by this worker
+        once: Exit when no job is available instead of waiting
+    """
+    queue = open_job_queue(queue_url)
+    catalog = RunCatalog()
+    worker_id = new_worker_id()
+    print(f"Worker {worker_id} taking {', '.join(kinds)} jobs from {queue_url}")
+
+    async def slot():
+        while True:
+            # Queue calls run in threads: a shared queue locked by another host
+            # must not stall the other slots and their fal polling
+            job = await asyncio.to_thread(queue.lease, list(kinds), worker_id)
+            if job is None:
+                if once:
+                    return
+                await asyncio.sleep(IDLE_POLL_INTERVAL)
+                continue
+            await process_job(queue, job, worker_id, catalog)
+
+    try:
+        await asyncio.gather(*(slot() for _ in range(concurrency)))
+    finally:
+        catalog.close()
+        queue.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Share content generation jobs between worker hosts")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_URL,
+                        help=f"Job queue URL, e.g. sqlite:////mnt/shared/jobs.db (default: {DEFAULT_QUEUE_URL})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="Submit new runs")
+    submit_parser.add_argument("--count", type=int, default=1, help="Number of runs (default: 1)")
+    submit_parser.add_argument("--post", action="store_true", help="Queue the finished videos for posting")
+    submit_parser.add_argument("--deadline-minutes", type=float,
+                               help="Minutes until the videos are needed; late runs use faster image models")
+
+    work_parser = subparsers.add_parser("work", help="Run a worker")
+    work_parser.add_argument("--kinds", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to take (default: all)")
+    work_parser.add_argument("--concurrency", type=int, default=1, help="Jobs to run at once (default: 1)")
+    work_parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    list_parser = subparsers.add_parser("list", help="List jobs")
+    list_parser.add_argument("--status", help="queued, leased, done or failed")
+
+    args = parser.parse_args()
+    if args.command == "work":
+        asyncio.run(run_worker_async(args.queue, args.kinds, args.concurrency, args.once))
+        return
+
+    queue = open_job_queue(args.queue)
+    try:
+        if args.command == "submit":
+            deadline = time.time() + args.deadline_minutes * 60 if args.deadline_minutes else None
+            run_ids = submit_runs(queue, args.count, args.post, deadline)
+            print(f"Submitted {len(run_ids)} run(s): {', '.join(run_ids)}")
+        else:
+            for job in queue.list_jobs(args.status):
+                print(f"{job['id']:>5}  {job['kind']:<7} {job['status']:<7} {job['payload']['run_id']}  "
+                      f"attempts {job['attempts']}/{job['max_attempts']}  {job['worker_id'] or ''}  {job['error'] or ''}")
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,31 @@
 import os
+import asyncio
+import shutil
 import subprocess
 import argparse
 import json
 import sys
 from pathlib import Path
+from audio_analysis import analyze_audio, build_audio_filter
+from services.ffmpeg_runner import run_media_command, print_progress
+
+def add_ffmpeg_to_path(ffmpeg_path):
+    """Make a custom FFmpeg executable (and the ffprobe next to it) available on PATH"""
+    if os.path.exists(ffmpeg_path):
+        ffmpeg_dir = os.path.dirname(ffmpeg_path)
+        os.environ["PATH"] += os.pathsep + ffmpeg_dir
+        print(f"Added {ffmpeg_dir} to PATH")
+    else:
+        print(f"Warning: Provided FFmpeg path does not exist: {ffmpeg_path}")
+
+_ffmpeg_found = False
 
 def check_ffmpeg_installed():
-    """Check if ffmpeg is installed and accessible"""
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=False)
-        return True
-    except FileNotFoundError:
-        return False
+    """Check if ffmpeg is installed and accessible (looked up on PATH until found once)"""
+    global _ffmpeg_found
+    # No subprocess: this runs before every merge, including async ones on the event loop
+    _ffmpeg_found = _ffmpeg_found or shutil.which('ffmpeg') is not None
+    return _ffmpeg_found
 
 def get_media_duration(file_path):
     """Get the duration of a media file using ffprobe"""
@@ -43,6 +57,28 @@ def get_media_duration(file_path):
         print(f"Unexpected error processing {file_path}: {e}")
         return None
 
+async def get_media_duration_async(file_path):
+    """Async version of get_media_duration() that runs ffprobe without blocking the event loop"""
+    if not os.path.exists(file_path):
+        print(f"Error: File does not exist: {file_path}")
+        return None
+    
+    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', file_path]
+    try:
+        output = await run_media_command(cmd, capture_stdout=True)
+        return float(json.loads(output)['format']['duration'])
+    except FileNotFoundError:
+        print("Error: ffprobe command not found. Please make sure FFmpeg is installed and in your PATH.")
+        print("You can download FFmpeg from: https://ffmpeg.org/download.html")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error running ffprobe: {e}")
+        print(f"Error output: {e.stderr}")
+        return None
+    except Exception as e:
+        print(f"Unexpected error processing {file_path}: {e}")
+        return None
+
 def find_first_video_file(folder_path):
     """Find the first MP4 video file in the folder"""
     for file in os.listdir(folder_path):
@@ -61,8 +97,140 @@ def find_first_audio_file(folder_path):
     
     return None
 
-def merge_audio_video(video_path, audio_path, output_path):
-    """Merge audio and video files, with length equal to min(audio, video)"""
+# Ways to extend a video that is shorter than its audio:
+#   none      - cut the output to the shorter of the two (original behaviour)
+#   loop      - repeat the clip (stream copy, no re-encode)
+#   pingpong  - play forwards then backwards, repeated
+#   crossfade - repeat with a short crossfade at the seam so the loop point is hidden
+FIT_MODES = ("none", "loop", "pingpong", "crossfade")
+
+# Longest crossfade used at the loop seam, in seconds
+MAX_LOOP_CROSSFADE = 0.5
+
+# Largest number of frames the ffmpeg loop filter can buffer
+LOOP_FILTER_MAX_FRAMES = 32767
+
+def get_video_frame_rate(file_path, default=16.0):
+    """Get the frame rate of the first video stream using ffprobe (Wan clips are 16 fps)"""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=r_frame_rate',
+        '-of', 'json',
+        file_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        numerator, _, denominator = json.loads(result.stdout)['streams'][0]['r_frame_rate'].partition('/')
+        return float(numerator) / float(denominator or 1)
+    except Exception as e:
+        print(f"Could not read frame rate of {file_path} ({e}). Assuming {default} fps.")
+        return default
+
+async def get_video_frame_rate_async(file_path, default=16.0):
+    """Async version of get_video_frame_rate()"""
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=r_frame_rate',
+           '-of', 'json', file_path]
+    try:
+        output = await run_media_command(cmd, capture_stdout=True)
+        numerator, _, denominator = json.loads(output)['streams'][0]['r_frame_rate'].partition('/')
+        return float(numerator) / float(denominator or 1)
+    except Exception as e:
+        print(f"Could not read frame rate of {file_path} ({e}). Assuming {default} fps.")
+        return default
+
+def build_fit_video_args(video_path, video_duration, target_duration, fit_mode, frame_rate=16.0):
+    """
+    Build the ffmpeg arguments that extend the video input to target_duration.
+    
+    The trim and loop filters drop the stream's frame rate, so it is set again
+    explicitly (xfade refuses inputs without a constant frame rate).
+    
+    Returns:
+        Tuple[list, list]: (input arguments for the video, output arguments for the video stream)
+    """
+    if fit_mode == "loop":
+        # Repeating the input stream needs no decoding at all
+        return ['-stream_loop', '-1', '-i', video_path], ['-map', '0:v:0', '-c:v', 'copy']
+    
+    if fit_mode == "pingpong":
+        unit = "[0:v]split[fwd][rev];[rev]reverse[bwd];[fwd][bwd]concat=n=2:v=1:a=0[unit]"
+    else:
+        fade = min(MAX_LOOP_CROSSFADE, video_duration / 4)
+        # The loop unit runs from `fade` to the end and crossfades back into the
+        # first `fade` seconds, so its last frame leads straight into its first
+        unit = (
+            f"[0:v]split[main][head];"
+            f"[head]trim=0:{fade:.3f},setpts=PTS-STARTPTS,fps={frame_rate}[h];"
+            f"[main]trim={fade:.3f},setpts=PTS-STARTPTS,fps={frame_rate}[body];"
+            f"[body][h]xfade=transition=fade:duration={fade:.3f}:offset={video_duration - 2 * fade:.3f}[unit]"
+        )
+    filter_graph = (
+        f"{unit};[unit]loop=loop=-1:size={LOOP_FILTER_MAX_FRAMES},"
+        f"trim=duration={target_duration:.3f},setpts=PTS-STARTPTS,fps={frame_rate}[v]"
+    )
+    return ['-i', video_path], [
+        '-filter_complex', filter_graph,
+        '-map', '[v]',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p'
+    ]
+
+def _concat_list(video_paths, output_path):
+    list_path = output_path + ".concat.txt"
+    with open(list_path, 'w') as f:
+        for path in video_paths:
+            # The concat demuxer resolves relative paths against the list file
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        'ffmpeg',
+        '-f', 'concat',
+        '-safe', '0',
+        '-i', list_path,
+        '-c', 'copy',
+        '-y',  # Always overwrite output file
+        output_path
+    ]
+    return list_path, cmd
+
+def concat_videos(video_paths, output_path):
+    """Join videos with identical encoding settings using the concat demuxer (stream copy, no re-encode)"""
+    list_path, cmd = _concat_list(video_paths, output_path)
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return True
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error joining videos: {e}")
+        print(f"Error output: {e.stderr}")
+        return False
+    finally:
+        os.remove(list_path)
+
+async def concat_videos_async(video_paths, output_path):
+    """Async version of concat_videos() that runs ffmpeg without blocking the event loop"""
+    list_path, cmd = _concat_list(video_paths, output_path)
+    try:
+        await run_media_command(cmd)
+        return True
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error joining videos: {e}")
+        print(f"Error output: {e.stderr}")
+        return False
+    finally:
+        os.remove(list_path)
+
+def _check_merge_inputs(video_path, audio_path, fit_mode):
+    if fit_mode not in FIT_MODES:
+        print(f"Error: Unknown fit mode '{fit_mode}'. Choose from: {', '.join(FIT_MODES)}")
+        return False
+    
     if not os.path.exists(video_path):
         print(f"Error: Video file does not exist: {video_path}")
         return False
@@ -76,10 +244,34 @@ def merge_audio_video(video_path, audio_path, output_path):
         print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
         print("You can download FFmpeg from: https://ffmpeg.org/download.html")
         return False
-        
-    # Get durations
-    video_duration = get_media_duration(video_path)
-    audio_duration = get_media_duration(audio_path)
+    return True
+
+def _apply_audio_analysis(analysis, audio_duration):
+    """Report the loudness measurement and return the audio duration after silence trimming"""
+    if analysis is None:
+        print("Audio analysis failed. Merging without loudness normalization.")
+        return audio_duration
+    print(f"Audio loudness: {analysis['loudness']:.1f} LUFS, true peak {analysis['true_peak']:.1f} dBTP, "
+          f"applying {analysis['gain_db']:+.1f} dB")
+    # Leading and trailing silence is trimmed, so only the audible part counts
+    return analysis['trim_end'] - analysis['trim_start']
+
+def _needs_fit(fit_mode, video_duration, audio_duration):
+    return (fit_mode != "none" and video_duration is not None and audio_duration is not None
+            and audio_duration > video_duration)
+
+def _build_merge_command(video_path, audio_path, output_path, fit_mode, video_duration, audio_duration,
+                         analysis=None, frame_rate=16.0):
+    """
+    Build the ffmpeg merge command.
+    
+    Returns:
+        Tuple[list, Optional[float]]: (command, expected output duration or None if unknown)
+    """
+    def audio_filter_args(output_duration):
+        if analysis is None:
+            return []
+        return ['-af', build_audio_filter(analysis, output_duration)]
     
     if video_duration is None or audio_duration is None:
         print("Failed to get media durations. Attempting to merge without duration constraint.")
@@ -92,30 +284,83 @@ def merge_audio_video(video_path, audio_path, output_path):
             '-c:a', 'aac',
             '-map', '0:v:0',
             '-map', '1:a:0',
+            *audio_filter_args(0),
             '-shortest',  # Use shortest input as duration constraint
             '-y',  # Always overwrite output file
             output_path
         ]
-    else:
-        # Use the shorter duration
-        target_duration = min(video_duration, audio_duration)
-        print(f"Video duration: {video_duration:.2f}s")
-        print(f"Audio duration: {audio_duration:.2f}s")
-        print(f"Output duration will be: {target_duration:.2f}s")
+        return cmd, None
+    
+    print(f"Video duration: {video_duration:.2f}s")
+    print(f"Audio duration: {audio_duration:.2f}s")
+    if _needs_fit(fit_mode, video_duration, audio_duration):
+        print(f"Extending video to {audio_duration:.2f}s using {fit_mode} mode")
         
-        # Standard video + audio merge
+        video_input_args, video_output_args = build_fit_video_args(
+            video_path, video_duration, audio_duration, fit_mode, frame_rate
+        )
+        # The audio is the second input whichever video arguments are used
         cmd = [
             'ffmpeg',
-            '-i', video_path,
+            *video_input_args,
             '-i', audio_path,
-            '-t', str(target_duration),
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-map', '0:v:0',
+            '-t', str(audio_duration),
+            *video_output_args,
             '-map', '1:a:0',
+            *audio_filter_args(audio_duration),
+            '-c:a', 'aac',
             '-y',  # Always overwrite output file
             output_path
         ]
+        return cmd, audio_duration
+    
+    # Use the shorter duration
+    target_duration = min(video_duration, audio_duration)
+    print(f"Output duration will be: {target_duration:.2f}s")
+    
+    # Standard video + audio merge
+    cmd = [
+        'ffmpeg',
+        '-i', video_path,
+        '-i', audio_path,
+        '-t', str(target_duration),
+        '-c:v', 'copy',
+        '-c:a', 'aac',
+        '-map', '0:v:0',
+        '-map', '1:a:0',
+        *audio_filter_args(target_duration),
+        '-y',  # Always overwrite output file
+        output_path
+    ]
+    return cmd, target_duration
+
+def merge_audio_video(video_path, audio_path, output_path, fit_mode="none", normalize_audio=False):
+    """
+    Merge audio and video files.
+    
+    With fit_mode "none" the output length is min(audio, video). With any other
+    mode from FIT_MODES a video shorter than the audio is extended locally to the
+    audio length in the same ffmpeg run, so none of the generated music is lost.
+    
+    With normalize_audio the WAV is measured in NumPy first (see audio_analysis)
+    and the loudness gain, silence trim and fades are applied as an audio filter
+    in the same AAC encode, instead of a separate two-pass loudnorm run.
+    """
+    if not _check_merge_inputs(video_path, audio_path, fit_mode):
+        return False
+        
+    # Get durations
+    video_duration = get_media_duration(video_path)
+    audio_duration = get_media_duration(audio_path)
+    
+    analysis = None
+    if normalize_audio:
+        analysis = analyze_audio(audio_path)
+        audio_duration = _apply_audio_analysis(analysis, audio_duration)
+    
+    frame_rate = get_video_frame_rate(video_path) if _needs_fit(fit_mode, video_duration, audio_duration) else 16.0
+    cmd, _ = _build_merge_command(video_path, audio_path, output_path, fit_mode,
+                                  video_duration, audio_duration, analysis, frame_rate)
     
     try:
         print("Running ffmpeg with command:")
@@ -135,23 +380,64 @@ def merge_audio_video(video_path, audio_path, output_path):
         print(f"Unexpected error: {e}")
         return False
 
+async def merge_audio_video_async(video_path, audio_path, output_path, fit_mode="none", normalize_audio=False):
+    """
+    Async version of merge_audio_video().
+    
+    The probes and the encode run through the shared ffmpeg runner (bounded by
+    the per-host process limit, cancellable, with progress output), and the
+    audio analysis runs in a worker thread, so other jobs keep running meanwhile.
+    """
+    if not _check_merge_inputs(video_path, audio_path, fit_mode):
+        return False
+    
+    probes = [get_media_duration_async(video_path), get_media_duration_async(audio_path)]
+    if normalize_audio:
+        probes.append(asyncio.to_thread(analyze_audio, audio_path))
+    video_duration, audio_duration, *rest = await asyncio.gather(*probes)
+    
+    analysis = None
+    if normalize_audio:
+        analysis = rest[0]
+        audio_duration = _apply_audio_analysis(analysis, audio_duration)
+    
+    frame_rate = 16.0
+    if _needs_fit(fit_mode, video_duration, audio_duration):
+        frame_rate = await get_video_frame_rate_async(video_path)
+    cmd, output_duration = _build_merge_command(video_path, audio_path, output_path, fit_mode,
+                                                video_duration, audio_duration, analysis, frame_rate)
+    
+    try:
+        print("Running ffmpeg with command:")
+        print(" ".join(cmd))
+        await run_media_command(cmd, on_progress=print_progress(f"Merging {os.path.basename(output_path)}", output_duration))
+        print(f"Successfully merged files to: {output_path}")
+        return True
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        print("You can download FFmpeg from: https://ffmpeg.org/download.html")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error merging files: {e}")
+        print(f"Error output: {e.stderr}")
+        return False
+
 def main():
     parser = argparse.ArgumentParser(description='Merge MP4 video and WAV audio files from input folder')
     parser.add_argument('-i', '--input', help='Input folder path (default: ./input)')
     parser.add_argument('-o', '--output', help='Output folder path (default: ./output)')
     parser.add_argument('--output-filename', help='Output filename (default: merged_media.mp4)')
     parser.add_argument('--ffmpeg-path', help='Path to FFmpeg executable if not in PATH')
+    parser.add_argument('--fit-mode', choices=FIT_MODES, default='none',
+                        help='How to extend a video shorter than the audio (default: none, cut to the shorter one)')
+    parser.add_argument('--normalize', action='store_true',
+                        help='Normalize the audio loudness and trim leading/trailing silence')
     
     args = parser.parse_args()
     
     # Set custom FFmpeg path if provided
     if args.ffmpeg_path:
-        if os.path.exists(args.ffmpeg_path):
-            ffmpeg_dir = os.path.dirname(args.ffmpeg_path)
-            os.environ["PATH"] += os.pathsep + ffmpeg_dir
-            print(f"Added {ffmpeg_dir} to PATH")
-        else:
-            print(f"Warning: Provided FFmpeg path does not exist: {args.ffmpeg_path}")
+        add_ffmpeg_to_path(args.ffmpeg_path)
     
     # Set default input/output folders if not provided
     input_folder = args.input if args.input else './input'
@@ -187,7 +473,7 @@ def main():
     output_path = os.path.join(output_folder, output_filename)
     
     # Merge the files
-    success = merge_audio_video(video_path, audio_path, output_path)
+    success = merge_audio_video(video_path, audio_path, output_path, fit_mode=args.fit_mode, normalize_audio=args.normalize)
     
     if not success:
         print("\nPlease ensure FFmpeg is installed correctly. You can download it from https://ffmpeg.org/download.html")
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import uuid
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from services.file_lock import FileLock
+from services.fal_progress import run_with_progress_async, log_progress, FalProgress
+
+MODEL_STATS_FILE = "model_stats.json"
+
+# A model that failed this many times in a row is skipped for DEGRADED_COOLDOWN seconds
+DEGRADED_FAILURES = 2
+DEGRADED_COOLDOWN = 600
+# A model whose observed latency is this many times its expected latency counts as
+# congested. Latency observations also expire after DEGRADED_COOLDOWN, so a
+# congested model is tried again afterwards and its next call starts a new average.
+CONGESTED_FACTOR = 3.0
+# Weight of the newest call in the moving latency average
+LATENCY_SMOOTHING = 0.3
+
+# Model tiers a caller can ask for
+TIERS = ("quality", "fast")
+
+ASPECT_RATIO_IMAGE_SIZES = {
+    "16:9": "landscape_16_9",
+    "9:16": "portrait_16_9",
+    "4:3": "landscape_4_3",
+    "3:4": "portrait_4_3",
+    "1:1": "square_hd",
+}
+
+def _flux_ultra_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: arguments[key] for key in ("prompt", "num_images", "enable_safety_checker", "safety_tolerance",
+                                            "output_format", "aspect_ratio", "seed") if key in arguments}
+
+def _flux_sized_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """FLUX dev/schnell/PuLID take an image_size preset instead of an aspect ratio"""
+    mapped = {key: arguments[key] for key in ("prompt", "num_images", "enable_safety_checker", "output_format",
+                                              "seed", "reference_image_url", "loras") if key in arguments}
+    mapped["image_size"] = arguments.get("image_size") or \
+        ASPECT_RATIO_IMAGE_SIZES.get(arguments.get("aspect_ratio", "16:9"), "landscape_16_9")
+    return mapped
+
+class ModelSpec:
+    """One model the pipeline can call.
+
+    Attributes:
+        name: Short name used in code and logs
+        model_id: Provider model id
+        provider: "fal" or "openai"
+        capability: What the model does (image, image_reference, image_lora, video, music, text)
+        quality: Relative output quality within its capability (higher is better)
+        expected_latency: Typical seconds per call, used until real calls are observed
+        cost: Approximate USD per call
+        map_arguments: Turns the pipeline's generic arguments into this model's arguments
+    """
+
+    def __init__(self, name: str, model_id: str, provider: str, capability: str, quality: int,
+                 expected_latency: float, cost: float,
+                 map_arguments: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.name = name
+        self.model_id = model_id
+        self.provider = provider
+        self.capability = capability
+        self.quality = quality
+        self.expected_latency = expected_latency
+        self.cost = cost
+        self.map_arguments = map_arguments or dict
+
+MODEL_REGISTRY = {spec.name: spec for spec in [
+    ModelSpec("flux-pro-ultra", "fal-ai/flux-pro/v1.1-ultra", "fal", "image", 3, 25, 0.06, _flux_ultra_arguments),
+    ModelSpec("flux-dev", "fal-ai/flux", "fal", "image", 2, 12, 0.025, _flux_sized_arguments),
+    ModelSpec("flux-schnell", "fal-ai/flux/schnell", "fal", "image", 1, 3, 0.003, _flux_sized_arguments),
+    ModelSpec("flux-pulid", "fal-ai/flux-pulid", "fal", "image_reference", 1, 20, 0.03, _flux_sized_arguments),
+    ModelSpec("flux-lora", "fal-ai/flux-lora", "fal", "image_lora", 1, 12, 0.035, _flux_sized_arguments),
+    ModelSpec("wan-i2v", "fal-ai/wan-i2v", "fal", "video", 1, 240, 0.4),
+    ModelSpec("cassette-music", "CassetteAI/music-generator", "fal", "music", 1, 15, 0.02),
+    ModelSpec("gpt-4-turbo", "gpt-4-turbo", "openai", "text", 2, 20, 0.03),
+    ModelSpec("gpt-4o-mini", "gpt-4o-mini", "openai", "text", 1, 6, 0.002),
+]}
+
+def model_id(name: str) -> str:
+    """Provider model id of a registered model"""
+    return MODEL_REGISTRY[name].model_id
+
+def _smooth(previous: Optional[float], value: float) -> float:
+    return value if previous is None else (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * value
+
+class ModelStats:
+    """Observed latency and failures per model, kept in a small JSON file."""
+
+    def __init__(self, path: str = MODEL_STATS_FILE):
+        self.path = path
+        self.stats: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        # Unique name: processes on other hosts may be saving at the same time
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def _entry(self, spec: ModelSpec) -> Dict[str, Any]:
+        return self.stats.setdefault(spec.name, {"latency": None, "calls": 0, "failures": 0,
+                                                 "consecutive_failures": 0, "last_failure": None})
+
+    @staticmethod
+    def _is_recent(entry: Dict[str, Any]) -> bool:
+        return time.time() - (entry.get("last_success") or 0) < DEGRADED_COOLDOWN
+
+    def latency(self, spec: ModelSpec) -> float:
+        """Observed average latency, or the expected latency before the first call or once the observation expired"""
+        entry = self.stats.get(spec.name, {})
+        observed = entry.get("latency")
+        return observed if observed is not None and self._is_recent(entry) else spec.expected_latency
+
+    def is_degraded(self, spec: ModelSpec) -> bool:
+        entry = self.stats.get(spec.name)
+        if not entry:
+            return False
+        failing = (entry["consecutive_failures"] >= DEGRADED_FAILURES
+                   and time.time() - (entry["last_failure"] or 0) < DEGRADED_COOLDOWN)
+        return failing or self.latency(spec) > CONGESTED_FACTOR * spec.expected_latency
+
+    def record(self, spec: ModelSpec, seconds: float, ok: bool, queue_seconds: Optional[float] = None) -> None:
+        """Add a call to the stats; a failed save is reported, never raised, so it cannot lose a result"""
+        try:
+            # Locked and re-read first so concurrent runs do not overwrite each other's observations
+            with FileLock(f"{self.path}.lock"):
+                self.stats = self._load()
+                entry = self._entry(spec)
+                entry["calls"] += 1
+                if ok:
+                    # An expired average (e.g. a past queue spike) is replaced, not blended in
+                    recent = self._is_recent(entry)
+                    entry["latency"] = _smooth(entry["latency"] if recent else None, seconds)
+                    if queue_seconds is not None:
+                        entry["queue_latency"] = _smooth(entry.get("queue_latency") if recent else None, queue_seconds)
+                    entry["last_success"] = time.time()
+                    entry["consecutive_failures"] = 0
+                else:
+                    entry["failures"] += 1
+                    entry["consecutive_failures"] += 1
+                    entry["last_failure"] = time.time()
+                self._save()
+        except (OSError, TimeoutError) as e:
+            print(f"Warning: Could not save model stats to {self.path}: {e}")
+
+def route(
+    capability: str,
+    tier: Optional[str] = None,
+    deadline: Optional[float] = None,
+    stats: Optional[ModelStats] = None
+) -> List[ModelSpec]:
+    """
+    Order the models of a capability for a request, first choice first.
+
+    With a deadline (seconds available) the best model expected to finish in
+    time comes first, followed by the faster ones. Otherwise the "fast" tier
+    orders by latency and the "quality" tier (default) by quality. Degraded
+    models (failing or congested) always go last, as a final fallback.
+
+    Raises:
+        KeyError: If no model has the capability
+    """
+    stats = stats or ModelStats()
+    candidates = [spec for spec in MODEL_REGISTRY.values() if spec.capability == capability]
+    if not candidates:
+        raise KeyError(f"No model registered for capability: {capability}")
+
+    def order(specs: List[ModelSpec]) -> List[ModelSpec]:
+        by_quality = sorted(specs, key=lambda spec: (-spec.quality, stats.latency(spec)))
+        by_latency = sorted(specs, key=stats.latency)
+        if deadline is not None:
+            in_time = [spec for spec in by_quality if stats.latency(spec) <= deadline]
+            return in_time + [spec for spec in by_latency if spec not in in_time]
+        return by_latency if tier == "fast" else by_quality
+
+    healthy = [spec for spec in candidates if not stats.is_degraded(spec)]
+    degraded = [spec for spec in candidates if stats.is_degraded(spec)]
+    return order(healthy) + order(degraded)
+
+def expected_latency(capability: str, tier: Optional[str] = None) -> float:
+    """Expected seconds for the model a request of this capability would be routed to"""
+    stats = ModelStats()
+    return stats.latency(route(capability, tier, stats=stats)[0])
+
+async def run_model_async(
+    capability: str,
+    arguments: Dict[str, Any],
+    tier: Optional[str] = None,
+    deadline: Optional[float] = None,
+    validate: Optional[Callable[[Any], bool]] = None
+) -> Optional[Tuple[Any, str, Dict[str, Any]]]:
+    """
+    Call the best model for a request on fal, falling back to the next one on failure.
+
+    Args:
+        capability: image, image_reference, video or music
+        arguments: Generic arguments, mapped per model by its ModelSpec
+        tier: "quality" or "fast"
+        deadline: Seconds the caller can wait (overrides tier)
+        validate: Returns False for an unusable result, which also triggers a fallback
+
+    Returns:
+        Optional[Tuple[Any, str, Dict[str, Any]]]: (result, model id, model arguments),
+        or None if every model failed
+    """
+    stats = ModelStats()
+    for spec in route(capability, tier, deadline, stats):
+        model_arguments = spec.map_arguments(arguments)
+        print_progress = log_progress(spec.name, emit=print)
+        completed: Dict[str, Any] = {}
+
+        def on_progress(progress: FalProgress) -> None:
+            print_progress(progress)
+            if progress["kind"] == "completed":
+                completed.update(progress)
+
+        start = time.monotonic()
+        try:
+            result = await run_with_progress_async(spec.model_id, model_arguments, on_progress)
+            ok = bool(result) and (validate is None or validate(result))
+            if not ok:
+                print(f"Model {spec.name} returned an invalid response")
+        except Exception as e:
+            print(f"Model {spec.name} failed: {e}")
+            ok = False
+        stats.record(spec, time.monotonic() - start, ok, completed.get("queue_seconds"))
+        if ok:
+            return result, spec.model_id, model_arguments
+    return None
+
+def run_text_model(
+    client: Any,
+    messages: List[Dict[str, str]],
+    tier: Optional[str] = None,
+    **kwargs: Any
+) -> Optional[Tuple[str, str]]:
+    """
+    Run an OpenAI chat completion on the best text model, falling back on failure.
+
+    Args:
+        client: openai.OpenAI client
+        messages: Chat messages
+        tier: "quality" or "fast"
+        **kwargs: Further chat.completions.create() arguments
+
+    Returns:
+        Optional[Tuple[str, str]]: (message content, model id), or None if every model failed
+    """
+    stats = ModelStats()
+    for spec in route("text", tier, stats=stats):
+        start = time.monotonic()
+        try:
+            response = client.chat.completions.create(model=spec.model_id, messages=messages, **kwargs)
+            content = response.choices[0].message.content
+        except Exception as e:
+            print(f"Model {spec.name} failed: {e}")
+            content = None
+        stats.record(spec, time.monotonic() - start, content is not None)
+        if content is not None:
+            return content, spec.model_id
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show registered models, their observed latency and routing")
+    parser.add_argument("--capability", help="Only show the routing for this capability")
+    parser.add_argument("--tier", choices=TIERS, help="Tier to route for")
+    parser.add_argument("--deadline", type=float, help="Seconds available, to route for a deadline")
+    args = parser.parse_args()
+
+    model_stats = ModelStats()
+    capabilities = [args.capability] if args.capability else sorted({spec.capability for spec in MODEL_REGISTRY.values()})
+    for capability in capabilities:
+        print(f"{capability}:")
+        for spec in route(capability, args.tier, args.deadline, model_stats):
+            entry = model_stats.stats.get(spec.name, {})
+            print(f"  {spec.name:<15} {spec.model_id:<28} quality {spec.quality}  "
+                  f"latency {model_stats.latency(spec):6.1f}s (queue {entry.get('queue_latency') or 0:.1f}s)  "
+                  f"${spec.cost:.3f}  "
+                  f"{entry.get('calls', 0)} calls, {entry.get('failures', 0)} failures"
+                  f"{'  DEGRADED' if model_stats.is_degraded(spec) else ''}")
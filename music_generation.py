@@ -1,11 +1,11 @@
 import os
 import asyncio
-import fal_client
-import requests
 from typing import Dict, Any, Optional, Union
 import time
 from pathlib import Path
 from services.utils import load_env_vars
+from services.downloader import download_file_async
+from model_registry import run_model_async
 
 # Load environment variables
 load_env_vars()
@@ -14,11 +14,13 @@ async def generate_music_async(
     prompt: str, 
     duration: int = 10, 
     output_folder: str = "input",
-    output_filename: str = "game_music.wav"
+    output_filename: str = "game_music.wav",
+    run_info: Optional[Dict[str, Any]] = None
 ) -> Optional[str]:
     """
     Generate music using CassetteAI's music generator API and download it to the specified folder.
-    Asynchronous version using run_async.
+    Asynchronous version using run_async; the model comes from model_registry.
+    If run_info is given, it is filled with the audio URL, model and arguments.
     """
     if duration < 10:
         print("Duration must be at least 10 seconds. Setting duration to 10.")
@@ -30,28 +32,25 @@ async def generate_music_async(
     if not fal_key:
         print("Error: FAL_KEY environment variable not set")
         return None
+    arguments = {
+        "prompt": prompt,
+        "duration": duration
+    }
     try:
-        result = await fal_client.run_async(
-            "CassetteAI/music-generator",
-            arguments={
-                "prompt": prompt,
-                "duration": duration
-            }
-        )
-        if not result or "audio_file" not in result or "url" not in result["audio_file"]:
+        routed = await run_model_async("music", arguments,
+                                       validate=lambda result: "url" in (result.get("audio_file") or {}))
+        if not routed:
             print("Error: Failed to generate music or invalid response")
             return None
+        result, music_model, _ = routed
         audio_url = result["audio_file"]["url"]
         print(f"Music generated successfully. URL: {audio_url}")
-        response = requests.get(audio_url)
-        if response.status_code != 200:
-            print(f"Error downloading audio file: HTTP {response.status_code}")
-            return None
-        
         output_path = os.path.join(output_folder, output_filename)
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        if not await download_file_async(audio_url, output_path):
+            return None
         print(f"Music saved to: {output_path}")
+        if run_info is not None:
+            run_info.update({"url": audio_url, "model": music_model, "arguments": arguments})
         return output_path
     except Exception as e:
         print(f"Error generating music asynchronously: {e}")
@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import argparse
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+import numpy as np
+from services.file_lock import FileLock
+from services.wav_io import open_wav, to_float, write_wav
+from music_generation import generate_music_async
+
+MUSIC_POOL_DIR = "music_pool"
+
+# Length of the long tracks generated to fill the pool, in seconds
+POOL_TRACK_DURATION = 60
+
+# Segments are cut on bar lines (4 beats) so loops and cuts land on the beat
+BEATS_PER_BAR = 4
+
+# Tempo search range for the beat tracker
+MIN_BPM = 60.0
+MAX_BPM = 180.0
+
+# Onset analysis frame and hop size in samples
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+
+# Keywords that map a music prompt to a pool mood. The first mood with the most
+# keyword hits wins; prompts without any hit use DEFAULT_MOOD.
+MOOD_KEYWORDS = {
+    "tense": ["tense", "tension", "suspense", "suspenseful", "anxious", "ominous", "stealth", "thriller"],
+    "dark": ["dark", "brooding", "sinister", "gothic", "horror", "eerie", "haunting", "menacing"],
+    "epic": ["epic", "heroic", "orchestral", "cinematic", "triumphant", "majestic", "battle", "grand"],
+    "energetic": ["energetic", "upbeat", "driving", "fast", "punchy", "aggressive", "dubstep", "drum and bass"],
+    "calm": ["calm", "ambient", "peaceful", "serene", "relaxing", "gentle", "soothing", "lo-fi"],
+    "dreamy": ["dreamy", "dreamlike", "ethereal", "floating", "wonder", "cosmic", "celestial", "shimmering"],
+    "playful": ["playful", "quirky", "whimsical", "bouncy", "chiptune", "cheerful", "cartoon", "fun"],
+}
+DEFAULT_MOOD = "energetic"
+
+def classify_mood(music_prompt: str) -> str:
+    """Map a music prompt to one of the pool moods by keyword matching"""
+    text = music_prompt.lower()
+    best_mood, best_hits = DEFAULT_MOOD, 0
+    for mood, keywords in MOOD_KEYWORDS.items():
+        hits = sum(1 for keyword in keywords if re.search(rf"\b{re.escape(keyword)}\b", text))
+        if hits > best_hits:
+            best_mood, best_hits = mood, hits
+    return best_mood
+
+def onset_envelope(mono: np.ndarray) -> np.ndarray:
+    """Spectral flux onset strength, one value per hop"""
+    if len(mono) < FRAME_SIZE:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(mono, FRAME_SIZE)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE).astype(np.float32), axis=1))
+    log_spectrum = np.log1p(100.0 * spectrum)
+    flux = np.maximum(np.diff(log_spectrum, axis=0), 0.0).sum(axis=1)
+    flux = np.concatenate(([0.0], flux))
+    # Remove the slowly varying loudness trend so only onsets remain
+    trend = np.convolve(flux, np.ones(16) / 16, mode="same")
+    return np.maximum(flux - trend, 0.0)
+
+def estimate_beats(mono: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """
+    Estimate tempo and beat positions of a mono signal.
+
+    The tempo is the autocorrelation peak of the onset envelope within
+    MIN_BPM..MAX_BPM (weighted slightly towards 120 BPM to avoid octave errors);
+    the beat phase is the offset whose beat grid collects the most onset energy.
+
+    Args:
+        mono: float32 mono samples
+        sample_rate: Samples per second
+
+    Returns:
+        Dict[str, Any]: {"tempo": bpm, "beats": beat times in seconds}
+    """
+    envelope = onset_envelope(mono)
+    hops_per_second = sample_rate / HOP_SIZE
+    if len(envelope) < 4 * hops_per_second:
+        return {"tempo": 0.0, "beats": np.zeros(0)}
+
+    centered = envelope - envelope.mean()
+    spectrum = np.fft.rfft(centered, n=2 * len(centered))
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:len(centered)]
+
+    min_lag = int(hops_per_second * 60.0 / MAX_BPM)
+    max_lag = int(hops_per_second * 60.0 / MIN_BPM)
+    lags = np.arange(min_lag, max_lag + 1)
+    bpms = 60.0 * hops_per_second / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / 120.0) / 0.9) ** 2)
+    best_lag = int(lags[np.argmax(autocorrelation[lags] * prior)])
+
+    # Refine the period below one hop with a parabola through the peak; a whole
+    # hop of error would drift the beat grid by several percent over a long track
+    left, center, right = autocorrelation[best_lag - 1:best_lag + 2]
+    curvature = left - 2 * center + right
+    period = best_lag + (0.5 * (left - right) / curvature if curvature < 0 else 0.0)
+
+    # Phase: which offset within one period lines up best with the onsets
+    grid = np.arange(0, len(envelope) - period, period)
+    offsets = np.arange(best_lag)
+    positions = np.minimum(np.rint(grid[None, :] + offsets[:, None]).astype(int), len(envelope) - 1)
+    phase = int(offsets[np.argmax(envelope[positions].sum(axis=1))])
+
+    beat_hops = np.arange(phase, len(envelope), period)
+    return {
+        "tempo": float(60.0 * hops_per_second / period),
+        "beats": beat_hops * HOP_SIZE / sample_rate,
+    }
+
+def slice_track(track_path: str, mood: str, segment_duration: float, pool_dir: str = MUSIC_POOL_DIR) -> List[Dict[str, Any]]:
+    """
+    Cut a long track into beat-aligned segments of at least segment_duration.
+
+    The WAV is memory-mapped; only the mono mix for analysis and the sample
+    ranges of each segment are read.
+
+    Args:
+        track_path: Path of the long WAV track
+        mood: Mood the track was generated for
+        segment_duration: Minimum segment length in seconds
+        pool_dir: Pool folder the segments are written to
+
+    Returns:
+        List[Dict[str, Any]]: Index entries of the written segments
+    """
+    samples, info = open_wav(track_path)
+    mono = to_float(samples).mean(axis=1)
+    analysis = estimate_beats(mono, info.sample_rate)
+    tempo, beats = analysis["tempo"], analysis["beats"]
+    if len(beats) < 2:
+        print(f"Could not find a beat in {track_path}. Skipping.")
+        return []
+
+    beat_period = 60.0 / tempo
+    bars = int(np.ceil(segment_duration / (beat_period * BEATS_PER_BAR)))
+    beats_per_segment = bars * BEATS_PER_BAR
+    print(f"{os.path.basename(track_path)}: {tempo:.1f} BPM, {len(beats)} beats, "
+          f"{beats_per_segment} beats per segment")
+
+    segment_dir = os.path.join(pool_dir, mood)
+    os.makedirs(segment_dir, exist_ok=True)
+    track_id = os.path.splitext(os.path.basename(track_path))[0]
+    entries = []
+    for number, first_beat in enumerate(range(0, len(beats) - beats_per_segment, beats_per_segment)):
+        start = int(round(beats[first_beat] * info.sample_rate))
+        end = int(round(beats[first_beat + beats_per_segment] * info.sample_rate))
+        segment_path = os.path.join(segment_dir, f"{track_id}_seg{number:02d}.wav")
+        write_wav(segment_path, samples[start:end], info.sample_rate)
+        entries.append({
+            "path": segment_path,
+            "mood": mood,
+            "tempo": round(tempo, 1),
+            "duration": (end - start) / info.sample_rate,
+            "track": track_path,
+            "uses": 0,
+            "created_at": time.time()
+        })
+    return entries
+
+class MusicPool:
+    """Index of beat-aligned music segments, keyed by mood and tempo.
+
+    The index is a JSON file next to the segments; segments are handed out
+    least-used first so the same soundtrack does not repeat back to back.
+    add() and take() update it under a lock file, as workers on other hosts
+    may share the pool folder.
+    """
+
+    def __init__(self, pool_dir: str = MUSIC_POOL_DIR):
+        self.pool_dir = pool_dir
+        self.index_file = os.path.join(pool_dir, "index.json")
+        self.entries: List[Dict[str, Any]] = self._load()
+
+    def _load(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.index_file):
+            return []
+        with open(self.index_file, 'r') as f:
+            return json.load(f)
+
+    @contextmanager
+    def locked(self) -> Iterator["MusicPool"]:
+        """Hold the pool lock and re-read the index, for changes shared with other processes"""
+        os.makedirs(self.pool_dir, exist_ok=True)
+        with FileLock(os.path.join(self.pool_dir, ".lock")):
+            self.entries = self._load()
+            yield self
+
+    def save(self) -> None:
+        """Write the index; call it inside locked() so changes of other processes are kept"""
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_file, self.index_file)
+
+    def add(self, entries: List[Dict[str, Any]]) -> None:
+        with self.locked():
+            self.entries.extend(entries)
+            self.save()
+
+    def find(self, mood: str, min_duration: float, tempo_range: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """Segments of a mood at least min_duration long, least used first"""
+        matches = [
+            entry for entry in self.entries
+            if entry["mood"] == mood and entry["duration"] >= min_duration and os.path.exists(entry["path"])
+            and (tempo_range is None or tempo_range[0] <= entry["tempo"] <= tempo_range[1])
+        ]
+        return sorted(matches, key=lambda entry: (entry["uses"], entry["created_at"]))
+
+    def take(self, mood: str, min_duration: float, tempo_range: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+        """Return the least used matching segment and count the use, or None if the pool has none"""
+        with self.locked():
+            matches = self.find(mood, min_duration, tempo_range)
+            if not matches:
+                return None
+            entry = matches[0]
+            entry["uses"] += 1
+            self.save()
+            return entry
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Number of segments and unused segments per mood"""
+        result: Dict[str, Dict[str, int]] = {}
+        for entry in self.entries:
+            stats = result.setdefault(entry["mood"], {"segments": 0, "unused": 0})
+            stats["segments"] += 1
+            stats["unused"] += entry["uses"] == 0
+        return result
+
+async def fill_pool_async(
+    mood: str,
+    music_prompt: str,
+    segment_duration: float = 10,
+    track_duration: int = POOL_TRACK_DURATION,
+    pool: Optional[MusicPool] = None
+) -> int:
+    """
+    Generate one long track for a mood and add its segments to the pool.
+
+    Returns:
+        int: Number of segments added
+    """
+    pool = pool or MusicPool()
+    track_dir = os.path.join(pool.pool_dir, "tracks")
+    track_name = f"{mood}_{time.strftime('%Y%m%d-%H%M%S')}.wav"
+    track_path = await generate_music_async(
+        prompt=music_prompt,
+        duration=track_duration,
+        output_folder=track_dir,
+        output_filename=track_name
+    )
+    if not track_path:
+        return 0
+    try:
+        entries = await asyncio.to_thread(slice_track, track_path, mood, segment_duration, pool.pool_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error slicing {track_path}: {e}")
+        return 0
+    await asyncio.to_thread(pool.add, entries)
+    print(f"Added {len(entries)} {mood} segments to the music pool")
+    return len(entries)
+
+async def get_pooled_music_async(
+    music_prompt: str,
+    duration: float = 10,
+    output_folder: str = "input",
+    output_filename: str = "game_music.wav",
+    pool: Optional[MusicPool] = None,
+    run_info: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """
+    Get a soundtrack for a music prompt from the pool, filling the pool only when it runs dry.
+
+    Args:
+        music_prompt: Music prompt of the run (used for the mood and to fill the pool)
+        duration: Minimum soundtrack length in seconds
+        output_folder: Folder to copy the segment to
+        output_filename: Filename of the soundtrack
+        pool: Optional MusicPool (defaults to the one in music_pool/)
+        run_info: If given, filled with the segment details for the run catalog
+
+    Returns:
+        Optional[str]: Path of the soundtrack, or None on failure
+    """
+    pool = pool or MusicPool()
+    mood = classify_mood(music_prompt)
+    entry = await asyncio.to_thread(pool.take, mood, duration)
+    if not entry:
+        print(f"Music pool has no '{mood}' segment of {duration}s. Generating a {POOL_TRACK_DURATION}s track...")
+        await fill_pool_async(mood, music_prompt, duration, pool=pool)
+        entry = await asyncio.to_thread(pool.take, mood, duration)
+        if not entry:
+            return None
+
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = os.path.join(output_folder, output_filename)
+    shutil.copyfile(entry["path"], output_path)
+    print(f"Using pooled {mood} music ({entry['tempo']} BPM, {entry['duration']:.1f}s): {entry['path']}")
+    if run_info is not None:
+        run_info.update({"url": None, "model": "music-pool",
+                         "arguments": {"mood": mood, "tempo": entry["tempo"], "segment": entry["path"]}})
+    return output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the pool of beat-aligned music segments")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fill_parser = subparsers.add_parser("fill", help="Generate long tracks and slice them into the pool")
+    fill_parser.add_argument("--prompt", required=True, help="Music prompt for the tracks")
+    fill_parser.add_argument("--mood", help="Pool mood (default: derived from the prompt)")
+    fill_parser.add_argument("--tracks", type=int, default=1, help="Number of tracks to generate (default: 1)")
+    fill_parser.add_argument("--track-duration", type=int, default=POOL_TRACK_DURATION,
+                             help=f"Length of each track in seconds (default: {POOL_TRACK_DURATION})")
+    fill_parser.add_argument("--segment-duration", type=float, default=10, help="Minimum segment length in seconds (default: 10)")
+
+    slice_parser = subparsers.add_parser("slice", help="Slice an existing WAV track into the pool")
+    slice_parser.add_argument("track", help="Path of the WAV track")
+    slice_parser.add_argument("--mood", required=True, help="Pool mood")
+    slice_parser.add_argument("--segment-duration", type=float, default=10, help="Minimum segment length in seconds (default: 10)")
+
+    subparsers.add_parser("status", help="Show segments per mood")
+    args = parser.parse_args()
+
+    if args.command == "fill":
+        mood = args.mood or classify_mood(args.prompt)
+        for _ in range(args.tracks):
+            asyncio.run(fill_pool_async(mood, args.prompt, args.segment_duration, args.track_duration))
+    elif args.command == "slice":
+        music_pool = MusicPool()
+        music_pool.add(slice_track(args.track, args.mood, args.segment_duration))
+    else:
+        for pool_mood, stats in sorted(MusicPool().summary().items()):
+            print(f"{pool_mood:<10} {stats['segments']} segments, {stats['unused']} unused")
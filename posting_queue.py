@@ -0,0 +1,293 @@
+import os
+import time
+import asyncio
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import tweepy
+from run_catalog import RunCatalog, CATALOG_PATH
+from services.twitter_auth import get_account, get_account_names
+from services.tweet import tweet_async
+
+QUEUE_PATH = "posting_queue.db"
+
+# Posts allowed per account per day (the free API tier allows 17 posts per
+# 24 hours); override with TWITTER_POSTS_PER_DAY or TWITTER_<NAME>_POSTS_PER_DAY
+DEFAULT_POSTS_PER_DAY = 17
+RATE_WINDOW = 24 * 3600
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 300
+# A post stuck in "posting" this long belongs to a worker that died
+STALE_CLAIM_SECONDS = 3600
+WORKER_POLL_INTERVAL = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    text TEXT NOT NULL,
+    media_path TEXT,
+    run_id TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    not_before REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    tweet_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    posted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_due ON posts (status, account, not_before);
+"""
+
+def posts_per_day(account: str) -> int:
+    """Daily post budget of an account"""
+    value = os.getenv(f"TWITTER_{account.upper()}_POSTS_PER_DAY") or os.getenv("TWITTER_POSTS_PER_DAY")
+    return max(1, int(value)) if value else DEFAULT_POSTS_PER_DAY
+
+class PostingQueue:
+    """Persistent SQLite queue of tweets, spread over per-account time slots.
+
+    Each account gets one slot every RATE_WINDOW / posts_per_day(account)
+    seconds; a new post takes the first free slot of its account, so a batch
+    of posts goes out at the highest cadence the account's budget allows.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # Rollback journal rather than WAL: WAL needs shared memory on one host, and
+        # worker hosts share this file over the network (see services/job_queue.py)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _next_slot(self, account: str, now: float) -> float:
+        spacing = RATE_WINDOW / posts_per_day(account)
+        row = self.conn.execute(
+            "SELECT MAX(CASE WHEN status = 'posted' THEN posted_at ELSE not_before END) FROM posts "
+            "WHERE account = ? AND status IN ('queued', 'posting', 'posted')", (account,)
+        ).fetchone()
+        last = row[0]
+        return now if last is None else max(now, last + spacing)
+
+    def enqueue(
+        self,
+        text: str,
+        media_path: Optional[str] = None,
+        accounts: Optional[List[str]] = None,
+        run_id: Optional[str] = None
+    ) -> List[int]:
+        """
+        Queue a post for one or more accounts.
+
+        Args:
+            text: Tweet text
+            media_path: Media file to attach
+            accounts: Account names (default: every configured account)
+            run_id: Catalog run the post belongs to; its tweet id is recorded when posted
+
+        Returns:
+            List[int]: Ids of the queued posts
+        """
+        accounts = accounts or get_account_names()
+        now = time.time()
+        ids = []
+        with self.conn:
+            for account in accounts:
+                if run_id:
+                    # Queuing a run again (e.g. a retried job) does not post it twice
+                    existing = self.conn.execute("SELECT id FROM posts WHERE run_id = ? AND account = ?",
+                                                 (run_id, account)).fetchone()
+                    if existing:
+                        ids.append(existing[0])
+                        continue
+                cursor = self.conn.execute(
+                    "INSERT INTO posts (account, text, media_path, run_id, not_before, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (account, text, media_path, run_id, self._next_slot(account, now), now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def claim_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Claim the earliest due post of every account that is within its daily budget"""
+        now = now or time.time()
+        claimed = []
+        with self.conn:
+            # Release posts of workers that died mid-post
+            self.conn.execute("UPDATE posts SET status = 'queued' WHERE status = 'posting' AND claimed_at < ?",
+                              (now - STALE_CLAIM_SECONDS,))
+            rows = self.conn.execute(
+                "SELECT * FROM posts p WHERE status = 'queued' AND not_before <= ? AND id = ("
+                "SELECT id FROM posts WHERE account = p.account AND status = 'queued' "
+                "ORDER BY not_before, id LIMIT 1)", (now,)
+            ).fetchall()
+            for row in rows:
+                busy = self.conn.execute("SELECT 1 FROM posts WHERE account = ? AND status = 'posting'",
+                                         (row["account"],)).fetchone()
+                posted_today = self.conn.execute(
+                    "SELECT COUNT(*) FROM posts WHERE account = ? AND status = 'posted' AND posted_at > ?",
+                    (row["account"], now - RATE_WINDOW)
+                ).fetchone()[0]
+                if busy or posted_today >= posts_per_day(row["account"]):
+                    continue
+                cursor = self.conn.execute(
+                    "UPDATE posts SET status = 'posting', claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ? AND status = 'queued'", (now, row["id"]))
+                if cursor.rowcount:
+                    claimed.append(dict(row, status="posting", claimed_at=now, attempts=row["attempts"] + 1))
+        return claimed
+
+    def mark_posted(self, post_id: int, tweet_id: str) -> None:
+        with self.conn:
+            self.conn.execute("UPDATE posts SET status = 'posted', tweet_id = ?, posted_at = ?, error = NULL "
+                              "WHERE id = ?", (tweet_id, time.time(), post_id))
+
+    def mark_failed(self, post_id: int, error: str, retry_at: Optional[float] = None) -> None:
+        """Put a post back in the queue for retry_at, or fail it after MAX_ATTEMPTS"""
+        with self.conn:
+            attempts = self.conn.execute("SELECT attempts FROM posts WHERE id = ?", (post_id,)).fetchone()[0]
+            if retry_at is not None and attempts < MAX_ATTEMPTS:
+                self.conn.execute("UPDATE posts SET status = 'queued', not_before = ?, error = ? WHERE id = ?",
+                                  (retry_at, error, post_id))
+            else:
+                self.conn.execute("UPDATE posts SET status = 'failed', error = ? WHERE id = ?", (error, post_id))
+
+    def next_due_time(self) -> Optional[float]:
+        row = self.conn.execute("SELECT MIN(not_before) FROM posts WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def list_posts(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+        rows = self.conn.execute(f"SELECT * FROM posts {where} ORDER BY not_before DESC LIMIT ?", (*params, limit))
+        return [dict(r) for r in rows]
+
+async def _send(queue: PostingQueue, post: Dict[str, Any], catalog_path: str) -> None:
+    try:
+        account_api, account_client = get_account(post["account"])
+        tweet_id = await tweet_async(post["text"], post["media_path"], account_api, account_client, post["account"])
+    except tweepy.TooManyRequests as e:
+        reset = e.response.headers.get("x-rate-limit-reset") if e.response is not None else None
+        retry_at = float(reset) if reset else time.time() + RETRY_DELAY
+        print(f"Rate limited on {post['account']}; post {post['id']} retries at {datetime.fromtimestamp(retry_at):%H:%M}")
+        queue.mark_failed(post["id"], str(e), retry_at)
+        return
+    except KeyError as e:
+        # Missing credentials will not fix themselves
+        queue.mark_failed(post["id"], str(e))
+        print(f"Post {post['id']} failed: {e}")
+        return
+    except Exception as e:
+        queue.mark_failed(post["id"], str(e), time.time() + RETRY_DELAY * post["attempts"])
+        print(f"Post {post['id']} to {post['account']} failed: {e}")
+        return
+
+    if not tweet_id:
+        queue.mark_failed(post["id"], "no tweet id returned", time.time() + RETRY_DELAY * post["attempts"])
+        return
+    queue.mark_posted(post["id"], str(tweet_id))
+    if post["run_id"] and os.path.exists(catalog_path):
+        catalog = RunCatalog(catalog_path)
+        try:
+            run = catalog.get_run(post["run_id"])
+            # A run posted to several accounts keeps the id of its first tweet
+            if run and not run["tweet_id"]:
+                catalog.record_tweet(post["run_id"], str(tweet_id), post["text"])
+        finally:
+            catalog.close()
+
+async def run_worker_async(
+    queue_path: str = QUEUE_PATH,
+    catalog_path: str = CATALOG_PATH,
+    once: bool = False
+) -> None:
+    """
+    Drain the posting queue: post every due post, accounts in parallel, then
+    sleep until the next slot (checking at least every WORKER_POLL_INTERVAL).
+
+    Args:
+        queue_path: Queue database path
+        catalog_path: Run catalog to record tweet ids in
+        once: Post what is due now and return
+    """
+    queue = PostingQueue(queue_path)
+    try:
+        while True:
+            due = queue.claim_due()
+            if due:
+                print(f"Posting {len(due)} queued post(s): {', '.join(p['account'] for p in due)}")
+                await asyncio.gather(*(_send(queue, post, catalog_path) for post in due))
+                continue
+            if once:
+                return
+            next_due = queue.next_due_time()
+            wait = WORKER_POLL_INTERVAL if next_due is None else min(WORKER_POLL_INTERVAL, max(1.0, next_due - time.time()))
+            await asyncio.sleep(wait)
+    finally:
+        queue.close()
+
+def _format_time(timestamp: Optional[float]) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue tweets for several accounts and post them within rate limits")
+    parser.add_argument("--queue", default=QUEUE_PATH, help=f"Queue database path (default: {QUEUE_PATH})")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help=f"Catalog database path (default: {CATALOG_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Queue a post")
+    add_parser.add_argument("--text", required=True, help="Tweet text")
+    add_parser.add_argument("--media", help="Media file to attach")
+    add_parser.add_argument("--accounts", nargs="+", help="Account names (default: all configured accounts)")
+
+    run_parser = subparsers.add_parser("add-run", help="Queue the final video and tweet text of catalog runs")
+    run_parser.add_argument("run_ids", nargs="+", help="Run ids")
+    run_parser.add_argument("--accounts", nargs="+", help="Account names (default: all configured accounts)")
+
+    list_parser = subparsers.add_parser("list", help="Show queued and recent posts")
+    list_parser.add_argument("--status", help="queued, posting, posted or failed")
+
+    work_parser = subparsers.add_parser("work", help="Run the posting worker")
+    work_parser.add_argument("--once", action="store_true", help="Post what is due now and exit")
+
+    args = parser.parse_args()
+    if args.command == "work":
+        asyncio.run(run_worker_async(args.queue, args.catalog, args.once))
+        return
+
+    queue = PostingQueue(args.queue)
+    try:
+        if args.command == "add":
+            ids = queue.enqueue(args.text, args.media, args.accounts)
+            print(f"Queued {len(ids)} post(s)")
+        elif args.command == "add-run":
+            catalog = RunCatalog(args.catalog)
+            try:
+                for run_id in args.run_ids:
+                    run = catalog.get_run(run_id)
+                    finals = catalog.get_artifacts(run_id, "final") if run else []
+                    if not run or not run["tweet_text"] or not finals:
+                        print(f"Skipping {run_id}: run, tweet text or final video not found")
+                        continue
+                    ids = queue.enqueue(run["tweet_text"], finals[-1]["path"], args.accounts, run_id)
+                    print(f"Queued {run_id} for {len(ids)} account(s)")
+            finally:
+                catalog.close()
+        else:
+            for post in queue.list_posts(args.status):
+                print(f"{post['id']:>5}  {post['account']:<12} {post['status']:<8} {_format_time(post['not_before'])}  "
+                      f"{post['tweet_id'] or post['error'] or ''}")
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import re
+import hashlib
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+from services.hash_index import HammingIndex, HASH_BITS
+from services.file_lock import FileLock
+
+PROMPT_INDEX_DIR = os.path.join("prompts", "index")
+
+# SimHash distance (out of 64 bits) at or below which two prompts count as near-duplicates
+DEFAULT_MAX_DISTANCE = 6
+
+# Only a preview of each prompt is stored next to its hash to keep the index small
+PREVIEW_CHARS = 200
+
+# Words too common in our prompts to say anything about the concept
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "with", "to", "as", "for", "by", "at", "from",
+    "into", "is", "are", "its", "their", "while", "that", "this", "each", "every",
+}
+
+def _tokens(text: str) -> list:
+    """Lowercase word tokens without stopwords"""
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+def _feature_hash(feature: str) -> int:
+    """Stable 64-bit hash of a feature (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash(text: str) -> int:
+    """
+    Compute a 64-bit SimHash of a prompt.
+
+    Features are single words plus word bigrams, so both vocabulary and phrasing
+    contribute. Similar prompts end up with hashes that differ in few bits.
+
+    Args:
+        text: The prompt text
+
+    Returns:
+        int: The 64-bit SimHash
+    """
+    words = _tokens(text)
+    features: Dict[str, int] = {}
+    for word in words:
+        features[word] = features.get(word, 0) + 1
+    for first, second in zip(words, words[1:]):
+        bigram = f"{first} {second}"
+        features[bigram] = features.get(bigram, 0) + 2
+
+    totals = [0] * HASH_BITS
+    for feature, weight in features.items():
+        value = _feature_hash(feature)
+        for bit in range(HASH_BITS):
+            if value >> bit & 1:
+                totals[bit] += weight
+            else:
+                totals[bit] -= weight
+
+    result = 0
+    for bit, total in enumerate(totals):
+        if total > 0:
+            result |= 1 << bit
+    return result
+
+class PromptIndex:
+    """Persistent near-duplicate index over past video and music prompts.
+
+    Video and music prompts are kept in separate SimHash indexes stored under
+    `index_dir`, so a concept is only compared against prompts of the same kind.
+
+    Attributes:
+        max_distance: SimHash distance at or below which prompts are duplicates
+    """
+
+    def __init__(self, index_dir: str = PROMPT_INDEX_DIR, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.index_dir = index_dir
+        self.video = HammingIndex(max_distance, os.path.join(index_dir, "video_prompts.jsonl"))
+        self.music = HammingIndex(max_distance, os.path.join(index_dir, "music_prompts.jsonl"))
+
+    @contextmanager
+    def locked(self) -> Iterator["PromptIndex"]:
+        """
+        Hold the index lock and catch up with prompts added by other processes.
+
+        Wrap a find_duplicate() -> add() sequence in it so that concurrent runs,
+        in threads or on other hosts sharing the index folder, cannot both
+        accept near-duplicate prompts.
+        """
+        with FileLock(os.path.join(self.index_dir, ".lock")):
+            self.video.refresh()
+            self.music.refresh()
+            yield self
+
+    def find_duplicate(self, video_prompt: str, music_prompt: str) -> Optional[Tuple[str, int, Dict[str, Any]]]:
+        """
+        Check a prompt pair against the history.
+
+        Args:
+            video_prompt: The generated video prompt
+            music_prompt: The generated music prompt
+
+        Returns:
+            Optional[Tuple[str, int, Dict[str, Any]]]: (kind, distance, entry) of the closest
+            earlier prompt if either prompt is a near-duplicate, otherwise None
+        """
+        for kind, index, prompt in (("video", self.video, video_prompt), ("music", self.music, music_prompt)):
+            match = index.nearest(simhash(prompt))
+            if match:
+                distance, entry = match
+                return kind, distance, entry
+        return None
+
+    def add(self, video_prompt: str, music_prompt: str) -> None:
+        """Record a prompt pair so later runs are compared against it"""
+        added_at = time.time()
+        self.video.add(simhash(video_prompt), {"prompt": video_prompt[:PREVIEW_CHARS], "added_at": added_at})
+        self.music.add(simhash(music_prompt), {"prompt": music_prompt[:PREVIEW_CHARS], "added_at": added_at})
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from run_catalog import RunCatalog, CATALOG_PATH
+from merge_audio_video import concat_videos_async
+from services.ffmpeg_runner import run_media_command, print_progress
+
+DEFAULT_REEL_PATH = os.path.join("output", "reel.mp4")
+DEFAULT_TRANSITION = "fade"
+DEFAULT_TRANSITION_DURATION = 0.5
+
+# Audio format used when a clip has no audio track or needs resampling
+REEL_SAMPLE_RATE = 44100
+
+async def probe_clip(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the stream parameters of a clip with one ffprobe call.
+
+    Returns:
+        Optional[Dict[str, Any]]: duration, video/audio format fields, or None if probing failed
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration:stream=codec_type,codec_name,width,height,r_frame_rate,'
+                         'pix_fmt,sample_aspect_ratio,sample_rate,channels',
+        '-of', 'json', path
+    ]
+    try:
+        data = json.loads(await run_media_command(cmd, capture_stdout=True))
+    except FileNotFoundError:
+        print("Error: ffprobe command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return None
+    except (subprocess.CalledProcessError, ValueError) as e:
+        print(f"Error probing {path}: {e}")
+        return None
+
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    if video is None or "duration" not in data.get("format", {}):
+        print(f"Error probing {path}: no video stream or duration")
+        return None
+    numerator, _, denominator = video.get("r_frame_rate", "16/1").partition("/")
+    return {
+        "path": path,
+        "duration": float(data["format"]["duration"]),
+        "video_format": (video.get("codec_name"), video.get("width"), video.get("height"),
+                         round(float(numerator) / float(denominator or 1), 3), video.get("pix_fmt"),
+                         video.get("sample_aspect_ratio", "1:1")),
+        "audio_format": (audio.get("codec_name"), int(audio.get("sample_rate", 0)), audio.get("channels"))
+                        if audio else None,
+    }
+
+def select_reel_clips(
+    catalog: RunCatalog,
+    run_ids: Optional[List[str]] = None,
+    since: Optional[float] = None,
+    style_category: Optional[str] = None,
+    visual_style: Optional[str] = None,
+    posted: Optional[bool] = None,
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Pick merged clips ("final" artifacts) from the run history.
+
+    Returns:
+        List[Dict[str, Any]]: {"run_id", "path"} per clip, oldest first
+    """
+    if run_ids:
+        runs = [run for run in (catalog.get_run(run_id) for run_id in run_ids) if run]
+    else:
+        runs = catalog.query_runs(style_category=style_category, visual_style=visual_style, since=since,
+                                  posted=posted, limit=limit)
+        runs.reverse()
+
+    clips = []
+    for run in runs:
+        finals = [a for a in catalog.get_artifacts(run["id"], "final") if a["path"] and os.path.exists(a["path"])]
+        if not finals:
+            continue
+        clips.append({"run_id": run["id"], "path": finals[-1]["path"]})
+    return clips
+
+def build_reel_filter(
+    clips: List[Dict[str, Any]],
+    transition: str,
+    transition_duration: float
+) -> Tuple[str, float]:
+    """
+    Build one filter graph that joins all clips, with transitions if requested.
+
+    Clips are converted only when their format differs from the most common
+    one (scale/pad, frame rate, pixel format, resampling); clips that already
+    match go straight into the transitions.
+
+    Returns:
+        Tuple[str, float]: (filter graph ending in [v] and [a], output duration)
+    """
+    target_video = Counter(clip["video_format"] for clip in clips).most_common(1)[0][0]
+    _, width, height, fps, pix_fmt, _ = target_video
+    audio_formats = [clip["audio_format"] for clip in clips if clip["audio_format"]]
+    target_audio = Counter(audio_formats).most_common(1)[0][0] if audio_formats else None
+    sample_rate = target_audio[1] if target_audio else REEL_SAMPLE_RATE
+
+    parts = []
+    for i, clip in enumerate(clips):
+        duration = clip["duration"]
+        video_chain = []
+        if clip["video_format"] != target_video:
+            video_chain.append(
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format={pix_fmt}"
+            )
+        # Same time base everywhere, as xfade and concat require
+        video_chain.append("settb=AVTB")
+        parts.append(f"[{i}:v]{','.join(video_chain)}[v{i}]")
+
+        if clip["audio_format"] is None:
+            audio_source = f"anullsrc=r={sample_rate}:cl=stereo,"
+        elif clip["audio_format"] != target_audio:
+            audio_source = f"[{i}:a]aresample={sample_rate},aformat=channel_layouts=stereo,"
+        else:
+            audio_source = f"[{i}:a]"
+        # Pad/trim the audio to the video length so the transitions stay in sync
+        parts.append(f"{audio_source}apad,atrim=duration={duration:.3f},asetpts=PTS-STARTPTS[a{i}]")
+
+    if transition == "none" or len(clips) == 1:
+        inputs = "".join(f"[v{i}][a{i}]" for i in range(len(clips)))
+        parts.append(f"{inputs}concat=n={len(clips)}:v=1:a=1[v][a]")
+        return ";".join(parts), sum(clip["duration"] for clip in clips)
+
+    # A transition cannot be longer than half of the shortest clip
+    fade = min(transition_duration, min(clip["duration"] for clip in clips) / 2)
+    video_label, audio_label = "v0", "a0"
+    offset = clips[0]["duration"] - fade
+    for i in range(1, len(clips)):
+        last = i == len(clips) - 1
+        next_video, next_audio = ("v", "a") if last else (f"vx{i}", f"ax{i}")
+        parts.append(f"[{video_label}][v{i}]xfade=transition={transition}:duration={fade:.3f}:"
+                     f"offset={offset:.3f}[{next_video}]")
+        parts.append(f"[{audio_label}][a{i}]acrossfade=d={fade:.3f}[{next_audio}]")
+        video_label, audio_label = next_video, next_audio
+        offset += clips[i]["duration"] - fade
+    return ";".join(parts), offset + fade
+
+async def build_reel_async(
+    clip_paths: List[str],
+    output_path: str = DEFAULT_REEL_PATH,
+    transition: str = DEFAULT_TRANSITION,
+    transition_duration: float = DEFAULT_TRANSITION_DURATION
+) -> Optional[str]:
+    """
+    Join clips into one reel.
+
+    Hard cuts between clips that share one format are a stream copy through the
+    concat demuxer; anything else is rendered in a single ffmpeg run with one
+    filter graph.
+
+    Args:
+        clip_paths: Merged clips in reel order
+        output_path: Where to save the reel
+        transition: xfade transition name (fade, dissolve, wipeleft, ...) or "none" for hard cuts
+        transition_duration: Length of each transition in seconds
+
+    Returns:
+        Optional[str]: Path of the reel, or None on failure
+    """
+    if not clip_paths:
+        print("Error: No clips to join")
+        return None
+    probes = await asyncio.gather(*(probe_clip(path) for path in clip_paths))
+    clips = [clip for clip in probes if clip]
+    if len(clips) < len(clip_paths):
+        print(f"Skipping {len(clip_paths) - len(clips)} clip(s) that could not be probed")
+    if not clips:
+        return None
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    uniform = len({(clip["video_format"], clip["audio_format"]) for clip in clips}) == 1
+    if transition == "none" and uniform:
+        print(f"Joining {len(clips)} clips with stream copy")
+        if not await concat_videos_async([clip["path"] for clip in clips], output_path):
+            return None
+        print(f"Reel saved to: {output_path}")
+        return output_path
+
+    filter_graph, duration = build_reel_filter(clips, transition, transition_duration)
+    cmd = ['ffmpeg', '-v', 'error']
+    for clip in clips:
+        cmd += ['-i', clip["path"]]
+    cmd += [
+        '-filter_complex', filter_graph,
+        '-map', '[v]', '-map', '[a]',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac',
+        '-movflags', '+faststart',
+        '-y',  # Always overwrite output file
+        output_path
+    ]
+    print(f"Rendering {len(clips)} clips ({duration:.1f}s) with '{transition}' transitions")
+    try:
+        await run_media_command(cmd, on_progress=print_progress("Reel", duration))
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error rendering reel: {e}")
+        print(f"Error output: {e.stderr}")
+        return None
+    print(f"Reel saved to: {output_path}")
+    return output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a compilation reel from merged clips in the run history")
+    parser.add_argument("--runs", nargs="+", help="Run ids to include, in order (default: query the catalog)")
+    parser.add_argument("--since-days", type=float, default=7, help="Runs from the last N days (default: 7)")
+    parser.add_argument("--style-category", help="Only runs from this visual style category")
+    parser.add_argument("--visual-style", help="Only runs whose visual style contains this text")
+    parser.add_argument("--posted", action="store_true", help="Only runs that were posted")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of clips (default: 20)")
+    parser.add_argument("--transition", default=DEFAULT_TRANSITION,
+                        help=f"xfade transition, or 'none' for hard cuts (default: {DEFAULT_TRANSITION})")
+    parser.add_argument("--transition-duration", type=float, default=DEFAULT_TRANSITION_DURATION,
+                        help=f"Transition length in seconds (default: {DEFAULT_TRANSITION_DURATION})")
+    parser.add_argument("-o", "--output", default=DEFAULT_REEL_PATH, help=f"Output path (default: {DEFAULT_REEL_PATH})")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help=f"Catalog database path (default: {CATALOG_PATH})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.catalog):
+        print(f"Catalog not found: {args.catalog}")
+    else:
+        catalog = RunCatalog(args.catalog)
+        try:
+            selected = select_reel_clips(
+                catalog,
+                run_ids=args.runs,
+                since=time.time() - args.since_days * 86400 if args.since_days else None,
+                style_category=args.style_category,
+                visual_style=args.visual_style,
+                posted=True if args.posted else None,
+                limit=args.limit
+            )
+        finally:
+            catalog.close()
+        print(f"Selected {len(selected)} clip(s): {', '.join(clip['run_id'] for clip in selected)}")
+        asyncio.run(build_reel_async([clip["path"] for clip in selected], args.output,
+                                     args.transition, args.transition_duration))
@@ -0,0 +1,260 @@
+import os
+import time
+import asyncio
+import zipfile
+import sqlite3
+import argparse
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from run_catalog import RunCatalog, CATALOG_PATH
+
+# posting_queue.QUEUE_PATH; read directly so retention does not need the
+# Twitter client or credentials
+QUEUE_PATH = "posting_queue.db"
+
+# Evictions per pass; a pass stops early so background runs never hog the disk
+DEFAULT_MAX_ACTIONS_PER_PASS = 50
+# Pause between two evictions of a pass, to leave I/O for running jobs
+ACTION_PAUSE = 0.05
+DEFAULT_INTERVAL = 600
+
+# Order in which the kinds of a run's artifacts are given up: intermediates before the final video
+KIND_VALUE = {"image": 0, "video_draft": 1, "music": 2, "video": 3, "final": 4}
+# Runs that did not produce anything worth keeping go first
+WORTHLESS_RUN_STATUSES = ("failed", "rejected")
+# Runs still being generated or waiting for a review of their QA flags are never touched
+ACTIVE_RUN_STATUSES = ("running", "flagged")
+# Finished runs that count for keep_last_per_style
+FINISHED_RUN_STATUSES = ("completed", "promoted")
+# These formats are already compressed; archives store them as they are
+PRECOMPRESSED_EXTENSIONS = (".mp4", ".mov", ".jpg", ".jpeg", ".png", ".webp", ".mp3", ".m4a", ".aac")
+
+class RetentionPolicy:
+    """What the retention manager keeps.
+
+    Attributes:
+        max_bytes: Total size of the catalog's artifact files to stay under (None: no limit)
+        max_age_days: Artifacts older than this are evicted (None: no limit)
+        keep_posted: Never evict artifacts of posted runs
+        keep_last_per_style: Never evict the newest N completed runs of each style category
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_age_days: Optional[float] = None,
+                 keep_posted: bool = True, keep_last_per_style: int = 0):
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.keep_posted = keep_posted
+        self.keep_last_per_style = keep_last_per_style
+
+    @classmethod
+    def from_env(cls) -> Optional["RetentionPolicy"]:
+        """Policy from RETENTION_MAX_GB / RETENTION_MAX_AGE_DAYS / RETENTION_KEEP_LAST_PER_STYLE, or None if unset"""
+        max_gb = os.getenv("RETENTION_MAX_GB")
+        max_age_days = os.getenv("RETENTION_MAX_AGE_DAYS")
+        if not max_gb and not max_age_days:
+            return None
+        return cls(max_bytes=int(float(max_gb) * 1024 ** 3) if max_gb else None,
+                   max_age_days=float(max_age_days) if max_age_days else None,
+                   keep_last_per_style=int(os.getenv("RETENTION_KEEP_LAST_PER_STYLE", "0")))
+
+class RetentionManager:
+    """Keeps the disk usage of run artifacts within a RetentionPolicy.
+
+    Artifacts are ranked with the run catalog: files of failed or rejected
+    runs first, then unposted before posted runs and, within a run,
+    intermediates (image, draft, music, raw video) before the final video,
+    oldest first within each group. Files of running runs, files
+    still waiting in the posting queue and whatever the policy keeps are
+    never evicted. Evicted files are deleted, or moved into one zip archive
+    per run when an archive folder is given, and marked in the catalog.
+    """
+
+    def __init__(self, policy: RetentionPolicy, catalog_path: str = CATALOG_PATH, queue_path: str = QUEUE_PATH,
+                 archive_dir: Optional[str] = None, dry_run: bool = False):
+        self.policy = policy
+        self.catalog_path = catalog_path
+        self.queue_path = queue_path
+        self.archive_dir = archive_dir
+        self.dry_run = dry_run
+
+    def _protected_paths(self, artifacts: List[Dict[str, Any]]) -> Set[str]:
+        protected: Set[str] = set()
+        if os.path.exists(self.queue_path):
+            # Media of posts that have not been sent yet
+            conn = sqlite3.connect(self.queue_path, timeout=30)
+            try:
+                rows = conn.execute("SELECT DISTINCT media_path FROM posts "
+                                    "WHERE status IN ('queued', 'posting') AND media_path IS NOT NULL")
+                protected.update(os.path.normpath(row[0]) for row in rows)
+            finally:
+                conn.close()
+
+        newest_runs: Dict[Optional[str], List[Tuple[float, str]]] = defaultdict(list)
+        for artifact in artifacts:
+            if artifact["run_status"] in FINISHED_RUN_STATUSES:
+                newest_runs[artifact["style_category"]].append((artifact["run_created_at"], artifact["run_id"]))
+        kept_runs = set()
+        for runs in newest_runs.values():
+            kept_runs.update(run_id for _, run_id in sorted(set(runs), reverse=True)[:self.policy.keep_last_per_style])
+
+        for artifact in artifacts:
+            if (artifact["run_status"] in ACTIVE_RUN_STATUSES
+                    or (self.policy.keep_posted and artifact["tweet_id"])
+                    or artifact["run_id"] in kept_runs):
+                protected.add(os.path.normpath(artifact["path"]))
+        return protected
+
+    def plan(self, catalog: RunCatalog) -> Tuple[List[Tuple[Dict[str, Any], str]], List[Dict[str, Any]], int]:
+        """
+        Decide what to evict.
+
+        Returns:
+            Tuple: (artifacts to evict in order with the reason, catalog entries
+            whose file is already gone, total bytes currently stored)
+        """
+        artifacts = catalog.get_stored_artifacts()
+        missing = [artifact for artifact in artifacts if not os.path.isfile(artifact["path"])]
+        stored = [artifact for artifact in artifacts if os.path.isfile(artifact["path"])]
+        protected = self._protected_paths(stored)
+
+        # Several artifacts can share a file; count and evict each file once
+        by_path: Dict[str, Dict[str, Any]] = {}
+        for artifact in stored:
+            by_path.setdefault(os.path.normpath(artifact["path"]), artifact)
+        sizes = {path: os.path.getsize(path) for path in by_path}
+        total_bytes = sum(sizes.values())
+
+        def value(path: str) -> Tuple[int, int, float]:
+            artifact = by_path[path]
+            run_value = 0 if artifact["run_status"] in WORTHLESS_RUN_STATUSES else (2 if artifact["tweet_id"] else 1)
+            return run_value, KIND_VALUE.get(artifact["kind"], 0), artifact["created_at"]
+
+        candidates = sorted((path for path in by_path if path not in protected), key=value)
+        evictions: List[Tuple[Dict[str, Any], str]] = []
+        remaining = total_bytes
+        cutoff = time.time() - self.policy.max_age_days * 86400 if self.policy.max_age_days else None
+        for path in candidates:
+            if cutoff is not None and by_path[path]["created_at"] < cutoff:
+                reason = "expired"
+            elif self.policy.max_bytes is not None and remaining > self.policy.max_bytes:
+                reason = "over size limit"
+            else:
+                continue
+            evictions.append((by_path[path], reason))
+            remaining -= sizes[path]
+        return evictions, missing, total_bytes
+
+    def _archive(self, artifact: Dict[str, Any]) -> str:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_path = os.path.join(self.archive_dir, f"{artifact['run_id']}.zip")
+        compression = (zipfile.ZIP_STORED if artifact["path"].lower().endswith(PRECOMPRESSED_EXTENSIONS)
+                       else zipfile.ZIP_DEFLATED)
+        with zipfile.ZipFile(archive_path, "a", compression=compression) as archive:
+            archive.write(artifact["path"], f"{artifact['kind']}/{os.path.basename(artifact['path'])}")
+        return archive_path
+
+    def run_pass(self, max_actions: int = DEFAULT_MAX_ACTIONS_PER_PASS) -> Dict[str, Any]:
+        """
+        Evict up to max_actions files; call again (or use run_forever_async) to continue.
+
+        Returns:
+            Dict[str, Any]: evicted, archived and freed_bytes of this pass (what
+            would be evicted with dry_run), stored_bytes before it and pending
+            evictions left for later passes
+        """
+        catalog = RunCatalog(self.catalog_path)
+        try:
+            evictions, missing, total_bytes = self.plan(catalog)
+            if not self.dry_run:
+                # Files removed by hand: keep the catalog in sync
+                for artifact in missing:
+                    catalog.mark_artifact_evicted(artifact["id"])
+            summary = {"evicted": 0, "archived": 0, "freed_bytes": 0, "stored_bytes": total_bytes,
+                       "pending": max(0, len(evictions) - max_actions)}
+            for artifact, reason in evictions[:max_actions]:
+                path = artifact["path"]
+                size = os.path.getsize(path)
+                print(f"{'Would evict' if self.dry_run else 'Evicting'} {path} ({size / 1024 ** 2:.1f} MB, "
+                      f"{artifact['kind']} of run {artifact['run_id']}): {reason}")
+                if self.dry_run:
+                    summary["evicted"] += 1
+                    summary["freed_bytes"] += size
+                    continue
+                try:
+                    archive_path = self._archive(artifact) if self.archive_dir else None
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Error evicting {path}: {e}")
+                    continue
+                for other in catalog.get_artifacts(artifact["run_id"]):
+                    if other["path"] and os.path.normpath(other["path"]) == os.path.normpath(path):
+                        catalog.mark_artifact_evicted(other["id"], archive_path)
+                # Drop the run's own input/<run_id> or output/<run_id> folder once it is empty,
+                # never the shared folders above it
+                directory = os.path.dirname(path)
+                if os.path.basename(directory) == artifact["run_id"]:
+                    try:
+                        if not os.listdir(directory):
+                            os.rmdir(directory)
+                    except OSError as e:
+                        print(f"Could not remove empty folder {directory}: {e}")
+                summary["evicted"] += 1
+                summary["archived"] += archive_path is not None
+                summary["freed_bytes"] += size
+                time.sleep(ACTION_PAUSE)
+            return summary
+        finally:
+            catalog.close()
+
+    async def run_forever_async(self, interval: float = DEFAULT_INTERVAL,
+                                max_actions: int = DEFAULT_MAX_ACTIONS_PER_PASS) -> None:
+        """Run passes in the background; passes follow each other quickly while evictions are pending"""
+        while True:
+            summary = await asyncio.to_thread(self.run_pass, max_actions)
+            if summary["evicted"]:
+                print(f"Retention: freed {summary['freed_bytes'] / 1024 ** 2:.1f} MB "
+                      f"({summary['evicted']} files, {summary['pending']} pending)")
+            await asyncio.sleep(1 if summary["pending"] and summary["evicted"] else interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the disk usage of generated media within limits")
+    parser.add_argument("command", choices=("plan", "run", "watch"),
+                        help="plan: show what would be evicted; run: one pass; watch: keep running passes")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help=f"Catalog database path (default: {CATALOG_PATH})")
+    parser.add_argument("--max-gb", type=float, help="Keep artifact files under this many GB")
+    parser.add_argument("--max-age-days", type=float, help="Evict artifacts older than this")
+    parser.add_argument("--keep-last-per-style", type=int, default=0,
+                        help="Always keep the newest N completed runs of each style category")
+    parser.add_argument("--evict-posted", action="store_true", help="Allow evicting media of posted runs")
+    parser.add_argument("--archive", metavar="DIR", help="Move evicted files into DIR/<run_id>.zip instead of deleting them")
+    parser.add_argument("--max-actions", type=int, default=DEFAULT_MAX_ACTIONS_PER_PASS,
+                        help=f"Files evicted per pass (default: {DEFAULT_MAX_ACTIONS_PER_PASS})")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"Seconds between passes for watch (default: {DEFAULT_INTERVAL})")
+    args = parser.parse_args()
+
+    if args.max_gb is None and args.max_age_days is None:
+        parser.error("give --max-gb and/or --max-age-days")
+    if not os.path.exists(args.catalog):
+        print(f"Catalog not found: {args.catalog}")
+        return
+    policy = RetentionPolicy(
+        max_bytes=int(args.max_gb * 1024 ** 3) if args.max_gb is not None else None,
+        max_age_days=args.max_age_days,
+        keep_posted=not args.evict_posted,
+        keep_last_per_style=args.keep_last_per_style
+    )
+    manager = RetentionManager(policy, args.catalog, archive_dir=args.archive, dry_run=args.command == "plan")
+    if args.command == "watch":
+        try:
+            asyncio.run(manager.run_forever_async(args.interval, args.max_actions))
+        except KeyboardInterrupt:
+            pass
+        return
+    summary = manager.run_pass(args.max_actions if args.command == "run" else 10 ** 9)
+    print(f"Stored: {summary['stored_bytes'] / 1024 ** 2:.1f} MB; "
+          f"{'would free' if manager.dry_run else 'freed'} {summary['freed_bytes'] / 1024 ** 2:.1f} MB "
+          f"in {summary['evicted']} file(s)" + (f", {summary['pending']} left for later passes" if summary["pending"] else ""))
+
+if __name__ == "__main__":
+    main()
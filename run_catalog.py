@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import argparse
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+CATALOG_PATH = "catalog.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL DEFAULT 'running',
+    style_category TEXT,
+    visual_style TEXT,
+    video_prompt TEXT,
+    music_prompt TEXT,
+    tweet_text TEXT,
+    tweet_id TEXT,
+    posted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_style ON runs (style_category, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status, created_at);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs (id),
+    kind TEXT NOT NULL,
+    path TEXT,
+    url TEXT,
+    model TEXT,
+    model_args TEXT,
+    duration REAL,
+    size_bytes INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_run ON artifacts (run_id, kind);
+CREATE INDEX IF NOT EXISTS idx_artifacts_kind_duration ON artifacts (kind, duration);
+
+CREATE TABLE IF NOT EXISTS timings (
+    run_id TEXT NOT NULL REFERENCES runs (id),
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+"""
+
+# Columns added after the first release: (table, column, type). Missing ones are
+# added when a catalog is opened, so older catalog files keep working.
+MIGRATIONS = [
+    ("artifacts", "evicted_at", "REAL"),
+    ("artifacts", "archive_path", "TEXT"),
+]
+
+def new_run_id() -> str:
+    """Sortable, unique run id such as 20250101-093000-1a2b3c"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+class RunCatalog:
+    """SQLite catalog of every content run and the artifacts it produced.
+
+    One row per run in `runs` (prompts, style, tweet), one row per file in
+    `artifacts` (local path, URL, model and arguments, duration, size) and one
+    row per pipeline stage in `timings`.
+
+    Methods block (the file can be locked by another worker host for a while)
+    and are safe to call from several threads, so async callers run them
+    through asyncio.to_thread().
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Shared between threads: async callers run the blocking calls through asyncio.to_thread()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.row_factory = sqlite3.Row
+        # Rollback journal rather than WAL: WAL needs shared memory on one host, and
+        # worker hosts share this file over the network (see services/job_queue.py)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+        for table, column, column_type in MIGRATIONS:
+            columns = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                with self.conn:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def start_run(
+        self,
+        video_prompt: str = "",
+        music_prompt: str = "",
+        style_category: Optional[str] = None,
+        visual_style: Optional[str] = None,
+        run_id: Optional[str] = None
+    ) -> str:
+        """Create a run row and return its id"""
+        run_id = run_id or new_run_id()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (id, created_at, style_category, visual_style, video_prompt, music_prompt) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, time.time(), style_category, visual_style, video_prompt, music_prompt)
+            )
+        return run_id
+
+    def update_run(self, run_id: str, **fields: Any) -> None:
+        """Update columns of a run, e.g. update_run(run_id, video_prompt=...)"""
+        if not fields:
+            return
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self.conn:
+            self.conn.execute(f"UPDATE runs SET {columns} WHERE id = ?", (*fields.values(), run_id))
+
+    def finish_run(self, run_id: str, status: str = "completed") -> None:
+        """Mark a run as finished with the given status"""
+        self.update_run(run_id, status=status, finished_at=time.time())
+
+    def record_tweet(self, run_id: str, tweet_id: Optional[str], tweet_text: str) -> None:
+        """Store the generated tweet text and, if posted, the tweet id"""
+        self.update_run(run_id, tweet_text=tweet_text, tweet_id=tweet_id,
+                        posted_at=time.time() if tweet_id else None)
+
+    def add_artifact(
+        self,
+        run_id: str,
+        kind: str,
+        path: Optional[str] = None,
+        url: Optional[str] = None,
+        model: Optional[str] = None,
+        model_args: Optional[Dict[str, Any]] = None,
+        duration: Optional[float] = None
+    ) -> int:
+        """Record a file produced by a run (kind is e.g. image, video, music, final)"""
+        size_bytes = os.path.getsize(path) if path and os.path.exists(path) else None
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO artifacts (run_id, kind, path, url, model, model_args, duration, size_bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, kind, path, url, model, json.dumps(model_args) if model_args else None,
+                 duration, size_bytes, time.time())
+            )
+        return cursor.lastrowid
+
+    def record_timing(self, run_id: str, stage: str, seconds: float) -> None:
+        """Record how long a pipeline stage took"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO timings (run_id, stage, seconds) VALUES (?, ?, ?)",
+                (run_id, stage, seconds)
+            )
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return a run with its artifacts and timings, or None if unknown"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if not row:
+                return None
+            run = dict(row)
+            run["artifacts"] = [dict(r) for r in self.conn.execute(
+                "SELECT * FROM artifacts WHERE run_id = ? ORDER BY id", (run_id,))]
+            run["timings"] = {r["stage"]: r["seconds"] for r in self.conn.execute(
+                "SELECT stage, seconds FROM timings WHERE run_id = ?", (run_id,))}
+            return run
+
+    def get_artifacts(self, run_id: str, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return a run's artifacts, optionally only those of one kind"""
+        with self._lock:
+            if kind:
+                rows = self.conn.execute(
+                    "SELECT * FROM artifacts WHERE run_id = ? AND kind = ? ORDER BY id", (run_id, kind))
+            else:
+                rows = self.conn.execute("SELECT * FROM artifacts WHERE run_id = ? ORDER BY id", (run_id,))
+            return [dict(r) for r in rows]
+
+    def get_stored_artifacts(self) -> List[Dict[str, Any]]:
+        """
+        Artifacts whose file has not been evicted, oldest first, with their run's
+        status, style and tweet id (for the retention manager)
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT a.*, r.status AS run_status, r.style_category, r.tweet_id, r.created_at AS run_created_at "
+                "FROM artifacts a JOIN runs r ON r.id = a.run_id "
+                "WHERE a.path IS NOT NULL AND a.evicted_at IS NULL ORDER BY a.created_at")
+            return [dict(r) for r in rows]
+
+    def mark_artifact_evicted(self, artifact_id: int, archive_path: Optional[str] = None) -> None:
+        """Record that an artifact's file was deleted or, with archive_path, moved into that archive"""
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE artifacts SET evicted_at = ?, archive_path = ? WHERE id = ?",
+                              (time.time(), archive_path, artifact_id))
+
+    def query_runs(
+        self,
+        style_category: Optional[str] = None,
+        visual_style: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        min_video_duration: Optional[float] = None,
+        posted: Optional[bool] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Find runs matching all given filters, newest first.
+
+        Args:
+            style_category: Exact visual style category
+            visual_style: Substring of the visual style (case-insensitive)
+            status: Run status (running, completed, flagged, rejected, failed)
+            since: Only runs created at or after this Unix timestamp
+            until: Only runs created before this Unix timestamp
+            min_video_duration: Only runs with a video artifact at least this long (seconds)
+            posted: True for posted runs only, False for unposted runs only
+            limit: Maximum number of runs to return
+
+        Returns:
+            List[Dict[str, Any]]: Matching run rows
+        """
+        clauses = []
+        params: List[Any] = []
+        if style_category:
+            clauses.append("r.style_category = ?")
+            params.append(style_category)
+        if visual_style:
+            clauses.append("r.visual_style LIKE ?")
+            params.append(f"%{visual_style}%")
+        if status:
+            clauses.append("r.status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("r.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("r.created_at < ?")
+            params.append(until)
+        if min_video_duration is not None:
+            clauses.append("EXISTS (SELECT 1 FROM artifacts a WHERE a.run_id = r.id "
+                           "AND a.kind = 'video' AND a.duration >= ?)")
+            params.append(min_video_duration)
+        if posted is not None:
+            clauses.append("r.tweet_id IS NOT NULL" if posted else "r.tweet_id IS NULL")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT r.* FROM runs r {where} ORDER BY r.created_at DESC LIMIT ?", (*params, limit))
+            return [dict(r) for r in rows]
+
+def _format_time(timestamp: Optional[float]) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the catalog of content runs")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help=f"Catalog database path (default: {CATALOG_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List runs matching filters")
+    list_parser.add_argument("--style-category", help="Visual style category, e.g. 'Pixel Art Styles'")
+    list_parser.add_argument("--visual-style", help="Substring of the visual style, e.g. 'pixel art'")
+    list_parser.add_argument("--status", help="Run status (running, completed, flagged, rejected, failed)")
+    list_parser.add_argument("--since-days", type=float, help="Only runs from the last N days")
+    list_parser.add_argument("--min-video-duration", type=float, help="Only runs with a video at least this many seconds long")
+    list_parser.add_argument("--posted", action="store_true", help="Only runs that were posted")
+    list_parser.add_argument("--limit", type=int, default=50, help="Maximum number of runs (default: 50)")
+    list_parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    show_parser = subparsers.add_parser("show", help="Show one run with its artifacts and timings")
+    show_parser.add_argument("run_id", help="Run id")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.catalog):
+        print(f"Catalog not found: {args.catalog}")
+        return
+
+    catalog = RunCatalog(args.catalog)
+    try:
+        if args.command == "list":
+            runs = catalog.query_runs(
+                style_category=args.style_category,
+                visual_style=args.visual_style,
+                status=args.status,
+                since=time.time() - args.since_days * 86400 if args.since_days else None,
+                min_video_duration=args.min_video_duration,
+                posted=True if args.posted else None,
+                limit=args.limit
+            )
+            if args.json:
+                print(json.dumps(runs, indent=2))
+                return
+            for run in runs:
+                print(f"{run['id']}  {_format_time(run['created_at'])}  {run['status']:<9}  "
+                      f"{run['style_category'] or '-'} / {run['visual_style'] or '-'}"
+                      f"{'  tweet ' + run['tweet_id'] if run['tweet_id'] else ''}")
+            print(f"{len(runs)} run(s)")
+        elif args.command == "show":
+            run = catalog.get_run(args.run_id)
+            if not run:
+                print(f"Run not found: {args.run_id}")
+                return
+            print(json.dumps(run, indent=2))
+    finally:
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
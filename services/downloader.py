@@ -0,0 +1,348 @@
+import os
+import json
+import asyncio
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+
+# Files smaller than this are fetched in one request; larger ones are split
+# into segments of at least this size, downloaded in parallel
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+MAX_PARALLEL_SEGMENTS = 4
+CHUNK_SIZE = 1024 * 1024
+# Progress of a segment is saved after this many bytes, so a resumed
+# download repeats at most this much per segment
+SAVE_EVERY = 4 * 1024 * 1024
+SEGMENT_RETRIES = 4
+# Seconds to connect / between two received chunks
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+_session = threading.local()
+
+def _get_session() -> requests.Session:
+    # One session per thread: keeps the connection to the CDN alive across
+    # segments and downloads without sharing a Session between threads
+    if not hasattr(_session, "value"):
+        _session.value = requests.Session()
+    return _session.value
+
+def _part_path(output_path: str) -> str:
+    return f"{output_path}.part"
+
+def _state_path(output_path: str) -> str:
+    return f"{output_path}.part.json"
+
+def _load_state(output_path: str, url: str, remote: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the saved progress if it belongs to the same remote file and the partial file is still there"""
+    try:
+        with open(_state_path(output_path)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (state.get("url") != url or state.get("size") != remote["size"] or state.get("etag") != remote["etag"]
+            or "segments" not in state or not os.path.exists(_part_path(output_path))
+            or os.path.getsize(_part_path(output_path)) != remote["size"]):
+        return None
+    return state
+
+def _save_state(output_path: str, state: Dict[str, Any]) -> None:
+    temp_path = _state_path(output_path) + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, _state_path(output_path))
+
+def _remove(*paths: str) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _expected_md5(headers: Any, whole_file: bool) -> Optional[str]:
+    """
+    MD5 the server states for the whole file, as hex.
+
+    x-goog-hash always describes the whole object; Content-MD5 describes the
+    response body, so it is only used when the body is the whole file.
+    """
+    values = (headers.get("x-goog-hash") or "").split(",")
+    if whole_file:
+        values.append(headers.get("Content-MD5"))
+    for value in values:
+        value = (value or "").strip()
+        if value.startswith("md5="):
+            value = value[4:]
+        elif value.startswith("crc32c="):
+            continue
+        if value:
+            try:
+                return base64.b64decode(value).hex()
+            except ValueError:
+                return None
+    return None
+
+def probe(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Ask the server for the size of a file and whether it serves byte ranges.
+
+    Returns:
+        Optional[Dict[str, Any]]: size (None if unknown), ranges, etag and md5
+        (None if not given), or None if the request failed
+    """
+    try:
+        # A one-byte range request works on servers and signed URLs that reject HEAD
+        response = _get_session().get(url, headers={"Range": "bytes=0-0"}, stream=True,
+                                      timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        response.close()
+    except requests.RequestException as e:
+        print(f"Error downloading file {url}: {e}")
+        return None
+    if response.status_code == 206:
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        size = int(total) if total.isdigit() else None
+        ranges = size is not None
+    elif response.status_code == 200:
+        length = response.headers.get("Content-Length")
+        size = int(length) if length and length.isdigit() else None
+        ranges = False
+    else:
+        print(f"Error downloading file {url}: HTTP {response.status_code}")
+        return None
+    return {"size": size, "ranges": ranges, "etag": response.headers.get("ETag"),
+            "md5": _expected_md5(response.headers, whole_file=response.status_code == 200)}
+
+def _is_strong(etag: Optional[str]) -> bool:
+    # Weak ETags are not allowed in If-Range
+    return bool(etag) and not etag.startswith("W/")
+
+def _split(size: int, parallel: int) -> List[List[int]]:
+    count = max(1, min(parallel, size // MIN_SEGMENT_SIZE))
+    bounds = [size * index // count for index in range(count + 1)]
+    # [start, end (exclusive), bytes already written]
+    return [[bounds[index], bounds[index + 1], 0] for index in range(count)]
+
+def _fetch_segment(url: str, part_path: str, segment: List[int], etag: Optional[str],
+                   on_progress: Any, stop: threading.Event) -> None:
+    """
+    Download one byte range into its place in the preallocated file, continuing
+    after segment[2] bytes; returns early once stop is set
+    """
+    start, end, _ = segment
+    for attempt in range(SEGMENT_RETRIES):
+        offset = start + segment[2]
+        if offset >= end or stop.is_set():
+            return
+        headers = {"Range": f"bytes={offset}-{end - 1}"}
+        if _is_strong(etag):
+            # Fail instead of mixing two versions of the file if it changed on the server
+            headers["If-Range"] = etag
+        try:
+            with _get_session().get(url, headers=headers, stream=True,
+                                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                if response.status_code != 206:
+                    raise IOError(f"HTTP {response.status_code} for range {offset}-{end - 1}")
+                with open(part_path, "r+b") as f:
+                    f.seek(offset)
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        chunk = chunk[:end - start - segment[2]]
+                        f.write(chunk)
+                        # Flushed before counting, so saved progress never covers unwritten bytes
+                        f.flush()
+                        segment[2] += len(chunk)
+                        on_progress()
+                        if segment[2] >= end - start or stop.is_set():
+                            break
+            if segment[2] >= end - start or stop.is_set():
+                return
+            raise IOError(f"connection closed at byte {start + segment[2]} of range {start}-{end - 1}")
+        except (requests.RequestException, IOError) as e:
+            if attempt == SEGMENT_RETRIES - 1:
+                raise
+            print(f"Retrying download of {url} from byte {start + segment[2]}: {e}")
+            if stop.wait(2 ** attempt):
+                return
+
+def _preallocate(part_path: str, size: int) -> None:
+    with open(part_path, "wb") as f:
+        if hasattr(os, "posix_fallocate") and size:
+            # Reserve the blocks up front: no fragmentation, and a full disk fails now, not at 90%
+            os.posix_fallocate(f.fileno(), 0, size)
+        f.truncate(size)
+
+def _download_ranged(url: str, output_path: str, remote: Dict[str, Any], parallel: int,
+                     stop: threading.Event) -> bool:
+    part_path = _part_path(output_path)
+    state = _load_state(output_path, url, remote)
+    if state:
+        done = sum(segment[2] for segment in state["segments"])
+        print(f"Resuming download of {output_path}: {done / 1024 ** 2:.1f}/{remote['size'] / 1024 ** 2:.1f} MB already there")
+    else:
+        _preallocate(part_path, remote["size"])
+        state = {"url": url, "size": remote["size"], "etag": remote["etag"],
+                 "segments": _split(remote["size"], parallel)}
+        _save_state(output_path, state)
+
+    lock = threading.Lock()
+    unsaved = [0]
+
+    def on_progress() -> None:
+        # Called after every chunk; writes the progress of all segments now and then
+        with lock:
+            unsaved[0] += CHUNK_SIZE
+            if unsaved[0] >= SAVE_EVERY * len(state["segments"]):
+                unsaved[0] = 0
+                _save_state(output_path, state)
+
+    pool = ThreadPoolExecutor(max_workers=len(state["segments"]))
+    try:
+        futures = [pool.submit(_fetch_segment, url, part_path, segment, remote["etag"], on_progress, stop)
+                   for segment in state["segments"]]
+        for future in futures:
+            future.result()
+    except (requests.RequestException, IOError) as e:
+        print(f"Error downloading file {url}: {e}")
+        return False
+    except BaseException:
+        # Interrupted (Ctrl+C): let the segments stop after their current chunk
+        stop.set()
+        raise
+    finally:
+        pool.shutdown(wait=True)
+        with lock:
+            _save_state(output_path, state)
+    if stop.is_set():
+        print(f"Download of {url} stopped")
+        return False
+    return True
+
+def _download_stream(url: str, output_path: str, remote: Dict[str, Any], stop: threading.Event) -> bool:
+    """
+    Single request for small files and servers without range support; after a
+    failure it is retried, continuing with a Range header if the server allows it
+    """
+    part_path = _part_path(output_path)
+    offset = 0
+    if remote["ranges"] and _is_strong(remote["etag"]) and os.path.exists(part_path):
+        try:
+            with open(_state_path(output_path)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        if state.get("url") == url and state.get("etag") == remote["etag"]:
+            offset = os.path.getsize(part_path)
+    _save_state(output_path, {"url": url, "size": remote["size"], "etag": remote["etag"]})
+    for attempt in range(SEGMENT_RETRIES):
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if _is_strong(remote["etag"]):
+                headers["If-Range"] = remote["etag"]
+        try:
+            with _get_session().get(url, headers=headers, stream=True,
+                                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                if response.status_code not in (200, 206):
+                    raise IOError(f"HTTP {response.status_code}")
+                if response.status_code == 200:
+                    # The server sent the whole (possibly changed) file instead of the rest
+                    offset = 0
+                    remote["md5"] = remote["md5"] or _expected_md5(response.headers, whole_file=True)
+                elif offset:
+                    print(f"Resuming download of {output_path} from {offset / 1024 ** 2:.1f} MB")
+                with open(part_path, "r+b" if offset else "wb") as f:
+                    f.seek(offset)
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        if stop.is_set():
+                            print(f"Download of {url} stopped")
+                            return False
+            size = os.path.getsize(part_path)
+            if remote["size"] is None or size >= remote["size"]:
+                return True
+            raise IOError(f"connection closed at byte {size} of {remote['size']}")
+        except (requests.RequestException, IOError) as e:
+            if attempt == SEGMENT_RETRIES - 1:
+                print(f"Error downloading file {url}: {e}")
+                return False
+            offset = os.path.getsize(part_path) if remote["ranges"] and os.path.exists(part_path) else 0
+            print(f"Retrying download of {url} from byte {offset}: {e}")
+            if stop.wait(2 ** attempt):
+                return False
+    return False
+
+def _file_digest(path: str, algorithm: str) -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _verify(part_path: str, remote: Dict[str, Any], sha256: Optional[str]) -> Optional[str]:
+    """Return why the downloaded file is wrong, or None if it checks out"""
+    size = os.path.getsize(part_path)
+    if remote["size"] is not None and size != remote["size"]:
+        return f"expected {remote['size']} bytes, got {size}"
+    checks: List[Tuple[str, Optional[str]]] = [("sha256", sha256), ("md5", remote["md5"])]
+    for algorithm, expected in checks:
+        if expected and _file_digest(part_path, algorithm) != expected.lower():
+            return f"{algorithm} mismatch"
+    return None
+
+def download_file(url: str, output_path: str, sha256: Optional[str] = None,
+                  parallel: int = MAX_PARALLEL_SEGMENTS, stop: Optional[threading.Event] = None) -> bool:
+    """
+    Download a URL to a local file, returning False on failure.
+
+    Large files on servers that support byte ranges are fetched in up to
+    `parallel` segments at once into a preallocated `<output_path>.part`.
+    Progress is kept in `<output_path>.part.json`, so calling again after a
+    failure or interruption continues where the download stopped, as long as
+    the remote file is unchanged. Failed requests are retried from where they
+    stopped. The length (and the sha256 if given, or the MD5 if the server
+    states one for the whole file) is verified before the file is moved to
+    output_path; a file that fails verification is discarded. Setting stop
+    makes the download return False after its current chunk, keeping the
+    progress (async callers use download_file_async, which sets it on
+    cancellation).
+    """
+    stop = stop or threading.Event()
+    remote = probe(url)
+    if not remote:
+        return False
+    part_path = _part_path(output_path)
+    if remote["ranges"] and remote["size"] >= 2 * MIN_SEGMENT_SIZE:
+        ok = _download_ranged(url, output_path, remote, parallel, stop)
+    else:
+        ok = _download_stream(url, output_path, remote, stop)
+    if not ok:
+        return False
+
+    problem = _verify(part_path, remote, sha256)
+    if problem:
+        print(f"Error downloading file {url}: {problem}; discarding the download")
+        _remove(part_path, _state_path(output_path))
+        return False
+    os.replace(part_path, output_path)
+    _remove(_state_path(output_path))
+    return True
+
+async def download_file_async(url: str, output_path: str, sha256: Optional[str] = None,
+                              parallel: int = MAX_PARALLEL_SEGMENTS) -> bool:
+    """
+    download_file() in a thread, stopped when the calling task is cancelled.
+
+    A cancelled asyncio task cannot interrupt a thread, so the download is
+    told to stop and waited for (it saves its progress) before the
+    cancellation propagates.
+    """
+    stop = threading.Event()
+    download = asyncio.ensure_future(asyncio.to_thread(download_file, url, output_path, sha256, parallel, stop))
+    try:
+        return await asyncio.shield(download)
+    except asyncio.CancelledError:
+        stop.set()
+        await asyncio.gather(download, return_exceptions=True)
+        raise
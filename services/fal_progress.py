@@ -0,0 +1,180 @@
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypedDict
+
+import fal_client
+
+logger = logging.getLogger(__name__)
+
+# fal_client polls the queue every 0.1 s by default; once a second is plenty
+# for progress and keeps many concurrent jobs from flooding the event loop
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Seconds to wait for fal to acknowledge a cancel request
+CANCEL_TIMEOUT = 10.0
+
+# Jobs submitted by this process that have not completed: request id -> model id
+_active_requests: Dict[str, str] = {}
+
+class FalProgress(TypedDict):
+    """Type definition for one progress event of a fal job
+
+    Attributes:
+        kind: "queued", "in_progress", "log" or "completed"
+        model_id: Model the job runs on
+        request_id: fal request id of the job
+        elapsed: Seconds since the job was submitted
+        position: Queue position (queued events only)
+        message: Log line (log events only)
+        queue_seconds: Seconds spent waiting in the queue (in_progress and completed events)
+        metrics: fal's metrics such as inference_time (completed events only)
+        error: Error reported by fal (completed events only)
+    """
+    kind: str
+    model_id: str
+    request_id: str
+    elapsed: float
+    position: Optional[int]
+    message: Optional[str]
+    queue_seconds: Optional[float]
+    metrics: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+ProgressCallback = Callable[[FalProgress], None]
+
+async def stream_progress(
+    handle: fal_client.AsyncRequestHandle,
+    model_id: str,
+    poll_interval: float = DEFAULT_POLL_INTERVAL
+) -> AsyncIterator[FalProgress]:
+    """
+    Turn the raw status polls of a submitted job into progress events.
+
+    Unlike the raw status stream, an event is only produced when something
+    changed: the queue position moves, the job starts, a new log line arrives
+    (fal returns the whole log on every poll) or the job completes.
+    """
+    start = time.monotonic()
+    started_at: Optional[float] = None
+    last_position: Optional[int] = None
+    logs_seen = 0
+
+    def event(kind: str, **fields: Any) -> FalProgress:
+        progress: FalProgress = {"kind": kind, "model_id": model_id, "request_id": handle.request_id,
+                                 "elapsed": time.monotonic() - start, "position": None, "message": None,
+                                 "queue_seconds": None, "metrics": None, "error": None}
+        progress.update(fields)
+        return progress
+
+    async for status in handle.iter_events(with_logs=True, interval=poll_interval):
+        if isinstance(status, fal_client.Queued):
+            if status.position != last_position:
+                last_position = status.position
+                yield event("queued", position=status.position)
+            continue
+        if started_at is None:
+            started_at = time.monotonic()
+            if isinstance(status, fal_client.InProgress):
+                yield event("in_progress", queue_seconds=started_at - start)
+        logs: List[Dict[str, Any]] = status.logs or []
+        if len(logs) < logs_seen:
+            logs_seen = 0
+        for log in logs[logs_seen:]:
+            yield event("log", message=log.get("message", ""))
+        logs_seen = len(logs)
+        if isinstance(status, fal_client.Completed):
+            yield event("completed", queue_seconds=started_at - start, metrics=status.metrics or {},
+                        error=status.error)
+
+def log_progress(label: str, interval: float = 10.0,
+                 emit: Callable[[str], None] = logger.info) -> ProgressCallback:
+    """
+    Progress callback that logs the start and end of a job and at most one
+    queue position and one log line every `interval` seconds.
+
+    Log lines arriving in between are counted and reported with the next line,
+    so a chatty model produces a handful of log records instead of hundreds.
+    Pass emit=print to show the progress on the console instead of the log.
+    """
+    last_emit = {"queued": float("-inf"), "log": float("-inf")}
+    skipped = 0
+
+    def callback(progress: FalProgress) -> None:
+        nonlocal skipped
+        kind = progress["kind"]
+        if kind in last_emit:
+            now = time.monotonic()
+            if now - last_emit[kind] < interval:
+                skipped += kind == "log"
+                return
+            last_emit[kind] = now
+        if kind == "log":
+            more = f" (+{skipped} more)" if skipped else ""
+            skipped = 0
+            emit(f"{label}: {progress['message']}{more}")
+        elif kind == "queued":
+            emit(f"{label}: queued at position {progress['position']}")
+        elif kind == "in_progress":
+            emit(f"{label}: started after {progress['queue_seconds']:.1f}s in the queue")
+        else:
+            inference_time = (progress["metrics"] or {}).get("inference_time")
+            ran = f", inference {inference_time:.1f}s" if inference_time else ""
+            more = f", {skipped} log lines not shown" if skipped else ""
+            emit(f"{label}: completed in {progress['elapsed']:.1f}s "
+                 f"(queued {progress['queue_seconds'] or 0:.1f}s{ran}{more})")
+
+    return callback
+
+async def run_with_progress_async(
+    model_id: str,
+    arguments: Dict[str, Any],
+    on_progress: Optional[ProgressCallback] = None,
+    poll_interval: float = DEFAULT_POLL_INTERVAL
+) -> Any:
+    """
+    Submit a job to fal's queue, report its progress and return its result.
+
+    Args:
+        model_id: fal model id
+        arguments: Model arguments
+        on_progress: Called with every FalProgress event (defaults to log_progress(model_id))
+        poll_interval: Seconds between status polls
+
+    If the caller is cancelled (a failed sibling branch, a lost job lease,
+    Ctrl+C) or polling fails while the job is still queued or running, the
+    job is cancelled on fal as well so it stops running and billing.
+
+    Raises:
+        fal_client.FalClientError and httpx errors, like fal_client.run_async()
+    """
+    on_progress = on_progress or log_progress(model_id)
+    handle = await fal_client.submit_async(model_id, arguments=arguments)
+    _active_requests[handle.request_id] = model_id
+    completed = False
+    try:
+        async for progress in stream_progress(handle, model_id, poll_interval):
+            completed = progress["kind"] == "completed"
+            on_progress(progress)
+    except BaseException:
+        if not completed:
+            # Shielded so that a second cancellation cannot interrupt the cancel request
+            await asyncio.shield(cancel_request_async(model_id, handle.request_id))
+        raise
+    finally:
+        _active_requests.pop(handle.request_id, None)
+    return await handle.get()
+
+async def cancel_request_async(model_id: str, request_id: str) -> bool:
+    """Ask fal to cancel a queued or running job; returns False if the request failed"""
+    try:
+        await asyncio.wait_for(fal_client.cancel_async(model_id, request_id), CANCEL_TIMEOUT)
+        print(f"Cancelled fal job {request_id} ({model_id})")
+        return True
+    except Exception as e:
+        print(f"Error cancelling fal job {request_id} ({model_id}): {e}")
+        return False
+
+def active_requests() -> Dict[str, str]:
+    """fal jobs of this process that are still queued or running (request id -> model id)"""
+    return dict(_active_requests)
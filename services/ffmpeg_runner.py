@@ -0,0 +1,190 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from .file_lock import FileLock
+
+# ffmpeg's encoders already use several threads each, so allowing one process
+# per core would oversubscribe the machine; half the cores keeps encodes from
+# different jobs overlapping without them slowing each other down
+MAX_CONCURRENT_FFMPEG = max(1, (os.cpu_count() or 2) // 2)
+
+# How long ffmpeg gets to finish cleanly after a cancel before it is killed
+CANCEL_GRACE_SECONDS = 3.0
+
+# Keep only the end of stderr; that is where ffmpeg reports what went wrong
+STDERR_TAIL_BYTES = 16 * 1024
+
+ProgressCallback = Callable[[Dict[str, float]], None]
+
+# Slots are lock files in the local temp folder, so the limit holds for all
+# workers, servers and watchers on this host together, not per process
+SLOT_DIR = os.path.join(tempfile.gettempdir(), "ffmpeg-slots")
+# A slot whose holder stopped refreshing it this long ago (crashed process) is taken over
+SLOT_STALE_SECONDS = 60.0
+SLOT_POLL_INTERVAL = 0.25
+
+@asynccontextmanager
+async def _host_slot() -> AsyncIterator[None]:
+    """Hold one of this host's MAX_CONCURRENT_FFMPEG process slots"""
+    locks = [FileLock(os.path.join(SLOT_DIR, f"{index}.lock"), stale_seconds=SLOT_STALE_SECONDS)
+             for index in range(MAX_CONCURRENT_FFMPEG)]
+    while True:
+        lock = next((lock for lock in locks if lock.try_acquire()), None)
+        if lock is not None:
+            break
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+
+    async def keep_alive() -> None:
+        # Encodes run for minutes; keep the slot from being taken for stale
+        while True:
+            await asyncio.sleep(SLOT_STALE_SECONDS / 3)
+            lock.refresh()
+
+    refresher = asyncio.create_task(keep_alive())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        lock.release()
+
+def _parse_progress_block(lines: List[str]) -> Dict[str, float]:
+    """Turn one `-progress` key=value block into an event with times in seconds"""
+    values = dict(line.split("=", 1) for line in lines if "=" in line)
+    event: Dict[str, float] = {}
+    # out_time_us is in microseconds despite older builds naming it out_time_ms
+    for key in ("out_time_us", "out_time_ms"):
+        if values.get(key, "N/A").lstrip("-").isdigit():
+            event["out_time"] = max(0, int(values[key])) / 1_000_000
+            break
+    if values.get("frame", "").isdigit():
+        event["frame"] = int(values["frame"])
+    speed = values.get("speed", "").rstrip("x")
+    try:
+        event["speed"] = float(speed)
+    except ValueError:
+        pass
+    event["done"] = values.get("progress") == "end"
+    return event
+
+def print_progress(label: str, duration: Optional[float] = None, interval: float = 2.0) -> ProgressCallback:
+    """
+    Progress callback that prints at most every `interval` seconds.
+
+    Args:
+        label: What is being encoded (shown in every line)
+        duration: Expected output length, to show a percentage
+        interval: Minimum seconds between printed lines
+    """
+    last_print = 0.0
+
+    def callback(event: Dict[str, float]) -> None:
+        nonlocal last_print
+        now = time.monotonic()
+        if not event.get("done") and now - last_print < interval:
+            return
+        last_print = now
+        position = event.get("out_time", 0.0)
+        if duration:
+            status = f"{min(100.0, 100 * position / duration):.0f}%"
+        else:
+            status = f"{position:.1f}s"
+        speed = f" at {event['speed']:.1f}x" if "speed" in event else ""
+        print(f"{label}: {status}{speed}")
+
+    return callback
+
+async def _read_stderr_tail(stream: asyncio.StreamReader) -> bytes:
+    tail = b""
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            return tail
+        tail = (tail + chunk)[-STDERR_TAIL_BYTES:]
+
+async def _read_progress(stream: asyncio.StreamReader, on_progress: ProgressCallback) -> None:
+    block: List[str] = []
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        text = line.decode(errors="replace").strip()
+        block.append(text)
+        # Each block ends with progress=continue or progress=end
+        if text.startswith("progress="):
+            on_progress(_parse_progress_block(block))
+            block = []
+
+async def _stop(process: asyncio.subprocess.Process) -> None:
+    """Ask ffmpeg to stop, then kill it if it does not exit in time"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), CANCEL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+    except ProcessLookupError:
+        pass
+
+async def run_media_command(
+    cmd: List[str],
+    on_progress: Optional[ProgressCallback] = None,
+    capture_stdout: bool = False
+) -> bytes:
+    """
+    Run an ffmpeg or ffprobe command without blocking the event loop.
+
+    Processes beyond MAX_CONCURRENT_FFMPEG on this host (counting every
+    process that uses this runner) wait for a free slot. If the calling
+    task is cancelled the process is terminated (killed if it does not exit)
+    and the cancellation propagates.
+
+    Args:
+        cmd: Full command, starting with 'ffmpeg' or 'ffprobe'
+        on_progress: Called with {"out_time", "frame", "speed", "done"} events
+            parsed from ffmpeg's -progress output (not used with capture_stdout,
+            since stdout then carries the data)
+        capture_stdout: Return what the command writes to stdout
+
+    Returns:
+        bytes: Standard output if capture_stdout, otherwise b""
+
+    Raises:
+        FileNotFoundError: If the program is not installed
+        subprocess.CalledProcessError: If it exits with an error (stderr holds its last output)
+    """
+    track_progress = on_progress is not None and not capture_stdout and cmd[0].endswith("ffmpeg")
+    if track_progress:
+        # Machine-readable progress on stdout instead of the stats line on stderr
+        cmd = [cmd[0], "-nostats", "-progress", "pipe:1", *cmd[1:]]
+
+    async with _host_slot():
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if capture_stdout or track_progress else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stderr_task = asyncio.create_task(_read_stderr_tail(process.stderr))
+        try:
+            if capture_stdout:
+                stdout = await process.stdout.read()
+            else:
+                stdout = b""
+                if track_progress:
+                    await _read_progress(process.stdout, on_progress)
+            returncode = await process.wait()
+            stderr = await stderr_task
+        except asyncio.CancelledError:
+            await _stop(process)
+            stderr_task.cancel()
+            raise
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr.decode(errors="replace"))
+    return stdout
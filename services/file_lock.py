@@ -0,0 +1,120 @@
+import os
+import time
+import uuid
+import socket
+from typing import Optional
+
+# Locks are held for milliseconds (a duplicate check and an append); a lock file
+# older than this was left behind by a crashed process and is broken
+DEFAULT_STALE_SECONDS = 30.0
+DEFAULT_TIMEOUT = 60.0
+POLL_INTERVAL = 0.05
+
+class FileLock:
+    """Mutual exclusion between threads, processes and hosts through a lock file.
+
+    The lock file is created with O_CREAT | O_EXCL, which is atomic on local
+    disks as well as on NFS and SMB shares, unlike fcntl/flock locks that
+    depend on the share's lock manager. Use it as a context manager around
+    short read-modify-write sequences on files shared by several workers.
+
+    Every acquisition writes a unique token into the lock file. A lock is
+    only broken or released while it still holds the token that was checked,
+    so a waiter never removes a lock that another waiter has just taken.
+    Holders of long-lived locks call refresh() so they are not taken for stale.
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT, stale_seconds: float = DEFAULT_STALE_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self._token: Optional[str] = None
+
+    def _read_token(self, path: str) -> Optional[str]:
+        try:
+            with open(path) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _remove_if_token(self, token: str) -> bool:
+        """Remove the lock file if it holds token; returns whether it did"""
+        # Move the lock aside first: rename is atomic, so the token checked is
+        # the one of the file removed, even if the lock changes hands meanwhile
+        aside = f"{self.path}.{uuid.uuid4().hex}"
+        try:
+            os.rename(self.path, aside)
+        except FileNotFoundError:
+            return False
+        if self._read_token(aside) == token:
+            os.remove(aside)
+            return True
+        # Someone else's lock: put it back unless a new lock was taken in between
+        try:
+            os.link(aside, self.path)
+        except OSError:
+            pass
+        os.remove(aside)
+        return False
+
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free (or stale) without waiting"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self._read_token(self.path)
+                try:
+                    stale = time.time() - os.path.getmtime(self.path) > self.stale_seconds
+                except FileNotFoundError:
+                    continue
+                if holder is None:
+                    continue
+                if stale and self._remove_if_token(holder):
+                    print(f"Breaking stale lock {self.path}")
+                    continue
+                return False
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{token}\n")
+            self._token = token
+            return True
+
+    def acquire(self) -> None:
+        """
+        Wait until the lock is free and take it.
+
+        Raises:
+            TimeoutError: If the lock could not be taken within timeout seconds
+        """
+        deadline = time.monotonic() + self.timeout
+        while not self.try_acquire():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Could not lock {self.path} within {self.timeout:.0f}s")
+            time.sleep(POLL_INTERVAL)
+
+    def refresh(self) -> bool:
+        """Mark a held lock as still in use; returns False if it was lost"""
+        if self._token is None or self._read_token(self.path) != self._token:
+            return False
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self) -> None:
+        """Release the lock if this object still holds it"""
+        if self._token is not None:
+            self._remove_if_token(self._token)
+            self._token = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
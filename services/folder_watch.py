@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+# watchdog (inotify/FSEvents/ReadDirectoryChanges) is optional; without it the folder is polled
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# A file counts as fully written once its size and modification time have not
+# changed for this many seconds
+DEFAULT_STABLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+# With watchdog running, rescan this often anyway in case an event was missed
+IDLE_RESCAN_INTERVAL = 30.0
+
+class _WakeHandler(FileSystemEventHandler):
+    """Wakes the watcher's event loop on any change in the folder"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, event: asyncio.Event):
+        self.loop = loop
+        self.event = event
+
+    def on_any_event(self, event) -> None:
+        self.loop.call_soon_threadsafe(self.event.set)
+
+class StableFileWatcher:
+    """Reports files in a folder once they are completely written.
+
+    Each file is reported once; a file that is rewritten later (new size or
+    modification time) is reported again when it has settled. Files that
+    settle empty are skipped.
+    """
+
+    def __init__(self, folder: str, extensions: Iterable[str], stable_seconds: float = DEFAULT_STABLE_SECONDS,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.folder = folder
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._reported: Dict[str, Tuple[int, int]] = {}
+
+    def scan(self) -> Tuple[List[str], bool]:
+        """
+        Look at the folder once.
+
+        Returns:
+            Tuple[List[str], bool]: (files that became stable since the last scan,
+            whether other files are still being written)
+        """
+        now = time.time()
+        stable, pending = [], False
+        current: Dict[str, Tuple[int, int]] = {}
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not entry.name.lower().endswith(self.extensions):
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            current[entry.path] = signature
+            if self._reported.get(entry.path) == signature:
+                continue
+            if self._seen.get(entry.path) == signature and now - stat.st_mtime >= self.stable_seconds:
+                self._reported[entry.path] = signature
+                # An empty file that stopped changing is settled too (e.g. a failed
+                # export), but there is nothing to hand out until it is rewritten
+                if stat.st_size > 0:
+                    stable.append(entry.path)
+                else:
+                    print(f"Skipping empty file: {entry.path}")
+            else:
+                pending = True
+        self._seen = current
+        self._reported = {path: signature for path, signature in self._reported.items() if path in current}
+        return sorted(stable, key=lambda path: current[path][1]), pending
+
+    async def watch(self, until_idle: bool = False, heartbeat: Optional[float] = None) -> AsyncIterator[List[str]]:
+        """
+        Yield batches of newly completed files until cancelled.
+
+        With until_idle the watch ends as soon as no file is being written
+        and no new file was completed, e.g. to process what is already there.
+        With heartbeat, an empty batch is yielded after that many seconds
+        without new files, so the caller can act on timeouts.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        wake = asyncio.Event()
+        observer = None
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(_WakeHandler(asyncio.get_running_loop(), wake), self.folder, recursive=False)
+            observer.start()
+        else:
+            print("watchdog is not installed; polling the folder instead (pip install watchdog)")
+        last_yield = time.monotonic()
+        try:
+            while True:
+                wake.clear()
+                stable, pending = await asyncio.to_thread(self.scan)
+                if stable:
+                    last_yield = time.monotonic()
+                    yield stable
+                elif until_idle and not pending:
+                    return
+                elif heartbeat is not None and time.monotonic() - last_yield >= heartbeat:
+                    last_yield = time.monotonic()
+                    yield []
+                # Files still being written must be re-checked on a timer; otherwise
+                # wait for watchdog to report a change
+                timeout = self.poll_interval if pending or observer is None else IDLE_RESCAN_INTERVAL
+                if heartbeat is not None:
+                    timeout = min(timeout, max(heartbeat - (time.monotonic() - last_yield), 0.1))
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout)
+                    # Let a burst of events settle before rescanning
+                    await asyncio.sleep(min(self.poll_interval, 0.2))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
@@ -0,0 +1,123 @@
+import os
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+HASH_BITS = 64
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+class HammingIndex:
+    """Multi-index hash table for fast Hamming-radius lookups over 64-bit hashes.
+
+    Each hash is split into `max_distance + 1` bands and every band is stored in
+    its own lookup table. By the pigeonhole principle, two hashes within
+    `max_distance` bits of each other share at least one band exactly, so a query
+    only has to compare against the few entries found in its own band buckets
+    instead of scanning the whole history.
+
+    Entries can be persisted to a JSON lines file which is appended to on every
+    add, so the index survives restarts without rewriting the whole file.
+    refresh() picks up lines appended by other processes since the last load.
+
+    Attributes:
+        max_distance: Largest Hamming distance a query can search for
+        path: Optional JSON lines file backing the index
+    """
+
+    def __init__(self, max_distance: int = 6, path: Optional[str] = None):
+        if not 0 <= max_distance < HASH_BITS:
+            raise ValueError(f"max_distance must be between 0 and {HASH_BITS - 1}")
+        self.max_distance = max_distance
+        self.path = path
+        self._bands = self._band_layout(max_distance + 1)
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._hashes: List[int] = []
+        self._entries: List[Dict[str, Any]] = []
+        # Bytes of the backing file already loaded
+        self._offset = 0
+        if path:
+            self._load()
+
+    @staticmethod
+    def _band_layout(num_bands: int) -> List[Tuple[int, int]]:
+        """Return (shift, mask) per band, spreading leftover bits over the first bands"""
+        base, extra = divmod(HASH_BITS, num_bands)
+        layout = []
+        shift = 0
+        for band in range(num_bands):
+            width = base + (1 if band < extra else 0)
+            layout.append((shift, (1 << width) - 1))
+            shift += width
+        return layout
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _insert(self, value: int, entry: Dict[str, Any]) -> None:
+        position = len(self._hashes)
+        self._hashes.append(value)
+        self._entries.append(entry)
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((value >> shift) & mask, []).append(position)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing this line; read it on the next refresh
+                    break
+                self._offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    self._insert(int(record["hash"], 16), record.get("entry", {}))
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    # Skip a partially written line instead of failing the whole load
+                    continue
+
+    def refresh(self) -> None:
+        """Load entries that other processes appended to the backing file"""
+        if self.path:
+            self._load()
+
+    def add(self, value: int, entry: Optional[Dict[str, Any]] = None) -> None:
+        """Add a hash with optional metadata, appending it to the backing file"""
+        entry = entry or {}
+        self._insert(value, entry)
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            line = (json.dumps({"hash": f"{value:016x}", "entry": entry}) + "\n").encode("utf-8")
+            with open(self.path, 'ab') as f:
+                f.write(line)
+                end = f.tell()
+            # Skip our own line on the next refresh unless others appended in between
+            if end - len(line) == self._offset:
+                self._offset = end
+
+    def query(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return (distance, entry) pairs within max_distance bits, closest first"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            candidates.update(table.get((value >> shift) & mask, ()))
+        matches = []
+        for position in candidates:
+            distance = hamming_distance(value, self._hashes[position])
+            if distance <= max_distance:
+                matches.append((distance, self._entries[position]))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def nearest(self, value: int, max_distance: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Return the closest (distance, entry) within max_distance, or None"""
+        matches = self.query(value, max_distance)
+        return matches[0] if matches else None
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import socket
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+DEFAULT_QUEUE_URL = "sqlite:///jobs.db"
+
+# A worker must heartbeat within this many seconds or its job is leased to another worker
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+
+def new_worker_id() -> str:
+    """Worker id such as render-box-1:4242:1a2b3c (host, process, random suffix)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class JobQueue(ABC):
+    """Interface of a job queue shared by several worker hosts.
+
+    Jobs have a kind (the pipeline stage), a JSON payload and an optional key.
+    Submitting a key that already exists returns the existing job instead of
+    adding a second one, so stages can be submitted again safely. A worker
+    leases a job for a limited time and must heartbeat to keep it; a lease
+    that runs out (crashed or hung worker) makes the job available again.
+    complete() and fail() only succeed for the worker that holds the lease,
+    so a worker that lost its lease cannot overwrite the new holder's result.
+
+    Methods block (a shared queue can be locked by another host for a while)
+    and are safe to call from several threads, so async callers run them
+    through asyncio.to_thread().
+    """
+
+    @abstractmethod
+    def submit(self, kind: str, payload: Dict[str, Any], key: Optional[str] = None,
+               max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        pass
+
+    @abstractmethod
+    def lease(self, kinds: List[str], worker_id: str,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        pass
+
+    @abstractmethod
+    def complete(self, job_id: int, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def fail(self, job_id: int, worker_id: str, error: str, retry_delay: float = 60) -> bool:
+        pass
+
+    @abstractmethod
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        pass
+
+    def close(self) -> None:
+        pass
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    available_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_available ON jobs (status, kind, available_at);
+"""
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a SQLite file, which can live on a disk shared by all worker hosts.
+
+    WAL mode needs shared memory on one host, so the rollback journal is used
+    instead; leases are taken inside BEGIN IMMEDIATE transactions, which
+    SQLite's file locking serializes across hosts. Calls from several threads
+    take turns on the one connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SQLITE_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _row(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, kind: str, payload: Dict[str, Any], key: Optional[str] = None,
+               max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        with self._lock:
+            now = time.time()
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (kind, key, payload, available_at, max_attempts, created_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO NOTHING",
+                (kind, key, json.dumps(payload), now, max_attempts, now)
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid
+            return self.conn.execute("SELECT id FROM jobs WHERE key = ?", (key,)).fetchone()[0]
+
+    def lease(self, kinds: List[str], worker_id: str,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            now = time.time()
+            placeholders = ", ".join("?" for _ in kinds)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose lease ran out have used up an attempt; give up on them after max_attempts
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired', finished_at = ? "
+                    "WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= max_attempts", (now, now))
+                row = self.conn.execute(
+                    f"SELECT * FROM jobs WHERE kind IN ({placeholders}) AND ("
+                    f"(status = 'queued' AND available_at <= ?) OR (status = 'leased' AND lease_expires_at < ?)) "
+                    f"ORDER BY available_at, id LIMIT 1", (*kinds, now, now)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'leased', worker_id = ?, lease_expires_at = ?, attempts = attempts + 1 "
+                        "WHERE id = ?", (worker_id, now + lease_seconds, row["id"]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return self.get(row["id"]) if row is not None else None
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (time.time() + lease_seconds, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (json.dumps(result) if result is not None else None, time.time(), job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry_delay: float = 60) -> bool:
+        with self._lock:
+            now = time.time()
+            cursor = self.conn.execute(
+                "UPDATE jobs SET "
+                "status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "finished_at = CASE WHEN attempts >= max_attempts THEN ? ELSE NULL END, "
+                "available_at = ?, error = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (now, now + retry_delay, error, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._row(self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+            rows = self.conn.execute(f"SELECT * FROM jobs {where} ORDER BY id DESC LIMIT ?", (*params, limit))
+            return [self._row(row) for row in rows]
+
+# Queue backends by URL scheme; register another JobQueue subclass here to add one
+JOB_QUEUE_BACKENDS = {
+    "sqlite": lambda location: SQLiteJobQueue(location),
+}
+
+def open_job_queue(url: str = DEFAULT_QUEUE_URL) -> JobQueue:
+    """
+    Open a job queue from a URL such as sqlite:///jobs.db or sqlite:////mnt/shared/jobs.db.
+
+    Raises:
+        ValueError: If no backend is registered for the URL scheme
+    """
+    scheme, separator, location = url.partition("://")
+    if not separator or scheme not in JOB_QUEUE_BACKENDS:
+        raise ValueError(f"Unsupported job queue URL: {url} (schemes: {', '.join(JOB_QUEUE_BACKENDS)})")
+    if scheme == "sqlite":
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        location = location[1:] if location.startswith("/") else location
+    return JOB_QUEUE_BACKENDS[scheme](location)
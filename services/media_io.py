@@ -0,0 +1,179 @@
+import subprocess
+from typing import List, Optional
+import numpy as np
+from services.ffmpeg_runner import run_media_command
+
+# Bytes per pixel for the raw pixel formats we ask ffmpeg for
+PIXEL_CHANNELS = {"gray": 1, "rgb24": 3}
+
+def _stderr_text(error: subprocess.CalledProcessError) -> str:
+    stderr = error.stderr
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode(errors="replace")
+    return (stderr or "").strip()
+
+def _decode_image_cmd(path: str, width: int, height: int, pix_fmt: str) -> List[str]:
+    return [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', path,
+        '-frames:v', '1',
+        '-vf', f'scale={width}:{height}:flags=area',
+        '-pix_fmt', pix_fmt,
+        '-f', 'rawvideo',
+        'pipe:1'
+    ]
+
+def _decode_video_cmd(path: str, width: int, height: int, pix_fmt: str) -> List[str]:
+    return [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', path,
+        '-an',
+        '-vf', f'scale={width}:{height}:flags=area',
+        '-pix_fmt', pix_fmt,
+        '-f', 'rawvideo',
+        'pipe:1'
+    ]
+
+def _last_frame_cmd(path: str, output_path: str) -> List[str]:
+    return [
+        'ffmpeg',
+        '-v', 'error',
+        '-sseof', '-1',
+        '-i', path,
+        '-update', '1',
+        '-q:v', '2',
+        '-y',
+        output_path
+    ]
+
+def _image_from_raw(raw: bytes, path: str, width: int, height: int, pix_fmt: str) -> Optional[np.ndarray]:
+    channels = PIXEL_CHANNELS[pix_fmt]
+    expected = width * height * channels
+    if len(raw) < expected:
+        print(f"Error decoding image {path}: got {len(raw)} bytes, expected {expected}")
+        return None
+    pixels = np.frombuffer(raw[:expected], dtype=np.uint8)
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return pixels.reshape(shape)
+
+def _frames_from_raw(raw: bytes, path: str, width: int, height: int, pix_fmt: str) -> Optional[np.ndarray]:
+    channels = PIXEL_CHANNELS[pix_fmt]
+    frame_size = width * height * channels
+    frame_count = len(raw) // frame_size
+    if frame_count == 0:
+        print(f"Error decoding video {path}: no frames")
+        return None
+    pixels = np.frombuffer(raw[:frame_count * frame_size], dtype=np.uint8)
+    shape = (frame_count, height, width) if channels == 1 else (frame_count, height, width, channels)
+    return pixels.reshape(shape)
+
+def decode_image(path: str, width: int, height: int, pix_fmt: str = "gray") -> Optional[np.ndarray]:
+    """
+    Decode an image with ffmpeg, resized to width x height, into a NumPy array.
+
+    Using ffmpeg keeps decoding out of Python and avoids an imaging dependency;
+    the scaled raw pixels are small enough to read straight from the pipe.
+
+    Args:
+        path: Path (or URL) of the image
+        width: Output width in pixels
+        height: Output height in pixels
+        pix_fmt: "gray" for an (height, width) array or "rgb24" for (height, width, 3)
+
+    Returns:
+        Optional[np.ndarray]: uint8 pixel array, or None if decoding failed
+    """
+    try:
+        result = subprocess.run(_decode_image_cmd(path, width, height, pix_fmt), capture_output=True, check=True)
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error decoding image {path}: {_stderr_text(e)}")
+        return None
+    return _image_from_raw(result.stdout, path, width, height, pix_fmt)
+
+async def decode_image_async(path: str, width: int, height: int, pix_fmt: str = "gray") -> Optional[np.ndarray]:
+    """Async version of decode_image() that runs ffmpeg without blocking the event loop"""
+    try:
+        raw = await run_media_command(_decode_image_cmd(path, width, height, pix_fmt), capture_stdout=True)
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error decoding image {path}: {_stderr_text(e)}")
+        return None
+    return _image_from_raw(raw, path, width, height, pix_fmt)
+
+def decode_video_frames(path: str, width: int, height: int, pix_fmt: str = "gray") -> Optional[np.ndarray]:
+    """
+    Decode every frame of a video with ffmpeg, downscaled to width x height.
+
+    Args:
+        path: Path (or URL) of the video
+        width: Output width in pixels
+        height: Output height in pixels
+        pix_fmt: "gray" for (frames, height, width) or "rgb24" for (frames, height, width, 3)
+
+    Returns:
+        Optional[np.ndarray]: uint8 frame array, or None if decoding failed
+    """
+    try:
+        result = subprocess.run(_decode_video_cmd(path, width, height, pix_fmt), capture_output=True, check=True)
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error decoding video {path}: {_stderr_text(e)}")
+        return None
+    return _frames_from_raw(result.stdout, path, width, height, pix_fmt)
+
+async def decode_video_frames_async(path: str, width: int, height: int, pix_fmt: str = "gray") -> Optional[np.ndarray]:
+    """Async version of decode_video_frames() that runs ffmpeg without blocking the event loop"""
+    try:
+        raw = await run_media_command(_decode_video_cmd(path, width, height, pix_fmt), capture_stdout=True)
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"Error decoding video {path}: {_stderr_text(e)}")
+        return None
+    return _frames_from_raw(raw, path, width, height, pix_fmt)
+
+def extract_last_frame(path: str, output_path: str) -> bool:
+    """
+    Save the last frame of a video as an image.
+
+    Works on URLs as well as local files: ffmpeg seeks close to the end, so only
+    the tail of a remote video is fetched.
+
+    Args:
+        path: Path (or URL) of the video
+        output_path: Image file to write (format from the extension)
+
+    Returns:
+        bool: True if the frame was written
+    """
+    try:
+        subprocess.run(_last_frame_cmd(path, output_path), capture_output=True, check=True)
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting last frame of {path}: {_stderr_text(e)}")
+        return False
+    return True
+
+async def extract_last_frame_async(path: str, output_path: str) -> bool:
+    """Async version of extract_last_frame() that runs ffmpeg without blocking the event loop"""
+    try:
+        await run_media_command(_last_frame_cmd(path, output_path))
+    except FileNotFoundError:
+        print("Error: ffmpeg command not found. Please make sure FFmpeg is installed and in your PATH.")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting last frame of {path}: {_stderr_text(e)}")
+        return False
+    return True
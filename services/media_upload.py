@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import asyncio
+import mimetypes
+from typing import Any, Dict, Optional, Set
+import tweepy
+from .task_group import gather_or_cancel
+
+# APPEND accepts at most 5 MB per segment
+CHUNK_SIZE = 4 * 1024 * 1024
+# Segments carry their index, so they can be sent in parallel and in any order
+MAX_PARALLEL_APPENDS = 4
+APPEND_RETRIES = 3
+# Stop waiting for Twitter's video processing after this long
+PROCESSING_TIMEOUT = 600
+
+def _state_path(path: str, account: str) -> str:
+    # The media id belongs to the uploading account, so every account resumes separately
+    return f"{path}.{account}.upload.json"
+
+def _load_state(path: str, account: str) -> Optional[Dict[str, Any]]:
+    """Return the saved upload state if it still matches the file and has not expired"""
+    try:
+        with open(_state_path(path, account)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(path)
+    if (state.get("size") != stat.st_size or state.get("mtime") != stat.st_mtime
+            or state.get("chunk_size") != CHUNK_SIZE or state.get("expires_at", 0) <= time.time()):
+        return None
+    return state
+
+def _save_state(path: str, account: str, state: Dict[str, Any]) -> None:
+    temp_path = _state_path(path, account) + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, _state_path(path, account))
+
+def _read_chunk(path: str, index: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(index * CHUNK_SIZE)
+        return f.read(CHUNK_SIZE)
+
+async def _append_segments(api: tweepy.API, path: str, account: str, state: Dict[str, Any], total_segments: int) -> bool:
+    done: Set[int] = set(state["done_segments"])
+    pending = [index for index in range(total_segments) if index not in done]
+    if done:
+        print(f"Resuming upload of {path}: {len(done)}/{total_segments} segments already sent")
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_APPENDS)
+
+    async def append(index: int) -> bool:
+        async with semaphore:
+            chunk = await asyncio.to_thread(_read_chunk, path, index)
+            for attempt in range(APPEND_RETRIES):
+                try:
+                    await asyncio.to_thread(api.chunked_upload_append, state["media_id"], chunk, index)
+                    break
+                except tweepy.TooManyRequests:
+                    # Retrying right away only burns attempts; the caller waits for the reset
+                    raise
+                except tweepy.TweepyException as e:
+                    if attempt == APPEND_RETRIES - 1:
+                        print(f"Error uploading segment {index} of {path}: {e}")
+                        return False
+                    await asyncio.sleep(2 ** attempt)
+            # Record every acknowledged segment so a later run skips it
+            done.add(index)
+            state["done_segments"] = sorted(done)
+            _save_state(path, account, state)
+            return True
+
+    # A rate-limited segment stops the others too instead of letting them run into the limit
+    results = await gather_or_cancel(*(append(index) for index in pending), failed=lambda ok: False)
+    return all(results)
+
+async def _wait_for_processing(api: tweepy.API, media_id: str, processing_info: Optional[Dict[str, Any]]) -> bool:
+    """Poll the processing status without blocking the event loop"""
+    deadline = time.monotonic() + PROCESSING_TIMEOUT
+    while processing_info:
+        state = processing_info.get("state")
+        if state == "succeeded":
+            return True
+        if state == "failed":
+            print(f"Media processing failed: {processing_info.get('error')}")
+            return False
+        if time.monotonic() > deadline:
+            print(f"Timed out waiting for media {media_id} to be processed")
+            return False
+        await asyncio.sleep(processing_info.get("check_after_secs", 1))
+        status = await asyncio.to_thread(api.get_media_upload_status, media_id)
+        processing_info = getattr(status, "processing_info", None)
+    return True
+
+async def upload_media_async(
+    api: tweepy.API,
+    path: str,
+    account: str = "default",
+    media_category: Optional[str] = None
+) -> Optional[str]:
+    """
+    Upload a media file for a tweet without blocking the event loop.
+
+    Videos go through the chunked endpoint with up to MAX_PARALLEL_APPENDS
+    segments in flight. Acknowledged segments are recorded in a state file
+    next to the media, so a failed upload resumes where it stopped (as long as
+    the media id has not expired) instead of starting over.
+
+    Args:
+        api: Authenticated v1.1 API of the posting account
+        path: Media file path
+        account: Account name, used to keep resume state per account
+        media_category: tweet_video/tweet_image/tweet_gif (default: from the file type)
+
+    Returns:
+        Optional[str]: Media id ready to attach, or None on failure
+    
+    Raises:
+        tweepy.TooManyRequests: When rate limited, so the caller can wait for
+        x-rate-limit-reset (acknowledged segments are kept for the retry)
+    """
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if not media_type.startswith("video/"):
+        # Images are a single small request
+        try:
+            media = await asyncio.to_thread(api.media_upload, path, media_category=media_category)
+        except tweepy.TooManyRequests:
+            raise
+        except tweepy.TweepyException as e:
+            print(f"Error uploading {path}: {e}")
+            return None
+        return str(media.media_id)
+
+    stat = os.stat(path)
+    total_segments = max(1, -(-stat.st_size // CHUNK_SIZE))
+    try:
+        state = _load_state(path, account)
+        if state is None:
+            media = await asyncio.to_thread(api.chunked_upload_init, stat.st_size, media_type,
+                                            media_category=media_category or "tweet_video")
+            state = {
+                "media_id": str(media.media_id),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "chunk_size": CHUNK_SIZE,
+                "expires_at": time.time() + getattr(media, "expires_after_secs", 86400) - 60,
+                "done_segments": [],
+            }
+            _save_state(path, account, state)
+
+        if not await _append_segments(api, path, account, state, total_segments):
+            return None
+
+        media = await asyncio.to_thread(api.chunked_upload_finalize, state["media_id"])
+    except tweepy.TooManyRequests:
+        raise
+    except tweepy.TweepyException as e:
+        print(f"Error uploading {path}: {e}")
+        return None
+
+    # The segments are stored on Twitter's side now; a retry starts with a fresh upload
+    os.remove(_state_path(path, account))
+    if not await _wait_for_processing(api, state["media_id"], getattr(media, "processing_info", None)):
+        return None
+    print(f"Uploaded {path} as media {state['media_id']}")
+    return state["media_id"]
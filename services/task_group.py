@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+async def gather_or_cancel(
+    *awaitables: Awaitable[Any],
+    failed: Callable[[Any], bool] = lambda result: result is None
+) -> List[Optional[Any]]:
+    """
+    Run awaitables concurrently and stop all of them as soon as one fails.
+
+    A branch fails when it raises, is cancelled or when `failed(result)` is
+    true (by default: it returned None, the pipeline's failure value). The other
+    branches are then cancelled, which also cancels any fal jobs they have
+    submitted (see services.fal_progress), and waited for before returning.
+    The same happens when the caller itself is cancelled, e.g. by Ctrl+C.
+
+    Returns:
+        List[Optional[Any]]: Results in order; None for branches that were cancelled
+
+    Raises:
+        The exception of the first branch that raised
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # A branch cancelled from inside (not by us) counts as failed
+            if any(task.cancelled() or task.exception() is not None or failed(task.result()) for task in done):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [None if task.cancelled() else task.result() for task in tasks]
@@ -1,11 +1,15 @@
-from .twitter_auth import api, client
+import asyncio
+from .twitter_auth import get_account
+from .media_upload import upload_media_async
 
 def upload_media(image_path):
     # Upload the image
+    api, _ = get_account()
     media = api.media_upload(image_path)
     return media.media_id
 
 def tweet(content, image_path=None):
+    _, client = get_account()
     if image_path:
         # Upload the image
         media_id = upload_media(image_path)
@@ -21,4 +25,53 @@ def tweet(content, image_path=None):
         return response.data['id']
     else:
         print("Failed to post tweet.")
-        return None
\ No newline at end of file
+        return None
+
+async def tweet_async(content, media_path=None, account_api=None, account_client=None, account="default"):
+    """
+    Post a tweet without blocking the event loop.
+
+    Videos are uploaded in parallel chunks and resume after a failure (see
+    media_upload.upload_media_async). Uses the default account unless an
+    API/client pair is given.
+    """
+    if not account_api or not account_client:
+        account_api, account_client = get_account()
+    media_ids = None
+    if media_path:
+        media_id = await upload_media_async(account_api, media_path, account)
+        if not media_id:
+            print("Failed to upload media.")
+            return None
+        media_ids = [media_id]
+
+    response = await asyncio.to_thread(account_client.create_tweet, text=content, media_ids=media_ids)
+    if response.data:
+        print(f"Tweet posted successfully ({account})!")
+        return response.data['id']
+    else:
+        print(f"Failed to post tweet ({account}).")
+        return None
+
+async def tweet_to_accounts_async(content, media_path, accounts):
+    """
+    Post the same content to several accounts concurrently.
+
+    Args:
+        content: Tweet text
+        media_path: Media to attach (uploaded once per account)
+        accounts: {account name: (tweepy.API, tweepy.Client)}
+
+    Returns:
+        dict: {account name: tweet id or None}
+    """
+    async def post(name, account_api, account_client):
+        try:
+            return await tweet_async(content, media_path, account_api, account_client, name)
+        except Exception as e:
+            print(f"Error posting to {name}: {e}")
+            return None
+
+    names = list(accounts)
+    results = await asyncio.gather(*(post(name, *accounts[name]) for name in names))
+    return dict(zip(names, results))
@@ -12,15 +12,48 @@ consumer_secret = os.getenv('TWITTER_CONSUMER_SECRET')
 access_token = os.getenv('TWITTER_ACCESS_TOKEN')
 access_token_secret = os.getenv('TWITTER_ACCESS_TOKEN_SECRET')
 
-# Authenticate to Twitter API v1.1
-auth = tweepy.OAuth1UserHandler(
-    consumer_key, consumer_secret,
-    access_token, access_token_secret
-)
-api = tweepy.API(auth)
-
-# Authenticate as user
-client = tweepy.Client(
-    consumer_key=consumer_key, consumer_secret=consumer_secret,
-    access_token=access_token, access_token_secret=access_token_secret
-) 
\ No newline at end of file
+# Additional accounts are listed in TWITTER_ACCOUNTS (comma separated names) and
+# read their credentials from prefixed variables, e.g. for "studio":
+#   TWITTER_STUDIO_CONSUMER_KEY, TWITTER_STUDIO_CONSUMER_SECRET,
+#   TWITTER_STUDIO_ACCESS_TOKEN, TWITTER_STUDIO_ACCESS_TOKEN_SECRET
+# The unprefixed credentials above are the "default" account.
+DEFAULT_ACCOUNT = "default"
+
+_account_clients = {}
+
+def get_account_names():
+    """Names of all configured accounts, the default account first"""
+    names = [DEFAULT_ACCOUNT] if consumer_key and access_token else []
+    for name in os.getenv('TWITTER_ACCOUNTS', '').split(','):
+        name = name.strip().lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def get_account(name=DEFAULT_ACCOUNT):
+    """
+    Return the (tweepy.API, tweepy.Client) pair of an account.
+
+    Clients are created on first use and then reused, so only the accounts
+    that are actually used need credentials.
+
+    Raises:
+        KeyError: If the account's credentials are not set
+    """
+    if name not in _account_clients:
+        prefix = "TWITTER_" if name == DEFAULT_ACCOUNT else f"TWITTER_{name.upper()}_"
+        keys = [os.getenv(prefix + key) for key in
+                ('CONSUMER_KEY', 'CONSUMER_SECRET', 'ACCESS_TOKEN', 'ACCESS_TOKEN_SECRET')]
+        if not all(keys):
+            raise KeyError(f"Missing {prefix}* credentials for Twitter account '{name}'")
+        account_consumer_key, account_consumer_secret, account_access_token, account_access_token_secret = keys
+        account_api = tweepy.API(tweepy.OAuth1UserHandler(
+            account_consumer_key, account_consumer_secret,
+            account_access_token, account_access_token_secret
+        ))
+        account_client = tweepy.Client(
+            consumer_key=account_consumer_key, consumer_secret=account_consumer_secret,
+            access_token=account_access_token, access_token_secret=account_access_token_secret
+        )
+        _account_clients[name] = (account_api, account_client)
+    return _account_clients[name]
@@ -12,4 +12,14 @@ def load_env_vars():
         print(f"Loaded environment variables from {env_path}")
     else:
         print(f"Warning: .env.local not found at {env_path}")
-        print("Continuing without loading environment variables...") 
\ No newline at end of file
+        print("Continuing without loading environment variables...")
+
+_openai_client = None
+
+def get_openai_client():
+    """Shared OpenAI client, created on first use so its connection pool stays warm"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
@@ -0,0 +1,135 @@
+import struct
+from typing import Tuple
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class WavInfo:
+    """Layout of a WAV file's sample data.
+
+    Attributes:
+        sample_rate: Samples per second per channel
+        channels: Number of interleaved channels
+        dtype: NumPy dtype of one sample in the file (3-byte void for 24-bit PCM)
+        data_offset: Byte offset of the first sample
+        frames: Number of sample frames (samples per channel)
+    """
+
+    def __init__(self, sample_rate: int, channels: int, dtype: np.dtype, data_offset: int, frames: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        self.data_offset = data_offset
+        self.frames = frames
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+def _sample_dtype(format_tag: int, bits: int) -> np.dtype:
+    if format_tag == WAVE_FORMAT_PCM:
+        if bits == 8:
+            return np.dtype(np.uint8)
+        if bits in (16, 32):
+            return np.dtype(f"<i{bits // 8}")
+        if bits == 24:
+            # No NumPy type; open_wav() widens these to int32
+            return np.dtype((np.void, 3))
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        return np.dtype(f"<f{bits // 8}")
+    raise ValueError(f"Unsupported WAV sample format: tag {format_tag}, {bits} bits")
+
+def read_wav_info(path: str) -> WavInfo:
+    """Parse the RIFF chunks of a WAV file without reading its samples"""
+    with open(path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in WAV file: {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    # The real format tag is the first two bytes of the sub-format GUID
+                    format_tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV data chunk before fmt chunk: {path}")
+                format_tag, channels, sample_rate, bits = fmt
+                dtype = _sample_dtype(format_tag, bits)
+                data_offset = f.tell()
+                # Streamed WAVs sometimes carry a placeholder size; trust the file length instead
+                f.seek(0, 2)
+                available = f.tell() - data_offset
+                size = min(chunk_size, available) if chunk_size else available
+                frames = size // (dtype.itemsize * channels)
+                return WavInfo(sample_rate, channels, dtype, data_offset, frames)
+            else:
+                # Chunks are word aligned
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+def open_wav(path: str) -> Tuple[np.ndarray, WavInfo]:
+    """
+    Memory-map the samples of a WAV file.
+
+    Nothing is read until the array is used, and slicing only touches the pages
+    it needs, so long tracks can be analysed and cut without loading them.
+    24-bit PCM cannot be mapped as is; it is read and widened to int32 (the
+    sample in the top three bytes, so to_float() scales it correctly).
+
+    Args:
+        path: Path of the WAV file
+
+    Returns:
+        Tuple[np.ndarray, WavInfo]: Read-only (frames, channels) sample array and the file layout
+    """
+    info = read_wav_info(path)
+    if info.dtype.itemsize == 3:
+        raw = np.memmap(path, dtype=np.uint8, mode="r", offset=info.data_offset,
+                        shape=(info.frames, info.channels, 3))
+        widened = np.zeros((info.frames, info.channels, 4), dtype=np.uint8)
+        widened[..., 1:] = raw
+        return widened.view("<i4").reshape(info.frames, info.channels), info
+    samples = np.memmap(path, dtype=info.dtype, mode="r", offset=info.data_offset,
+                        shape=(info.frames, info.channels))
+    return samples, info
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """Convert samples of any supported dtype to float32 in [-1, 1]"""
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    if np.issubdtype(samples.dtype, np.integer):
+        return samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    return samples.astype(np.float32)
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int) -> None:
+    """
+    Write a (frames, channels) array as a WAV file, keeping the sample dtype.
+
+    Args:
+        path: Output path
+        samples: Sample array of a dtype supported by read_wav_info()
+        sample_rate: Samples per second per channel
+    """
+    samples = np.asarray(samples)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    dtype = samples.dtype.newbyteorder("<")
+    format_tag = WAVE_FORMAT_IEEE_FLOAT if dtype.kind == "f" else WAVE_FORMAT_PCM
+    channels = samples.shape[1]
+    block_align = channels * dtype.itemsize
+    data = np.ascontiguousarray(samples, dtype=dtype).tobytes()
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sI4s", b"RIFF", 36 + len(data), b"WAVE"))
+        f.write(struct.pack("<4sIHHIIHH", b"fmt ", 16, format_tag, channels, sample_rate,
+                            sample_rate * block_align, block_align, dtype.itemsize * 8))
+        f.write(struct.pack("<4sI", b"data", len(data)))
+        f.write(data)
@@ -1,15 +1,34 @@
 import os
+import json
+import random
 import asyncio
 import fal_client
-import requests
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 import time
 from pathlib import Path
 from services.utils import load_env_vars
+from services.downloader import download_file_async
+from image_index import ImageIndex, phash_file_async
+from image_quality import rank_image_files_async
+from run_catalog import RunCatalog
+from merge_audio_video import get_media_duration_async, concat_videos_async
+from services.media_io import extract_last_frame_async
+from model_registry import run_model_async, TIERS as MODEL_TIERS
 
 # Load environment variables
 load_env_vars()
 
+# Render settings per quality tier. Drafts are cheap previews for a whole batch;
+# only the drafts picked for posting are re-rendered at final quality with the
+# same image and seed. num_frames stays the same so a promoted clip keeps the
+# motion that was reviewed in the draft.
+VIDEO_TIERS = {
+    "draft": {"resolution": "480p", "num_inference_steps": 12, "acceleration": "regular"},
+    "final": {"resolution": "720p", "num_inference_steps": 30, "acceleration": "regular"},
+}
+
+MAX_SEED = 2**31 - 1
+
 async def generate_image_async(
     prompt: str,
     output_folder: str = "input",
@@ -18,10 +37,21 @@ async def generate_image_async(
     enable_safety_checker: bool = True,
     safety_tolerance: str = "2",
     output_format: str = "jpeg",
-    aspect_ratio: str = "16:9"
+    aspect_ratio: str = "16:9",
+    model_tier: Optional[str] = None,
+    deadline: Optional[float] = None
 ) -> Optional[str]:
     """
-    Generate image using FLUX-Pro Ultra API and download it to the specified folder.
+    Generate image with a FLUX model and download it to the specified folder.
+    
+    The model is picked by model_registry.route(): FLUX-Pro Ultra by default,
+    faster FLUX models for model_tier="fast" or when FLUX-Pro Ultra is not
+    expected to finish within `deadline` seconds, and the next model whenever
+    one fails.
+    
+    With num_images > 1 all candidates are downloaded concurrently, scored
+    locally (sharpness, colorfulness, exposure clipping, blank detection) and
+    only the best one is kept under output_filename.
     """
     print(f"Generating image with prompt: {prompt}")
     print(f"Aspect ratio: {aspect_ratio}")
@@ -31,141 +61,393 @@ async def generate_image_async(
         print("Error: FAL_KEY environment variable not set")
         return None
 
+    arguments = {
+        "prompt": prompt,
+        "num_images": num_images,
+        "enable_safety_checker": enable_safety_checker,
+        "safety_tolerance": safety_tolerance,
+        "output_format": output_format,
+        "aspect_ratio": aspect_ratio
+    }
     try:
-        result = await fal_client.run_async(
-            "fal-ai/flux-pro/v1.1-ultra",
-            arguments={
-                "prompt": prompt,
-                "num_images": num_images,
-                "enable_safety_checker": enable_safety_checker,
-                "safety_tolerance": safety_tolerance,
-                "output_format": output_format,
-                "aspect_ratio": aspect_ratio
-            }
-        )
-        
-        if not result or "images" not in result or len(result["images"]) == 0:
+        routed = await run_model_async("image", arguments, model_tier, deadline,
+                                       validate=lambda result: len(result.get("images") or []) > 0)
+        if not routed:
             print("Error: Failed to generate image or invalid response")
             return None
+        result, image_model, model_arguments = routed
 
-        image_url = result["images"][0]["url"]
-        print(f"Image generated successfully. URL: {image_url}")
+        image_urls = [image["url"] for image in result["images"]]
+        print(f"{len(image_urls)} image(s) generated successfully. URLs: {', '.join(image_urls)}")
         
-        response = requests.get(image_url)
-        if response.status_code != 200:
-            print(f"Error downloading image file: HTTP {response.status_code}")
-            return None
-
         output_path = os.path.join(output_folder, output_filename)
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        if len(image_urls) == 1:
+            candidate_paths = [output_path]
+        else:
+            stem, extension = os.path.splitext(output_filename)
+            candidate_paths = [os.path.join(output_folder, f"{stem}_candidate{i}{extension}")
+                               for i in range(len(image_urls))]
+        
+        # Download all candidates concurrently
+        downloaded = await asyncio.gather(*(
+            download_file_async(url, path) for url, path in zip(image_urls, candidate_paths)
+        ))
+        candidates = [(url, path) for url, path, ok in zip(image_urls, candidate_paths, downloaded) if ok]
+        if not candidates:
+            return None
+        
+        scores = None
+        image_url, best_path = candidates[0]
+        if len(image_urls) > 1:
+            # Score locally and forward only the best candidate to the video stage.
+            # Also done when a single candidate survived the download, so a blank
+            # image is still caught.
+            scores = await rank_image_files_async([path for _, path in candidates])
+            ranked = sorted(range(len(candidates)),
+                            key=lambda i: scores[i] if scores[i] is not None else float("-inf"),
+                            reverse=True)
+            best = ranked[0]
+            for i, (url, path) in enumerate(candidates):
+                print(f"Candidate {i}: score {scores[i]}" + (" (selected)" if i == best else ""))
+            if scores[best] is None or scores[best] == float("-inf"):
+                print("Error: All image candidates are blank or could not be scored")
+                for _, path in candidates:
+                    os.remove(path)
+                return None
+            image_url, best_path = candidates[best]
+            for i in ranked[1:]:
+                os.remove(candidates[i][1])
+        if best_path != output_path:
+            os.replace(best_path, output_path)
+        
         print(f"Image saved to: {output_path}")
         return {
             "file_path": output_path,
-            "url": image_url
+            "url": image_url,
+            "model": image_model,
+            "arguments": model_arguments,
+            "scores": scores
         }
     except Exception as e:
         print(f"Error generating image: {e}")
         return None
 
-async def generate_video_async(
+DEFAULT_NEGATIVE_PROMPT = "worst quality, inconsistent motion, blurry, jittery, distorted, low resolution, bad composition, poor lighting, unrealistic physics, artificial movement"
+
+def build_video_arguments(
     image_url: str,
     prompt: str = "",
-    output_folder: str = "input",
-    output_filename: str = "game_video.mp4",
-    negative_prompt: str = "worst quality, inconsistent motion, blurry, jittery, distorted, low resolution, bad composition, poor lighting, unrealistic physics, artificial movement",
+    negative_prompt: str = DEFAULT_NEGATIVE_PROMPT,
     num_frames: int = 81,
     frames_per_second: int = 16,
-    resolution: str = "720p",
-    num_inference_steps: int = 30,
+    resolution: Optional[str] = None,
+    num_inference_steps: Optional[int] = None,
     guide_scale: int = 5,
     shift: int = 5,
     enable_safety_checker: bool = True,
     enable_prompt_expansion: bool = False,
-    acceleration: str = "regular",
-    aspect_ratio: str = "auto"
-) -> Optional[str]:
+    acceleration: Optional[str] = None,
+    aspect_ratio: str = "auto",
+    tier: str = "final",
+    seed: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
     """
-    Generate video from an image using Wan-2.1 Image-to-Video API and download it to the specified folder.
+    Build the Wan-2.1 Image-to-Video arguments for a quality tier.
+    
+    resolution, num_inference_steps and acceleration default to the values of
+    the quality tier (see VIDEO_TIERS). Draft renders always get a seed so the
+    same clip can later be re-rendered at final quality with promote_draft_async().
+    Returns None for an unknown tier.
+    """
+    if tier not in VIDEO_TIERS:
+        print(f"Error: Unknown video tier '{tier}'. Choose from: {', '.join(VIDEO_TIERS)}")
+        return None
+    tier_settings = VIDEO_TIERS[tier]
+    if seed is None and tier == "draft":
+        seed = random.randint(0, MAX_SEED)
+    
+    arguments = {
+        "prompt": prompt,
+        "negative_prompt": negative_prompt,
+        "image_url": image_url,
+        "num_frames": num_frames,
+        "frames_per_second": frames_per_second,
+        "resolution": resolution or tier_settings["resolution"],
+        "num_inference_steps": num_inference_steps or tier_settings["num_inference_steps"],
+        "guide_scale": guide_scale,
+        "shift": shift,
+        "enable_safety_checker": enable_safety_checker,
+        "enable_prompt_expansion": enable_prompt_expansion,
+        "acceleration": acceleration or tier_settings["acceleration"],
+        "aspect_ratio": aspect_ratio
+    }
+    if seed is not None:
+        arguments["seed"] = seed
+    return arguments
+
+async def request_video_async(arguments: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Run the image-to-video model (Wan-2.1, see model_registry) and return the URL
+    of the generated video and the model id without downloading it.
     """
-    print(f"Generating video from image: {image_url}")
-    print(f"Video prompt: {prompt}")
-    os.makedirs(output_folder, exist_ok=True)
     fal_key = os.getenv("FAL_KEY")
     if not fal_key:
         print("Error: FAL_KEY environment variable not set")
         return None
-
     try:
-        result = await fal_client.run_async(
-            "fal-ai/wan-i2v",
-            arguments={
-                "prompt": prompt,
-                "negative_prompt": negative_prompt,
-                "image_url": image_url,
-                "num_frames": num_frames,
-                "frames_per_second": frames_per_second,
-                "resolution": resolution,
-                "num_inference_steps": num_inference_steps,
-                "guide_scale": guide_scale,
-                "shift": shift,
-                "enable_safety_checker": enable_safety_checker,
-                "enable_prompt_expansion": enable_prompt_expansion,
-                "acceleration": acceleration,
-                "aspect_ratio": aspect_ratio
-            }
-        )
-        
-        if not result or "video" not in result or "url" not in result["video"]:
+        routed = await run_model_async("video", arguments,
+                                       validate=lambda result: "url" in (result.get("video") or {}))
+        if not routed:
             print("Error: Failed to generate video or invalid response")
             return None
 
+        result, video_model, _ = routed
         video_url = result["video"]["url"]
         print(f"Video generated successfully. URL: {video_url}")
-        
-        response = requests.get(video_url)
-        if response.status_code != 200:
-            print(f"Error downloading video file: HTTP {response.status_code}")
-            return None
-
-        output_path = os.path.join(output_folder, output_filename)
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-        print(f"Video saved to: {output_path}")
-        return output_path
+        return video_url, video_model
     except Exception as e:
         print(f"Error generating video: {e}")
         return None
 
+async def generate_video_async(
+    image_url: str,
+    prompt: str = "",
+    output_folder: str = "input",
+    output_filename: str = "game_video.mp4",
+    negative_prompt: str = DEFAULT_NEGATIVE_PROMPT,
+    num_frames: int = 81,
+    frames_per_second: int = 16,
+    resolution: Optional[str] = None,
+    num_inference_steps: Optional[int] = None,
+    guide_scale: int = 5,
+    shift: int = 5,
+    enable_safety_checker: bool = True,
+    enable_prompt_expansion: bool = False,
+    acceleration: Optional[str] = None,
+    aspect_ratio: str = "auto",
+    tier: str = "final",
+    seed: Optional[int] = None,
+    run_info: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """
+    Generate video from an image using Wan-2.1 Image-to-Video API and download it to the specified folder.
+    
+    Render settings come from build_video_arguments(); see VIDEO_TIERS for the
+    draft and final tiers.
+    If run_info is given, it is filled with the video URL, model and arguments.
+    """
+    arguments = build_video_arguments(
+        image_url=image_url,
+        prompt=prompt,
+        negative_prompt=negative_prompt,
+        num_frames=num_frames,
+        frames_per_second=frames_per_second,
+        resolution=resolution,
+        num_inference_steps=num_inference_steps,
+        guide_scale=guide_scale,
+        shift=shift,
+        enable_safety_checker=enable_safety_checker,
+        enable_prompt_expansion=enable_prompt_expansion,
+        acceleration=acceleration,
+        aspect_ratio=aspect_ratio,
+        tier=tier,
+        seed=seed
+    )
+    if not arguments:
+        return None
+    
+    print(f"Generating {tier} video from image: {image_url}")
+    print(f"Video prompt: {prompt}")
+    os.makedirs(output_folder, exist_ok=True)
+    video = await request_video_async(arguments)
+    if not video:
+        return None
+    video_url, video_model = video
+    
+    output_path = os.path.join(output_folder, output_filename)
+    if not await download_file_async(video_url, output_path):
+        return None
+    print(f"Video saved to: {output_path}")
+    if run_info is not None:
+        run_info.update({"url": video_url, "model": video_model, "arguments": arguments, "tier": tier})
+    return output_path
+
+async def generate_chained_video_async(
+    image_url: str,
+    prompt: str,
+    num_segments: int,
+    output_folder: str = "input",
+    output_filename: str = "game_video.mp4",
+    tier: str = "final",
+    run_info: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """
+    Generate a long video as a chain of Wan-2.1 segments.
+    
+    The last frame of each segment is read straight from its URL, uploaded and
+    used as the image of the next segment, while the full segment downloads in
+    the background. The segments are then joined with stream copy.
+    
+    Args:
+        image_url: URL of the first keyframe
+        prompt: Video prompt used for every segment
+        num_segments: Number of segments (each ~5 s at the default 81 frames / 16 fps)
+        output_folder: Folder to save the segments and the joined video
+        output_filename: Filename of the joined video
+        tier: Video quality tier
+        run_info: If given, filled with the segment URLs, model and arguments
+    
+    Returns:
+        Optional[str]: Path of the joined video, or None on failure
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    stem, extension = os.path.splitext(output_filename)
+    segment_paths = []
+    segment_urls = []
+    segment_arguments = []
+    downloads = []
+    
+    try:
+        for index in range(num_segments):
+            print(f"\n--- Segment {index + 1}/{num_segments} ---")
+            arguments = build_video_arguments(image_url=image_url, prompt=prompt, tier=tier)
+            if not arguments:
+                return None
+            video = await request_video_async(arguments)
+            if not video:
+                print(f"Segment {index + 1} failed.")
+                return None
+            video_url, video_model = video
+            
+            segment_path = os.path.join(output_folder, f"{stem}_segment{index}{extension}")
+            segment_paths.append(segment_path)
+            segment_urls.append(video_url)
+            segment_arguments.append(arguments)
+            # Download in the background while the next segment is generated
+            downloads.append(asyncio.create_task(download_file_async(video_url, segment_path)))
+            
+            if index < num_segments - 1:
+                frame_path = os.path.join(output_folder, f"{stem}_keyframe{index + 1}.jpg")
+                if not await extract_last_frame_async(video_url, frame_path):
+                    return None
+                try:
+                    image_url = await fal_client.upload_file_async(frame_path)
+                except Exception as e:
+                    print(f"Error uploading keyframe {frame_path}: {e}")
+                    return None
+                print(f"Next keyframe uploaded: {image_url}")
+        
+        if not all(await asyncio.gather(*downloads)):
+            print("Error: Failed to download one or more segments")
+            return None
+    finally:
+        for download in downloads:
+            download.cancel()
+    
+    output_path = os.path.join(output_folder, output_filename)
+    if not await concat_videos_async(segment_paths, output_path):
+        return None
+    print(f"Joined {num_segments} segments into: {output_path}")
+    if run_info is not None:
+        run_info.update({"url": segment_urls[0], "segment_urls": segment_urls, "model": video_model,
+                         "arguments": segment_arguments[0], "tier": tier})
+    return output_path
+
 async def generate_game_video_async(
     prompt: str,
     output_folder: str = "input",
     image_filename: str = "game_image.jpg",
-    video_filename: str = "game_video.mp4"
+    video_filename: str = "game_video.mp4",
+    skip_duplicate_images: bool = True,
+    max_image_attempts: int = 2,
+    image_index: Optional[ImageIndex] = None,
+    num_image_candidates: int = 1,
+    tier: str = "final",
+    num_segments: int = 1,
+    run_info: Optional[Dict[str, Any]] = None,
+    image_model_tier: Optional[str] = None,
+    image_deadline: Optional[float] = None
 ) -> Optional[str]:
     """
     Two-stage process: 
     1. Generate an image from a prompt
     2. Generate a video from that image
+    
+    Before the (expensive) video stage, the image's perceptual hash is checked
+    against every earlier image. A visual duplicate is regenerated, and if every
+    attempt is a duplicate no video is generated at all.
+    
+    With num_segments > 1 the video is a chain of segments, each starting from
+    the last frame of the previous one (see generate_chained_video_async()).
+    
+    If run_info is given, it is filled with the "image" and "video" details
+    (URL, model, arguments) for the run catalog.
+    
+    image_model_tier and image_deadline (seconds) choose the image model, see
+    generate_image_async().
     """
     print(f"\n=== Stage 1: Generating Image from Prompt ===")
-    image_result = await generate_image_async(
-        prompt=prompt,
-        output_folder=output_folder,
-        output_filename=image_filename
-    )
+    if skip_duplicate_images and image_index is None:
+        image_index = ImageIndex()
+    
+    image_result = None
+    image_hash = None
+    for attempt in range(1, max_image_attempts + 1):
+        image_result = await generate_image_async(
+            prompt=prompt,
+            output_folder=output_folder,
+            output_filename=image_filename,
+            num_images=num_image_candidates,
+            model_tier=image_model_tier,
+            deadline=image_deadline
+        )
+        if not image_result or not skip_duplicate_images:
+            break
+        
+        image_hash = await phash_file_async(image_result["file_path"])
+        if image_hash is None:
+            print("Warning: Could not hash image. Skipping duplicate check.")
+            break
+        # Recorded right away under the index lock, so concurrent runs cannot
+        # both accept the same picture
+        with image_index.locked():
+            duplicate = image_index.find_duplicate(image_hash)
+            if not duplicate:
+                image_index.add(image_hash, image_result["file_path"], image_result["url"], prompt)
+        if not duplicate:
+            break
+        distance, entry = duplicate
+        print(f"Attempt {attempt}/{max_image_attempts}: image is a visual duplicate "
+              f"(distance {distance}) of {entry.get('file_path') or entry.get('url')}")
+        image_result = None
     
     if not image_result:
         print("Image generation failed. Cannot proceed to video generation.")
         return None
     
     print(f"\n=== Stage 2: Generating Video from Image ===")
-    video_path = await generate_video_async(
-        image_url=image_result["url"],
-        prompt=prompt,
-        output_folder=output_folder,
-        output_filename=video_filename
-    )
+    video_info: Dict[str, Any] = {}
+    if num_segments > 1:
+        video_path = await generate_chained_video_async(
+            image_url=image_result["url"],
+            prompt=prompt,
+            num_segments=num_segments,
+            output_folder=output_folder,
+            output_filename=video_filename,
+            tier=tier,
+            run_info=video_info
+        )
+    else:
+        video_path = await generate_video_async(
+            image_url=image_result["url"],
+            prompt=prompt,
+            output_folder=output_folder,
+            output_filename=video_filename,
+            tier=tier,
+            run_info=video_info
+        )
+    if run_info is not None:
+        run_info.update({"image": image_result, "video": video_info})
     
     if not video_path:
         print("Video generation failed.")
@@ -173,6 +455,119 @@ async def generate_game_video_async(
     
     return video_path
 
+async def generate_draft_batch_async(
+    count: int,
+    output_folder: str = "input",
+    max_concurrency: int = 4,
+    catalog: Optional[RunCatalog] = None
+) -> List[str]:
+    """
+    Generate prompts and draft-tier videos for a batch of candidates.
+    
+    Each candidate is recorded in the run catalog with status "draft" and a
+    "video_draft" artifact holding the image URL and seed needed for promotion.
+    
+    Args:
+        count: Number of candidates to generate
+        output_folder: Base folder; each candidate gets its own <run_id> subfolder
+        max_concurrency: Maximum number of candidates rendered at the same time
+        catalog: Optional RunCatalog (defaults to catalog.db)
+    
+    Returns:
+        List[str]: Run ids of the drafts that rendered successfully
+    """
+    from prompt_generate import generate_unique_prompts
+    
+    catalog = catalog or RunCatalog()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    # Prompts are generated one after another so each new concept is checked
+    # against the ones just accepted for this batch
+    candidates = []
+    for number in range(1, count + 1):
+        print(f"\n=== Prompts for draft {number}/{count} ===")
+        video_prompt, music_prompt, visual_style = generate_unique_prompts()
+        if video_prompt:
+            candidates.append((video_prompt, music_prompt, visual_style))
+    
+    async def render_candidate(video_prompt: str, music_prompt: str, visual_style: Tuple[str, str]) -> Optional[str]:
+        async with semaphore:
+            run_id = catalog.start_run(video_prompt, music_prompt, *visual_style)
+            print(f"\n=== Rendering draft {run_id} ===")
+            run_folder = os.path.join(output_folder, run_id)
+            run_info: Dict[str, Any] = {}
+            video_path = await generate_game_video_async(
+                prompt=video_prompt,
+                output_folder=run_folder,
+                video_filename="game_video_draft.mp4",
+                tier="draft",
+                run_info=run_info
+            )
+            image = run_info.get("image")
+            if image:
+                catalog.add_artifact(run_id, "image", image["file_path"], image["url"],
+                                     image["model"], image["arguments"])
+            if not video_path:
+                catalog.finish_run(run_id, "failed")
+                return None
+            video = run_info["video"]
+            catalog.add_artifact(run_id, "video_draft", video_path, video["url"],
+                                 video["model"], video["arguments"])
+            catalog.finish_run(run_id, "draft")
+            return run_id
+    
+    results = await asyncio.gather(*(render_candidate(*candidate) for candidate in candidates))
+    run_ids = [run_id for run_id in results if run_id]
+    print(f"\n{len(run_ids)}/{count} drafts rendered. Promote the ones you want with --promote RUN_ID")
+    return run_ids
+
+async def promote_draft_async(
+    run_id: str,
+    output_folder: str = "input",
+    video_filename: str = "game_video.mp4",
+    catalog: Optional[RunCatalog] = None
+) -> Optional[str]:
+    """
+    Re-render a draft at final quality with the same image, prompt and seed.
+    
+    Args:
+        run_id: Run id of the draft in the run catalog
+        output_folder: Base folder; the video is saved in its <run_id> subfolder
+        video_filename: Filename of the final video
+        catalog: Optional RunCatalog (defaults to catalog.db)
+    
+    Returns:
+        Optional[str]: Path of the final video, or None on failure
+    """
+    catalog = catalog or RunCatalog()
+    drafts = catalog.get_artifacts(run_id, "video_draft")
+    if not drafts or not drafts[-1]["model_args"]:
+        print(f"Error: No draft video found for run {run_id}")
+        return None
+    draft_args = json.loads(drafts[-1]["model_args"])
+    
+    print(f"\n=== Promoting draft {run_id} to final quality ===")
+    run_info: Dict[str, Any] = {}
+    video_path = await generate_video_async(
+        image_url=draft_args["image_url"],
+        prompt=draft_args.get("prompt", ""),
+        output_folder=os.path.join(output_folder, run_id),
+        output_filename=video_filename,
+        negative_prompt=draft_args.get("negative_prompt", ""),
+        num_frames=draft_args.get("num_frames", 81),
+        frames_per_second=draft_args.get("frames_per_second", 16),
+        aspect_ratio=draft_args.get("aspect_ratio", "auto"),
+        tier="final",
+        seed=draft_args.get("seed"),
+        run_info=run_info
+    )
+    if not video_path:
+        return None
+    catalog.add_artifact(run_id, "video", video_path, run_info["url"], run_info["model"],
+                         run_info["arguments"], await get_media_duration_async(video_path))
+    catalog.finish_run(run_id, "promoted")
+    return video_path
+
 def generate_video_from_prompt_file(
     prompt_file: str,
     duration: str = "10",
@@ -244,11 +639,26 @@ if __name__ == "__main__":
     parser.add_argument("--prompt-file", type=str, help="Path to file containing the prompt")
     parser.add_argument("--output-folder", type=str, default="input", help="Folder to save generated files (default: input)")
     parser.add_argument("--output-filename", type=str, default="game_video.mp4", help="Output video filename (default: game_video.mp4)")
+    parser.add_argument("--tier", choices=list(VIDEO_TIERS), default="final", help="Video quality tier (default: final)")
+    parser.add_argument("--segments", type=int, default=1, help="Chain this many ~5 s segments into one longer video (default: 1)")
+    parser.add_argument("--image-candidates", type=int, default=1, help="Generate this many images and animate only the best one (default: 1)")
+    parser.add_argument("--image-model-tier", choices=MODEL_TIERS, help="Image model tier (default: quality)")
+    parser.add_argument("--image-deadline", type=float, help="Seconds the image may take; picks a faster model if needed")
+    parser.add_argument("--draft-batch", type=int, metavar="N", help="Generate N prompts and render them as drafts")
+    parser.add_argument("--promote", nargs="+", metavar="RUN_ID", help="Re-render the given drafts at final quality")
     
     args = parser.parse_args()
     os.makedirs(args.output_folder, exist_ok=True)
     
-    if args.prompt_file:
+    if args.draft_batch:
+        asyncio.run(generate_draft_batch_async(args.draft_batch, output_folder=args.output_folder))
+    elif args.promote:
+        async def promote_all():
+            return await asyncio.gather(*(
+                promote_draft_async(run_id, output_folder=args.output_folder) for run_id in args.promote
+            ))
+        asyncio.run(promote_all())
+    elif args.prompt_file:
         print(f"\n=== Using Prompt from File: {args.prompt_file} ===")
         output_file = generate_video_from_prompt_file(
             args.prompt_file,
@@ -260,7 +670,12 @@ if __name__ == "__main__":
         output_file = asyncio.run(generate_game_video_async(
             prompt=args.prompt,
             output_folder=args.output_folder,
-            video_filename=args.output_filename
+            video_filename=args.output_filename,
+            num_image_candidates=args.image_candidates,
+            tier=args.tier,
+            num_segments=args.segments,
+            image_model_tier=args.image_model_tier,
+            image_deadline=args.image_deadline
         ))
     else:
         asyncio.run(async_main())
@@ -0,0 +1,125 @@
+import argparse
+from typing import Dict, Any, List, Optional
+import numpy as np
+from services.media_io import decode_video_frames, decode_video_frames_async
+
+# Frames are analysed as small grayscale thumbnails; enough to see exposure and
+# motion while keeping a 5 s clip well under a second to decode and analyse
+QA_WIDTH = 160
+QA_HEIGHT = 90
+
+# Mean luminance (0-255) below which a frame counts as black
+BLACK_LUMA = 16.0
+# Mean absolute frame difference below which two frames count as identical
+FREEZE_DIFF = 0.5
+# Frame-to-frame change in mean luminance that counts as a flicker step
+FLICKER_STEP = 12.0
+
+# Verdict thresholds
+MAX_BLACK_FRACTION = 0.25
+MAX_FROZEN_FRACTION = 0.5
+FLAG_FROZEN_FRACTION = 0.2
+MAX_FLICKER_FRACTION = 0.15
+FLAG_FLICKER_FRACTION = 0.05
+MIN_MEAN_MOTION = 0.3
+
+def analyze_frames(frames: np.ndarray) -> Dict[str, Any]:
+    """
+    Compute luminance, motion, freeze and flicker statistics for a clip.
+
+    Args:
+        frames: uint8 array of shape (N, H, W) with grayscale frames
+
+    Returns:
+        Dict[str, Any]: Statistics describing the clip
+    """
+    frames = frames.astype(np.float32)
+    luma = frames.reshape(len(frames), -1).mean(axis=1)
+    black = luma < BLACK_LUMA
+
+    if len(frames) > 1:
+        diffs = np.abs(np.diff(frames, axis=0)).reshape(len(frames) - 1, -1).mean(axis=1)
+    else:
+        diffs = np.zeros(0, dtype=np.float32)
+    frozen = diffs < FREEZE_DIFF
+
+    # Longest run of consecutive identical frames
+    longest_freeze = 0
+    if frozen.any():
+        padded = np.concatenate(([0], frozen.astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(padded))
+        longest_freeze = int((edges[1::2] - edges[::2]).max())
+
+    # Flicker: large luminance steps that immediately reverse direction
+    steps = np.diff(luma)
+    reversals = (np.abs(steps[:-1]) > FLICKER_STEP) & (np.abs(steps[1:]) > FLICKER_STEP) & \
+                (np.sign(steps[:-1]) != np.sign(steps[1:]))
+    flicker_fraction = float(reversals.mean()) if len(reversals) else 0.0
+
+    return {
+        "frames": int(len(frames)),
+        "mean_luma": float(luma.mean()),
+        "black_fraction": float(black.mean()),
+        "mean_motion": float(diffs.mean()) if len(diffs) else 0.0,
+        "frozen_fraction": float(frozen.mean()) if len(frozen) else 1.0,
+        "longest_freeze": longest_freeze,
+        "flicker_fraction": flicker_fraction,
+    }
+
+def judge(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn clip statistics into a verdict.
+
+    Returns:
+        Dict[str, Any]: {"verdict": "pass" | "flag" | "reject", "reasons": [...], "stats": stats}
+    """
+    rejects: List[str] = []
+    flags: List[str] = []
+    if stats["black_fraction"] > MAX_BLACK_FRACTION:
+        rejects.append(f"{stats['black_fraction']:.0%} black frames")
+    if stats["frozen_fraction"] > MAX_FROZEN_FRACTION or stats["mean_motion"] < MIN_MEAN_MOTION:
+        rejects.append(f"frozen motion ({stats['frozen_fraction']:.0%} frozen, mean motion {stats['mean_motion']:.2f})")
+    elif stats["frozen_fraction"] > FLAG_FROZEN_FRACTION:
+        flags.append(f"{stats['frozen_fraction']:.0%} frozen frames")
+    if stats["flicker_fraction"] > MAX_FLICKER_FRACTION:
+        rejects.append(f"heavy flicker ({stats['flicker_fraction']:.0%} of frames)")
+    elif stats["flicker_fraction"] > FLAG_FLICKER_FRACTION:
+        flags.append(f"flicker ({stats['flicker_fraction']:.0%} of frames)")
+
+    verdict = "reject" if rejects else "flag" if flags else "pass"
+    return {"verdict": verdict, "reasons": rejects + flags, "stats": stats}
+
+def check_video(video_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode a clip at low resolution and run the QA checks on it.
+
+    Args:
+        video_path: Path of the MP4 to check
+
+    Returns:
+        Optional[Dict[str, Any]]: The verdict from judge(), or None if the clip could not be decoded
+    """
+    frames = decode_video_frames(video_path, QA_WIDTH, QA_HEIGHT, "gray")
+    if frames is None:
+        return None
+    return _report(video_path, frames)
+
+async def check_video_async(video_path: str) -> Optional[Dict[str, Any]]:
+    """Async version of check_video() that decodes without blocking the event loop"""
+    frames = await decode_video_frames_async(video_path, QA_WIDTH, QA_HEIGHT, "gray")
+    if frames is None:
+        return None
+    return _report(video_path, frames)
+
+def _report(video_path: str, frames: np.ndarray) -> Dict[str, Any]:
+    report = judge(analyze_frames(frames))
+    reasons = f" ({'; '.join(report['reasons'])})" if report["reasons"] else ""
+    print(f"Video QA for {video_path}: {report['verdict']}{reasons}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check generated videos for black frames, frozen motion and flicker")
+    parser.add_argument("videos", nargs="+", help="MP4 files to check")
+    args = parser.parse_args()
+    for path in args.videos:
+        check_video(path)
@@ -0,0 +1,188 @@
+import os
+import json
+import random
+from typing import Dict, List, Optional, Tuple
+from services.file_lock import FileLock
+
+# Visual style catalog: category -> styles.
+# Shared by prompt_generate.py (style sampling) and generate_and_merge.py (category menu),
+# so adding a style or a category only needs to happen here.
+VISUAL_STYLE_CATALOG: Dict[str, List[str]] = {
+    "Traditional Art Styles": [
+        "watercolor painting", "oil painting", "charcoal sketch", "ink wash", "ukiyo-e woodblock print",
+        "fresco", "medieval manuscript illumination", "stained glass", "pastel drawing", "gouache painting",
+    ],
+    "Modern Art Movements": [
+        "cubist", "surrealist", "impressionist", "expressionist", "art nouveau", "art deco", "pop art",
+        "bauhaus", "brutalist", "minimalist", "abstract expressionism", "futurism", "dadaism", "fauvism",
+        "de stijl",
+    ],
+    "Digital & Contemporary": [
+        "vaporwave", "glitch art", "low poly", "vector art", "flat design", "3D render", "photogrammetry",
+        "procedural generation", "holographic", "cyberpunk", "solarpunk",
+    ],
+    "Pixel Art Styles": [
+        "8-bit pixel art", "16-bit pixel art", "32-bit pixel art", "isometric pixel art", "1-bit pixel art",
+        "Game Boy 4-color pixel art", "pixel art dithering", "outlined pixel art", "hi-bit pixel art",
+        "rotoscoped pixel art", "pixel art with limited palette", "MSX pixel art", "Commodore 64 pixel art",
+        "CGA 4-color pixel art", "EGA 16-color pixel art", "demoscene pixel art",
+    ],
+    "Film & Photography": [
+        "film noir", "technicolor", "sepia tone", "analog photography", "infrared photography", "tilt-shift",
+        "long exposure", "time-lapse", "daguerreotype", "polaroid", "cinematic widescreen", "fisheye lens",
+        "bokeh", "HDR photography", "cross-processed film",
+    ],
+    "Animation Styles": [
+        "hand-drawn animation", "stop motion", "claymation", "rotoscope", "anime", "cartoon", "cel shading",
+        "South Park paper cut-out", "silhouette animation", "motion graphics", "rubber hose animation",
+        "limited animation", "Disney renaissance style", "UPA flat style", "puppet animation",
+    ],
+    "Video Game Aesthetics": [
+        "16-bit SNES", "32-bit PS1", "Nintendo 64 low-poly", "Dreamcast", "GameBoy 4-color", "PS2 era",
+        "modern AAA", "Unity engine", "Unreal Engine", "voxel-based", "2.5D", "text-based adventure",
+        "vector graphics arcade", "wireframe",
+    ],
+    "Experimental/Abstract": [
+        "databending", "neural network dream imagery", "fractal", "generative art", "wireframe",
+        "light painting", "ASCII art", "circuit board aesthetic", "datamoshing",
+        "analog synthesis visualization", "abstract geometry", "mathematical visualization",
+        "particle systems",
+    ],
+    "International Styles": [
+        "Russian constructivism", "Mexican muralism", "Chinese ink painting", "Aboriginal dot painting",
+        "Indian miniature painting", "Persian miniature", "African mask-inspired", "Japanese Rinpa",
+        "Scandinavian design", "Bauhaus", "Memphis design", "Celtic illumination", "Byzantine iconography",
+    ],
+    "Historical Periods": [
+        "ancient Egyptian", "Byzantine mosaic", "Gothic", "Renaissance", "Baroque", "Rococo", "Victorian",
+        "1920s", "1950s", "1980s", "1990s web design", "Y2K aesthetic", "medieval manuscript",
+        "Art Nouveau", "Modernism",
+    ],
+    "Mixed Media": [
+        "collage", "decoupage", "photomontage", "assemblage", "found object art", "paper cutting",
+        "textile art", "mosaic", "mixed media painting", "encaustic", "sculpture photography",
+        "digital collage", "hybrid illustration",
+    ],
+    "Textures & Materials": [
+        "chalk", "crayon", "pencil sketch", "blueprint", "newspaper print", "risograph", "screen printing",
+        "woodcut", "linocut", "etching", "lithography", "letterpress", "batik", "marbling", "cyanotype",
+    ],
+    "Lighting Techniques": [
+        "chiaroscuro", "noir lighting", "golden hour", "blue hour", "bioluminescence", "neon",
+        "strobe effect", "volumetric lighting", "ray tracing", "global illumination", "lens flare",
+        "light leaks", "ambient occlusion", "rim lighting", "silhouette lighting",
+    ],
+}
+
+def get_categories() -> List[str]:
+    """Return the visual style categories in catalog order"""
+    return list(VISUAL_STYLE_CATALOG)
+
+def get_styles(category: str) -> List[str]:
+    """Return the styles of a category (raises KeyError for unknown categories)"""
+    return VISUAL_STYLE_CATALOG[category]
+
+# Relative weights used when sampling a category. Categories missing from the
+# mapping get weight 1.0; a weight of 0 disables a category entirely.
+DEFAULT_CATEGORY_WEIGHTS: Dict[str, float] = {category: 1.0 for category in VISUAL_STYLE_CATALOG}
+
+# A category picked in one of the last N runs is not picked again
+DEFAULT_CATEGORY_RECENCY_WINDOW = 3
+
+# Number of past choices kept in the history file
+MAX_HISTORY_ENTRIES = 1000
+
+STYLE_HISTORY_FILE = os.path.join("prompts", "style_history.json")
+
+def load_style_history(history_file: str = STYLE_HISTORY_FILE) -> List[Dict[str, str]]:
+    """Load past style choices, oldest first. Returns an empty list if there is no history yet."""
+    if not os.path.exists(history_file):
+        return []
+    try:
+        with open(history_file, 'r') as f:
+            history = json.load(f)
+        return history if isinstance(history, list) else []
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read style history {history_file}: {e}")
+        return []
+
+def record_style_choice(category: str, style: str, history_file: str = STYLE_HISTORY_FILE) -> None:
+    """Append a style choice to the history file"""
+    # Locked and replaced atomically: workers on other hosts may share the file
+    with FileLock(f"{history_file}.lock"):
+        history = load_style_history(history_file)
+        history.append({"category": category, "style": style})
+        history = history[-MAX_HISTORY_ENTRIES:]
+        temp_path = f"{history_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(history, f)
+        os.replace(temp_path, history_file)
+
+def _pick_weighted(options: List[str], weights: Dict[str, float], rng: random.Random) -> Optional[str]:
+    """Weighted choice from options, or None if all weights are zero"""
+    option_weights = [max(weights.get(option, 1.0), 0.0) for option in options]
+    if not options or sum(option_weights) <= 0:
+        return None
+    return rng.choices(options, weights=option_weights, k=1)[0]
+
+def sample_visual_style(
+    visual_style_category: Optional[str] = None,
+    category_weights: Optional[Dict[str, float]] = None,
+    style_weights: Optional[Dict[str, float]] = None,
+    category_recency_window: int = DEFAULT_CATEGORY_RECENCY_WINDOW,
+    history: Optional[List[Dict[str, str]]] = None,
+    rng: Optional[random.Random] = None
+) -> Tuple[str, str]:
+    """
+    Choose a visual style locally instead of asking the LLM to pick one.
+    
+    The category is drawn by weight, skipping categories used in the last
+    `category_recency_window` runs. Within a category, styles are drawn without
+    replacement: a style is not repeated until every other style of its category
+    has been used, so coverage over a batch is guaranteed.
+    
+    Args:
+        visual_style_category: Optional category to restrict the choice to
+        category_weights: Relative category weights (defaults to DEFAULT_CATEGORY_WEIGHTS)
+        style_weights: Optional relative weights per style name (default 1.0)
+        category_recency_window: Number of recent runs whose categories are excluded
+        history: Past choices, oldest first (defaults to the history file)
+        rng: Optional random generator, mainly for reproducible batches
+    
+    Returns:
+        Tuple[str, str]: A tuple containing (category, style)
+    
+    Raises:
+        KeyError: If visual_style_category is not in the catalog
+        ValueError: If every category has a weight of 0
+    """
+    rng = rng or random.Random()
+    weights = category_weights if category_weights is not None else DEFAULT_CATEGORY_WEIGHTS
+    style_weights = style_weights or {}
+    if history is None:
+        history = load_style_history()
+    
+    if visual_style_category:
+        category = visual_style_category
+        if category not in VISUAL_STYLE_CATALOG:
+            raise KeyError(f"Unknown visual style category: {category}")
+    else:
+        categories = get_categories()
+        window = max(0, min(category_recency_window, len(categories) - 1))
+        recent = {entry.get("category") for entry in history[-window:]} if window else set()
+        category = _pick_weighted([c for c in categories if c not in recent], weights, rng)
+        if category is None:
+            # Every eligible category has zero weight; ignore the recency window
+            category = _pick_weighted(categories, weights, rng)
+        if category is None:
+            raise ValueError("Every visual style category has a weight of 0")
+    
+    styles = get_styles(category)
+    # Styles already used in the current cycle of this category
+    category_history = [entry.get("style") for entry in history if entry.get("category") == category]
+    cycle_length = len(category_history) % len(styles)
+    used = set(category_history[-cycle_length:]) if cycle_length else set()
+    style = _pick_weighted([s for s in styles if s not in used], style_weights, rng)
+    if style is None:
+        style = _pick_weighted(styles, style_weights, rng) or rng.choice(styles)
+    return category, style